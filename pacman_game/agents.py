@@ -0,0 +1,84 @@
+import importlib
+import random
+
+import engine
+from engine import CELL_SIZE
+
+# Scripted agents for headless games. An agent is a factory: agent(seed)
+# returns a policy, and policy(state) returns the action for the next tick.
+# Agents are looked up by name (or 'module:attribute') so that worker
+# processes can load them without pickling functions.
+
+# Action that moves from a cell to a neighbouring one
+STEP_ACTIONS = {(0, -1): engine.LEFT, (0, 1): engine.RIGHT,
+                (-1, 0): engine.UP, (1, 0): engine.DOWN}
+# How far off a tile's centre line the player can be and still turn
+ALIGN_TOLERANCE = 4
+
+
+def holding_agent(seed):
+    # Holds a random direction for a while, like a player holding a key
+    rng = random.Random(seed)
+    action = engine.RIGHT
+
+    def policy(state):
+        nonlocal action
+        if rng.random() < 0.05:
+            action = rng.choice(engine.ACTIONS)
+        return action
+    return policy
+
+
+def greedy_agent(seed):
+    # Walks the shortest path to the nearest pellet, ignoring ghosts
+    action = engine.RIGHT
+
+    def policy(state):
+        nonlocal action
+        player = state.player
+        finder = state.pathfinder
+        cell = (int(player.y // CELL_SIZE), int(player.x // CELL_SIZE))
+        # One BFS table from the player's tile gives the distance to every
+        # pellet; following its next hops back from the nearest one ends
+        # on the first step towards it
+        next_hop, distance = finder.table(finder.cell_index(cell))
+        best = None
+        for tile in state.pellets.tiles().tolist():
+            if distance[tile] >= 0 and (best is None or distance[tile] < distance[best]):
+                best = tile
+        if best is not None and distance[best] > 0:
+            start = finder.cell_index(cell)
+            tile = best
+            while next_hop[tile] != start:
+                tile = next_hop[tile]
+            step = finder.cell_pos(tile)
+            action = STEP_ACTIONS[(step[0] - cell[0], step[1] - cell[1])]
+            # Line up with the current tile first, or the turn won't fit. At
+            # low tick rates one step can jump over the tolerance band, so
+            # it is at least half a step.
+            center_x = cell[1] * CELL_SIZE + CELL_SIZE // 2
+            center_y = cell[0] * CELL_SIZE + CELL_SIZE // 2
+            tolerance = max(ALIGN_TOLERANCE, player.speed / 2)
+            if step[0] == cell[0] and abs(player.y - center_y) > tolerance:
+                action = engine.DOWN if player.y < center_y else engine.UP
+            elif step[1] == cell[1] and abs(player.x - center_x) > tolerance:
+                action = engine.RIGHT if player.x < center_x else engine.LEFT
+        return action
+    return policy
+
+
+AGENTS = {
+    'random': holding_agent,
+    'greedy': greedy_agent,
+}
+
+
+def load_agent(spec):
+    # A name from AGENTS, or 'module:attribute' for an agent defined elsewhere
+    if spec in AGENTS:
+        return AGENTS[spec]
+    module, _, name = spec.partition(':')
+    if not name:
+        raise ValueError(f'unknown agent {spec!r}; use one of {sorted(AGENTS)} '
+                         f'or module:attribute')
+    return getattr(importlib.import_module(module), name)
@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Background asset loading.
+#
+# AssetManager runs loaders on a small thread pool and hands back an Asset
+# for each one straight away, so startup can open the window while sounds,
+# fonts and sprite caches load. Asset.get() blocks until the value is ready
+# (and re-raises the loader's exception); Asset.peek() never blocks, for
+# things like sounds that can simply be skipped until they arrive. With
+# workers=0 every loader runs synchronously in submit(), which is how
+# startup behaved before and is handy for comparing the two.
+#
+# The time each loader took is kept in AssetManager.timings.
+
+SOUND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sounds')
+HEADLESS_DRIVERS = ('dummy', 'offscreen')
+
+
+def headless():
+    # True when SDL has no real display, e.g. benchmarks and CI; audio is
+    # never initialized then
+    return os.environ.get('SDL_VIDEODRIVER', '') in HEADLESS_DRIVERS
+
+
+class Asset:
+    def __init__(self, name, future=None, value=None, error=None, finish=None):
+        self.name = name
+        self.future = future
+        self.value = value
+        self.error = error
+        self.finish = finish  # Run once, in the thread that first gets the value
+        self.lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.future is None or self.future.done()
+
+    def get(self):
+        with self.lock:
+            if self.future is not None:
+                try:
+                    self.value = self.future.result()
+                except Exception as error:
+                    self.error = error
+                self.future = None
+            if self.error is not None:
+                raise self.error
+            if self.finish is not None:
+                self.value = self.finish(self.value)
+                self.finish = None
+            return self.value
+
+    def peek(self, default=None):
+        # The value if it has loaded (and loaded without errors), else default
+        if not self.ready:
+            return default
+        try:
+            return self.get()
+        except Exception:
+            return default
+
+
+class AssetManager:
+    def __init__(self, workers=4):
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(workers, 'assets') if workers else None
+        self.assets = {}
+        self.timings = {}  # name -> seconds spent loading
+
+    def submit(self, name, loader, *args, finish=None):
+        def timed():
+            start = time.perf_counter()
+            try:
+                return loader(*args)
+            finally:
+                self.timings[name] = time.perf_counter() - start
+
+        if self.executor:
+            asset = Asset(name, self.executor.submit(timed), finish=finish)
+        else:
+            try:
+                asset = Asset(name, value=timed(), finish=finish)
+            except Exception as error:
+                asset = Asset(name, error=error, finish=finish)
+        self.assets[name] = asset
+        return asset
+
+    def __getitem__(self, name):
+        return self.assets[name]
+
+    def get(self, name):
+        return self.assets[name].get()
+
+    def wait(self):
+        # Blocks until every asset has loaded; loader errors stay with their
+        # Asset
+        for asset in list(self.assets.values()):
+            if asset.future is not None:
+                asset.future.exception()
+
+    def shutdown(self):
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def load_sound(name, tone, cache_dir=None, sound_dir=SOUND_DIR):
+    # The bundled sounds/<name>.wav if it can be played, else the tone
+    # synthesized by audio.py. Needs pygame.mixer to be initialized.
+    import pygame
+
+    import audio
+
+    path = os.path.join(sound_dir, f'{name}.wav')
+    if os.path.exists(path):
+        try:
+            return pygame.mixer.Sound(path)
+        except pygame.error:
+            pass  # Not a usable WAV file
+    return pygame.sndarray.make_sound(audio.synthesize(tone, cache_dir=cache_dir))
@@ -0,0 +1,80 @@
+import hashlib
+import os
+from collections import namedtuple
+
+import numpy
+
+# Procedural sound effects, synthesized with whole-array NumPy operations.
+# Generated buffers are cached on disk as .npy files keyed by a digest of the
+# synthesis parameters, so later startups only have to read them back.
+
+SAMPLE_RATE = 44100
+MAX_SAMPLE = 2**(16 - 1) - 1
+SYNTH_VERSION = 1
+
+# kind is 'sine' or 'chirp'; a chirp sweeps linearly from frequency to
+# end_frequency over the duration (milliseconds)
+Tone = namedtuple('Tone', 'kind frequency end_frequency duration')
+
+CHOMP = Tone('sine', 440, 440, 100)
+# The death sound has always been sin(2*pi * f * (1 - t/T) * t), which is a
+# linear sweep from f down through zero to -f
+DEATH = Tone('chirp', 220, -220, 500)
+
+
+def sample_times(duration, sample_rate=SAMPLE_RATE):
+    n_samples = int(duration * sample_rate / 1000)
+    return numpy.arange(n_samples, dtype=numpy.float64) / sample_rate
+
+
+def sine(frequency, duration, sample_rate=SAMPLE_RATE):
+    t = sample_times(duration, sample_rate)
+    return numpy.sin(2 * numpy.pi * frequency * t)
+
+
+def chirp(frequency, end_frequency, duration, sample_rate=SAMPLE_RATE):
+    # Phase is the integral of the linearly changing frequency
+    t = sample_times(duration, sample_rate)
+    sweep = (end_frequency - frequency) / (duration / 1000)
+    return numpy.sin(2 * numpy.pi * (frequency * t + sweep * t * t / 2))
+
+
+def to_stereo_int16(wave):
+    # Truncate towards zero like int() did, then duplicate for stereo
+    mono = (MAX_SAMPLE * wave).astype(numpy.int16)
+    return numpy.ascontiguousarray(numpy.column_stack((mono, mono)))
+
+
+def render(tone, sample_rate=SAMPLE_RATE):
+    if tone.kind == 'sine':
+        wave = sine(tone.frequency, tone.duration, sample_rate)
+    elif tone.kind == 'chirp':
+        wave = chirp(tone.frequency, tone.end_frequency, tone.duration, sample_rate)
+    else:
+        raise ValueError(f'unknown tone kind: {tone.kind}')
+    return to_stereo_int16(wave)
+
+
+def cache_path(tone, sample_rate, cache_dir):
+    params = (SYNTH_VERSION, tuple(tone), sample_rate)
+    digest = hashlib.sha1(repr(params).encode()).hexdigest()[:12]
+    return os.path.join(cache_dir, f'{tone.kind}-{digest}.npy')
+
+
+def synthesize(tone, sample_rate=SAMPLE_RATE, cache_dir=None):
+    # (n_samples, 2) int16 buffer, read from the cache when possible
+    path = cache_path(tone, sample_rate, cache_dir) if cache_dir else None
+    if path and os.path.exists(path):
+        try:
+            return numpy.load(path)
+        except (OSError, ValueError):
+            pass  # Corrupt cache entry, regenerate it below
+
+    buf = render(tone, sample_rate)
+    if path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            numpy.save(path, buf)
+        except OSError:
+            pass  # The cache is only an optimization
+    return buf
@@ -0,0 +1,174 @@
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import engine
+from agents import load_agent
+from mazes import load_maze
+from swarm import SwarmGameState
+
+# Headless games in bulk, spread over a process pool.
+#
+# Seeds are handed out in small chunks and results stream back as each chunk
+# finishes, one dict per game. Each worker loads the maze and builds its
+# GameState once, in the pool initializer, and reuses it for every game with
+# reset(seed): tasks carry only seed ranges, never maze data. Mazes are
+# memory-mapped .maze files, so the workers share the same pages.
+
+OUTCOME_CAUGHT = 'caught'
+OUTCOME_CLEARED = 'cleared'
+OUTCOME_TIMEOUT = 'timeout'
+
+CHUNK_SIZE = 16
+
+# Per-process state, set by init_worker
+_worker = None
+
+
+class BatchConfig:
+    # Everything a worker needs to play games; small and cheap to pickle
+    def __init__(self, agent='greedy', maze=None, num_ghosts=engine.NUM_GHOSTS,
+                 num_pellets=engine.NUM_PELLETS, tick_rate=engine.TICK_RATE,
+                 swarm=False, max_ticks=10000, swept=False):
+        self.agent = agent
+        self.maze = maze  # .maze path, None for the classic board
+        self.num_ghosts = num_ghosts
+        self.num_pellets = num_pellets
+        self.tick_rate = tick_rate
+        self.swarm = swarm
+        self.max_ticks = max_ticks
+        self.swept = swept
+
+    def new_state(self):
+        maze = load_maze(self.maze) if self.maze else engine.MAZE
+        state_class = SwarmGameState if self.swarm else engine.GameState
+        return state_class(0, maze=maze, num_ghosts=self.num_ghosts,
+                           num_pellets=self.num_pellets, tick_rate=self.tick_rate,
+                           swept=self.swept)
+
+
+class Worker:
+    def __init__(self, config):
+        self.config = config
+        self.agent = load_agent(config.agent)
+        self.state = config.new_state()
+
+    def play(self, seed):
+        state = self.state
+        state.reset(seed)
+        policy = self.agent(seed)
+        max_ticks = self.config.max_ticks
+        pellets = 0
+        while not state.game_over and state.tick < max_ticks:
+            pellets += state.step(policy(state)).count(engine.EVENT_PELLET)
+        if state.won:
+            outcome = OUTCOME_CLEARED
+        elif state.game_over:
+            outcome = OUTCOME_CAUGHT
+        else:
+            outcome = OUTCOME_TIMEOUT
+        return {'seed': seed, 'score': state.score, 'pellets': pellets,
+                'ticks': state.tick, 'outcome': outcome}
+
+    def play_range(self, seeds):
+        return [self.play(seed) for seed in range(*seeds)]
+
+
+def init_worker(config):
+    global _worker
+    _worker = Worker(config)
+
+
+def play_chunk(seeds):
+    return _worker.play_range(seeds)
+
+
+def chunks(start, stop, size):
+    for first in range(start, stop, size):
+        yield (first, min(first + size, stop))
+
+
+def run_batch(config, start, stop, workers=None, chunk_size=CHUNK_SIZE):
+    # Plays seeds start..stop-1 and yields one result dict per game, in
+    # completion order. workers=0 plays in this process.
+    if workers == 0:
+        worker = Worker(config)
+        for seeds in chunks(start, stop, chunk_size):
+            yield from worker.play_range(seeds)
+        return
+    workers = workers or os.cpu_count()
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=(config,)) as pool:
+        for results in pool.imap_unordered(play_chunk, chunks(start, stop, chunk_size)):
+            yield from results
+
+
+def summarize(results):
+    results = list(results)
+    count = len(results)
+    summary = {'games': count}
+    if count:
+        summary['mean_score'] = sum(r['score'] for r in results) / count
+        summary['mean_ticks'] = sum(r['ticks'] for r in results) / count
+        for outcome in (OUTCOME_CAUGHT, OUTCOME_CLEARED, OUTCOME_TIMEOUT):
+            summary[outcome] = sum(r['outcome'] == outcome for r in results)
+    return summary
+
+
+def parse_seeds(text):
+    # 'N' for 0..N-1 or 'START:STOP'
+    if ':' in text:
+        start, stop = text.split(':', 1)
+        return int(start), int(stop)
+    return 0, int(text)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Play headless games on all cores')
+    parser.add_argument('--seeds', default='1000', metavar='N|START:STOP',
+                        help='seeds to play, default 1000 (0..999)')
+    parser.add_argument('--agent', default='greedy',
+                        help='agent name (random, greedy) or module:attribute')
+    parser.add_argument('--maze', metavar='PATH', help='.maze file, default the classic board')
+    parser.add_argument('--ghosts', type=int, default=engine.NUM_GHOSTS)
+    parser.add_argument('--pellets', type=engine.pellet_count, default=engine.NUM_PELLETS,
+                        metavar='N|full')
+    parser.add_argument('--tick-rate', type=int, default=engine.TICK_RATE)
+    parser.add_argument('--swarm', action='store_true', help='batched ghosts')
+    parser.add_argument('--swept', action='store_true',
+                        help='swept collision, exact at low tick rates')
+    parser.add_argument('--max-ticks', type=int, default=10000,
+                        help='games still running after this many ticks time out')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='processes, default one per core; 0 runs in-process')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help='seeds per task')
+    parser.add_argument('--quiet', action='store_true',
+                        help='only print the summary, not one JSON line per game')
+    args = parser.parse_args(argv)
+    if args.tick_rate <= 0:
+        parser.error('--tick-rate must be positive')
+
+    config = BatchConfig(args.agent, args.maze, args.ghosts, args.pellets,
+                         args.tick_rate, args.swarm, args.max_ticks, args.swept)
+    load_agent(args.agent)  # Fail here rather than in every worker
+    start, stop = parse_seeds(args.seeds)
+    began = time.perf_counter()
+    results = []
+    for result in run_batch(config, start, stop, args.workers, args.chunk_size):
+        results.append(result)
+        if not args.quiet:
+            print(json.dumps(result), flush=True)
+    elapsed = time.perf_counter() - began
+    summary = summarize(results)
+    summary['seconds'] = round(elapsed, 3)
+    summary['games_per_second'] = round(len(results) / elapsed, 1) if elapsed else 0.0
+    print(json.dumps(summary), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
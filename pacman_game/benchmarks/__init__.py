@@ -0,0 +1,3 @@
+# Performance benchmarks. Run from the pacman_game directory:
+#   python -m benchmarks                      # full suite
+#   python -m benchmarks.bench_pathfinding    # a single focused benchmark
@@ -0,0 +1,83 @@
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy
+
+import audio
+
+# Cold and warm cost of the procedural sound effects, and of a full
+# pacman.init() with an empty versus a populated asset cache.
+
+
+def legacy_sound(duration, frequency, sweep):
+    # The per-sample loop create_chomp_sound/create_death_sound used to run
+    sample_rate = 44100
+    n_samples = int(duration * sample_rate / 1000)
+    buf = numpy.zeros((n_samples, 2), dtype = numpy.int16)
+    max_sample = 2**(16 - 1) - 1
+    for s in range(n_samples):
+        t = float(s) / sample_rate
+        freq = frequency * (1.0 - t/(duration/1000)) if sweep else frequency
+        buf[s][0] = int(max_sample * math.sin(2 * math.pi * freq * t))
+        buf[s][1] = buf[s][0]
+    return buf
+
+
+def best_of(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+INIT_SNIPPET = '''
+import os, time
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+start = time.perf_counter()
+import pacman
+pacman.CACHE_DIR = {cache_dir!r}
+pacman.init(sound=True)
+print(time.perf_counter() - start)
+'''
+
+
+def time_init(cache_dir):
+    code = INIT_SNIPPET.format(cache_dir=cache_dir)
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    legacy = best_of(lambda: (legacy_sound(100, 440, False), legacy_sound(500, 220, True)), 3)
+    vectorized = best_of(lambda: (audio.render(audio.CHOMP), audio.render(audio.DEATH)))
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        audio.synthesize(audio.CHOMP, cache_dir=cache_dir)
+        audio.synthesize(audio.DEATH, cache_dir=cache_dir)
+        warm = best_of(lambda: (audio.synthesize(audio.CHOMP, cache_dir=cache_dir),
+                                audio.synthesize(audio.DEATH, cache_dir=cache_dir)))
+
+    print('sound synthesis (chomp + death)')
+    print(f'  legacy per-sample loop  {legacy * 1000:8.2f} ms')
+    print(f'  vectorized, cold        {vectorized * 1000:8.2f} ms')
+    print(f'  cached .npy, warm       {warm * 1000:8.2f} ms')
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold_init = time_init(cache_dir)
+        warm_init = time_init(cache_dir)
+    print('pacman.init() incl. imports')
+    print(f'  cold (empty cache)      {cold_init * 1000:8.2f} ms')
+    print(f'  warm (cache populated)  {warm_init * 1000:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+import os
+import sys
+import time
+
+import batch
+
+# Games per second from batch.run_batch with 1, 2, 4, ... worker processes
+# up to one per core, against playing in-process.
+
+
+def games_per_second(config, games, workers):
+    start = time.perf_counter()
+    played = sum(1 for _ in batch.run_batch(config, 0, games, workers))
+    return played / (time.perf_counter() - start)
+
+
+def main(argv):
+    games = 200 if '--quick' in argv else 2000
+    config = batch.BatchConfig(agent='greedy')
+    cores = os.cpu_count()
+    counts = [0]
+    workers = 1
+    while workers < cores:
+        counts.append(workers)
+        workers *= 2
+    counts.append(cores)
+
+    print(f'{games} greedy-agent games on the classic board, {cores} cores')
+    baseline = None
+    for workers in counts:
+        rate = games_per_second(config, games, workers)
+        baseline = baseline or rate
+        label = 'in-process' if workers == 0 else f'{workers} workers'
+        print(f'  {label:<12} {rate:8.1f} games/s   {rate / baseline:5.2f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,65 @@
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import sys
+import time
+
+import engine
+import pacman
+from mazes import generate_maze
+
+# Frame cost while the camera follows the player across mazes far bigger
+# than the screen. With chunked walls and culling it should stay close to the
+# classic 20x15 board, whatever the maze size.
+
+SIZES = [None, (101, 101), (301, 301), (501, 501)]
+
+
+def walk(state, steps):
+    # Player positions along the longest shortest path from the start, a few
+    # pixels apart, so the view scrolls steadily
+    finder = state.pathfinder
+    start = (1, 1)
+    cells = [tuple(cell) for cell in state.maze_data.free_cells.tolist()]
+    goal = max(cells, key=lambda cell: finder.distance(cell, start))
+    path = [start] + finder.find_path(start, goal)
+    points = []
+    for (row, col), (next_row, next_col) in zip(path, path[1:]):
+        for i in range(0, engine.CELL_SIZE, 4):
+            points.append(((col + (next_col - col) * i / engine.CELL_SIZE + 0.5) * engine.CELL_SIZE,
+                           (row + (next_row - row) * i / engine.CELL_SIZE + 0.5) * engine.CELL_SIZE))
+            if len(points) == steps:
+                return points
+    return points
+
+
+def run(shape, frames):
+    maze = engine.MAZE if shape is None else generate_maze(*shape, seed=1)
+    state = pacman.RenderedGameState(seed=1, maze=maze)
+    pacman.camera.set_world((state.width, state.height))
+    walls = pacman.ChunkedWallLayer(state.maze_data, engine.CELL_SIZE,
+                                    pacman.WALL_COLOR, pacman.BACKGROUND_COLOR)
+    points = walk(state, frames)
+    player = state.player
+    start = time.perf_counter()
+    for x, y in points:
+        player.prev_x = player.x = x
+        player.prev_y = player.y = y
+        pacman.present_frame(state, walls)
+    elapsed = time.perf_counter() - start
+    rows, cols = state.maze.shape
+    print(f'  {cols:4d}x{rows:<4d} {len(points):5d} frames   {elapsed / len(points) * 1000:7.3f} ms/frame'
+          f'   {walls.chunks_rendered:4d} chunks rendered')
+
+
+def main(argv):
+    frames = 300 if '--quick' in argv else 1200
+    pacman.init()
+    for shape in SIZES:
+        run(shape, frames)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
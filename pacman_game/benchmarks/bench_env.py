@@ -0,0 +1,44 @@
+import sys
+import time
+
+import numpy
+
+import env
+
+# Environment steps per second for PacmanEnv and VectorEnv with random
+# actions, including observation updates and automatic resets.
+
+
+def run(num_envs, steps, **kwargs):
+    vector = env.VectorEnv(num_envs, seed=0, **kwargs)
+    vector.reset()
+    actions = numpy.random.default_rng(0).integers(env.NUM_ACTIONS, size=(steps, num_envs))
+    start = time.perf_counter()
+    for batch in actions:
+        vector.step(batch)
+    return steps * num_envs / (time.perf_counter() - start)
+
+
+def report(label, rate):
+    print(f'  {label:<36} {rate:10,.0f} steps/s')
+
+
+def main(argv):
+    steps = 500 if '--quick' in argv else 3000
+    single = env.PacmanEnv(seed=0)
+    single.reset()
+    actions = numpy.random.default_rng(0).integers(env.NUM_ACTIONS, size=steps).tolist()
+    start = time.perf_counter()
+    for action in actions:
+        _, _, terminated, truncated, _ = single.step(action)
+        if terminated or truncated:
+            single.reset()
+    rate = steps / (time.perf_counter() - start)
+    report('PacmanEnv', rate)
+    for num_envs in (8, 64):
+        report(f'VectorEnv({num_envs})', run(num_envs, steps // 4))
+    report('VectorEnv(64), swarm of 100 ghosts', run(64, steps // 8, swarm=True, num_ghosts=100))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,61 @@
+import random
+import sys
+import time
+
+import engine
+from mazes import generate_maze
+from swarm import SwarmGameState
+
+# Ghost update cost per tick as the ghost count grows, for engine.Ghost
+# objects and the batched GhostSwarm. The swarm's time per ghost should fall
+# and then level off: near-linear scaling with a small fixed overhead.
+
+COUNTS = [10, 30, 100, 300, 1000]
+
+
+def update_objects(state):
+    # Every ghost moves and is tested, like the swarm does; GameState.move_ghosts
+    # would stop at the first ghost touching the player
+    player = state.player
+    for ghost in state.ghosts:
+        ghost.move(player.x, player.y)
+        ghost.touches(player)
+
+
+def update_swarm(state):
+    state.swarm.move(state.player.x, state.player.y)
+    state.swarm.touches(state.player)
+
+
+def run(state_class, update, maze, count, ticks):
+    state = state_class(seed=1, maze=maze, num_ghosts=count)
+    rng = random.Random(0)
+    cells = [tuple(cell) for cell in state.maze_data.free_cells.tolist()]
+    player = state.player
+    elapsed = 0.0
+    for tick in range(ticks):
+        if tick % 90 == 0:
+            # The player jumps around so ghosts keep replanning
+            row, col = rng.choice(cells)
+            player.x = col * engine.CELL_SIZE + engine.CELL_SIZE // 2
+            player.y = row * engine.CELL_SIZE + engine.CELL_SIZE // 2
+        start = time.perf_counter()
+        update(state)
+        elapsed += time.perf_counter() - start
+    return elapsed / ticks
+
+
+def main(argv):
+    ticks = 300 if '--quick' in argv else 1200
+    maze = generate_maze(31, 41, seed=1)
+    print(f'{"ghosts":>7} {"objects us/tick":>16} {"swarm us/tick":>14} '
+          f'{"swarm us/ghost":>15} {"speedup":>8}')
+    for count in COUNTS:
+        objects = run(engine.GameState, update_objects, maze, count, ticks)
+        swarm = run(SwarmGameState, update_swarm, maze, count, ticks)
+        print(f'{count:7d} {objects * 1e6:16.1f} {swarm * 1e6:14.1f} '
+              f'{swarm * 1e6 / count:15.3f} {objects / swarm:7.1f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,47 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import engine
+from mazes import generate_maze, load_maze, save_maze
+
+# How long it takes to get a large maze and its metadata off disk, for the
+# byte (memory-mapped) and bit-packed encodings, with and without the
+# metadata cache.
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main(argv):
+    size = 1001
+    if '--size' in argv:
+        size = int(argv[argv.index('--size') + 1])
+
+    print(f'generating {size}x{size} maze...')
+    grid = generate_maze(size, size, seed=1)
+    tmp = tempfile.mkdtemp()
+    try:
+        for packed in (False, True):
+            path = os.path.join(tmp, f'big-{"bits" if packed else "bytes"}.maze')
+            save_maze(path, grid, packed=packed)
+            label = 'bit-packed' if packed else 'byte grid '
+            _, cold = timed(lambda: load_maze(path))
+            data, warm = timed(lambda: load_maze(path))
+            assert (data.grid == grid).all()
+            print(f'  {label} {os.path.getsize(path) / 1e6:6.2f} MB on disk   '
+                  f'cold load {cold * 1000:8.2f} ms   cached load {warm * 1000:6.2f} ms')
+
+        _, state_time = timed(lambda: engine.GameState(seed=1, maze=data))
+        print(f'  GameState construction on the loaded maze: {state_time * 1000:.1f} ms')
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
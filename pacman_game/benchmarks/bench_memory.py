@@ -0,0 +1,83 @@
+import gc
+import sys
+import time
+import tracemalloc
+
+import agents
+import engine
+from swarm import SwarmGameState
+
+# Memory across many short games played back to back on one GameState, as
+# batch.py and the environments do: traced memory should stay flat. Also
+# the cost of reset() against building a new state, and how often the
+# garbage collector ran.
+
+CHECKPOINTS = 5
+
+
+def play(state, seed, max_ticks):
+    state.reset(seed)
+    policy = agents.greedy_agent(seed)
+    while not state.game_over and state.tick < max_ticks:
+        state.step(policy(state))
+
+
+def memory_over_games(state_class, games, max_ticks):
+    state = state_class(0)
+    # Fill the pathfinding cache first; it is bounded, but would otherwise
+    # grow over the first games
+    finder = state.pathfinder
+    for cell in state.maze_data.free_cells.tolist():
+        finder.table(finder.cell_index(tuple(cell)))
+    play(state, 0, max_ticks)
+    gc.collect()
+    collections = sum(stats['collections'] for stats in gc.get_stats())
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    rows = []
+    for seed in range(1, games + 1):
+        play(state, seed, max_ticks)
+        if seed % (games // CHECKPOINTS) == 0:
+            current, peak = tracemalloc.get_traced_memory()
+            rows.append((seed, current - baseline, peak - baseline))
+    tracemalloc.stop()
+    collections = sum(stats['collections'] for stats in gc.get_stats()) - collections
+    return rows, collections
+
+
+def setup_time(state_class, games):
+    state = state_class(0)
+    start = time.perf_counter()
+    for seed in range(games):
+        state.reset(seed)
+    reset = (time.perf_counter() - start) / games
+    start = time.perf_counter()
+    for seed in range(games):
+        state_class(seed)
+    build = (time.perf_counter() - start) / games
+    return reset, build
+
+
+def main(argv):
+    quick = '--quick' in argv
+    games = 500 if quick else 2000
+    max_ticks = 600
+    state = engine.GameState(0)
+    player, ghost = state.player, state.ghosts[0]
+    print(f'Player {sys.getsizeof(player)} bytes, Ghost {sys.getsizeof(ghost)} bytes, '
+          f'no __dict__: {not hasattr(player, "__dict__") and not hasattr(ghost, "__dict__")}')
+    for state_class in (engine.GameState, SwarmGameState):
+        reset, build = setup_time(state_class, 200 if quick else 2000)
+        print(f'\n{state_class.__name__}: reset() {reset * 1e6:.1f} us, '
+              f'new state {build * 1e6:.1f} us')
+        rows, collections = memory_over_games(state_class, games, max_ticks)
+        print(f'{"games":>8} {"traced KiB":>11} {"peak KiB":>9}')
+        for played, current, peak in rows:
+            print(f'{played:>8} {current / 1024:>11.1f} {peak / 1024:>9.1f}')
+        print(f'{collections} garbage collections in {games} games')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,105 @@
+import random
+import sys
+import time
+
+from engine import MAZE
+from mazes import as_grid, free_cells, generate_maze
+from pathfinding import PathFinder
+
+# Compares the shared next-hop tables in pathfinding.py with the per-ghost
+# BFS that Ghost.find_path_to_player used to run.
+
+
+def legacy_find_path(maze, start, goal):
+    # The original Ghost.find_path_to_player BFS, kept here as the baseline
+    def get_valid_neighbors(pos):
+        row, col = pos
+        neighbors = []
+        for dr, dc in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
+            new_row, new_col = row + dr, col + dc
+            if (0 <= new_row < len(maze) and
+                0 <= new_col < len(maze[0]) and
+                maze[new_row][new_col] == 0):
+                neighbors.append((new_row, new_col))
+        return neighbors
+
+    if start == goal:
+        return []
+
+    queue = [(start, [])]
+    visited = {start}
+
+    while queue:
+        current, path = queue.pop(0)
+
+        for next_pos in get_valid_neighbors(current):
+            if next_pos not in visited:
+                visited.add(next_pos)
+                new_path = path + [next_pos]
+                if next_pos == goal:
+                    return new_path
+                queue.append((next_pos, new_path))
+
+    return []
+
+
+def make_queries(maze, count, goals, seed=0):
+    # Several ghosts chasing a handful of goals, like a real game does
+    rng = random.Random(seed)
+    cells = free_cells(maze)
+    targets = rng.sample(cells, goals)
+    return [(rng.choice(cells), rng.choice(targets)) for _ in range(count)]
+
+
+def time_calls(fn, queries):
+    start = time.perf_counter()
+    for query in queries:
+        fn(*query)
+    return time.perf_counter() - start
+
+
+def bench_maze(name, maze, count, goals):
+    queries = make_queries(maze, count, goals)
+
+    # The old code indexed nested lists, so give the baseline those
+    nested = as_grid(maze).tolist()
+    legacy = time_calls(lambda s, g: legacy_find_path(nested, s, g), queries)
+
+    finder = PathFinder(maze)
+    shared_path = time_calls(finder.find_path, queries)
+    shared_step = time_calls(finder.next_step, queries)
+
+    # Sanity check: both return shortest paths of the same length
+    for start, goal in queries[:50]:
+        assert len(legacy_find_path(nested, start, goal)) == len(finder.find_path(start, goal))
+
+    setup_start = time.perf_counter()
+    all_pairs = None
+    if as_grid(maze).size <= 2500:
+        all_pairs = PathFinder(maze)
+        all_pairs.precompute_all()
+    setup = time.perf_counter() - setup_start
+    lookup = time_calls(all_pairs.next_step, queries) if all_pairs else None
+
+    per_call = lambda total: total / count * 1e6
+    print(f'{name:>12} {count:>6} queries, {goals:>3} goals')
+    print(f'{"":>12}   legacy BFS            {per_call(legacy):10.1f} us/query')
+    print(f'{"":>12}   shared find_path      {per_call(shared_path):10.1f} us/query '
+          f'({finder.bfs_runs} BFS runs)')
+    print(f'{"":>12}   shared next_step      {per_call(shared_step):10.1f} us/query')
+    if all_pairs:
+        print(f'{"":>12}   all-pairs next_step   {per_call(lookup):10.1f} us/query '
+              f'(precompute {setup * 1000:.1f} ms)')
+
+
+def main(argv):
+    quick = '--quick' in argv
+    bench_maze('20x15', MAZE, 2000, 8)
+    sizes = [(41, 41), (101, 101)] if quick else [(41, 41), (101, 101), (201, 201), (401, 401)]
+    for rows, cols in sizes:
+        count = 200 if rows > 150 else 500
+        bench_maze(f'{cols}x{rows}', generate_maze(rows, cols, seed=rows), count, 8)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,90 @@
+import math
+import random
+import sys
+import time
+
+import engine
+from engine import CELL_SIZE
+from mazes import generate_maze
+
+# Pellet bookkeeping per tick: the PelletField's single tile lookup against
+# the list of pellet objects it replaced, which tested the distance to every
+# pellet and rebuilt the list, from 10 pellets up to one on every tile.
+
+
+class LegacyPellet:
+    # Placement and collision as engine.Pellet used to do them
+    def __init__(self, maze, rng):
+        rows, cols = maze.shape
+        while True:
+            col = rng.randint(1, cols - 2)
+            row = rng.randint(1, rows - 2)
+            if maze[row, col] == 0:
+                self.x = col * CELL_SIZE + CELL_SIZE // 2
+                self.y = row * CELL_SIZE + CELL_SIZE // 2
+                break
+        self.radius = engine.PELLET_RADIUS
+
+    def touches(self, player):
+        dist = math.hypot(self.x - player.x, self.y - player.y)
+        return dist < player.radius + self.radius
+
+
+def legacy_tick(pellets, player):
+    remaining = []
+    for pellet in pellets:
+        if not pellet.touches(player):
+            remaining.append(pellet)
+    return remaining
+
+
+def walk(state, ticks, update):
+    # The player wanders like someone holding keys; returns seconds per tick
+    rng = random.Random(0)
+    action = engine.RIGHT
+    player = state.player
+    elapsed = 0.0
+    for _ in range(ticks):
+        if rng.random() < 0.05:
+            action = rng.choice(engine.ACTIONS)
+        player.move(action)
+        start = time.perf_counter()
+        update()
+        elapsed += time.perf_counter() - start
+    return elapsed / ticks
+
+
+def main(argv):
+    ticks = 500 if '--quick' in argv else 3000
+    print(f'{"maze":>9} {"pellets":>8} {"setup ms":>9} {"list us/tick":>13} '
+          f'{"field us/tick":>14} {"speedup":>8}')
+    for rows, cols in ((15, 20), (101, 101)):
+        maze = generate_maze(rows, cols, seed=1)
+        state = engine.GameState(seed=1, maze=maze, num_ghosts=0)
+        for count in (10, 100, engine.FULL_PELLETS):
+            start = time.perf_counter()
+            state.num_pellets = count
+            state.place_pellets()
+            setup = time.perf_counter() - start
+            total = len(state.pellets)
+            field = state.pellets
+            player = state.player
+            field_time = walk(state, ticks,
+                              lambda: field.collect(player.x, player.y, player.radius))
+
+            pellets = [LegacyPellet(state.maze, random.Random(1)) for _ in range(total)]
+            state.player.reset_position()
+            holder = [pellets]
+
+            def update():
+                holder[0] = legacy_tick(holder[0], player)
+            list_time = walk(state, ticks, update)
+            state.player.reset_position()
+            print(f'{rows:>4}x{cols:<4} {total:8d} {setup * 1000:9.2f} '
+                  f'{list_time * 1e6:13.1f} {field_time * 1e6:14.2f} '
+                  f'{list_time / field_time:7.0f}x')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,79 @@
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import engine
+import replay
+from agents import holding_agent
+from mazes import generate_maze, load_maze, save_maze
+
+# Records a batch of scripted games the way pacman.py --record does, then
+# times replaying and checking all of them headless. A second session, on a
+# bigger maze with --ai-budget, is checked both on one reused state and with
+# a fresh state per game: a game must not depend on what ran before it.
+
+SCHEDULED_MAZE = (31, 41)
+SCHEDULED_BUDGETS = (20, 100, 400)
+
+
+def record_games(count, seed=0, max_ticks=5000, maze_path=None, **options):
+    rng = random.Random(seed)
+    maze = load_maze(maze_path) if maze_path else engine.MAZE
+    state = engine.GameState(seed=rng.randrange(replay.SEED_RANGE), maze=maze, **options)
+    recorder = replay.Recorder(state, maze_path)
+    for _ in range(count):
+        state.reset(rng.randrange(replay.SEED_RANGE))
+        recorder.begin(state)
+        policy = holding_agent(state.seed)
+        while not state.game_over and state.tick < max_ticks:
+            action = policy(state)
+            state.step(action)
+            recorder.record(action)
+        recorder.end(state)
+    return recorder.replay
+
+
+def main(argv):
+    count = 100 if '--quick' in argv else 1000
+    start = time.perf_counter()
+    recorded = record_games(count)
+    record_time = time.perf_counter() - start
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.rep')
+    recorded.save(path)
+    size = os.path.getsize(path)
+    ticks = sum(game.ticks for game in recorded.games)
+
+    start = time.perf_counter()
+    loaded = replay.Replay.load(path)
+    mismatches = replay.check(loaded)
+    replay_time = time.perf_counter() - start
+    os.remove(path)
+
+    print(f'{count} games, {ticks} ticks ({ticks / engine.TICK_RATE / 60:.1f} minutes of play)')
+    print(f'  recording     {size} bytes ({size / count:.1f} bytes/game, '
+          f'{size * 8 / ticks:.3f} bits/tick)')
+    print(f'  record+play   {record_time:.2f}s')
+    print(f'  replay+check  {replay_time:.2f}s ({ticks / replay_time:,.0f} ticks/s), '
+          f'{len(mismatches)} mismatched')
+
+    maze_path = os.path.join(os.path.dirname(path), 'scheduled.maze')
+    save_maze(maze_path, generate_maze(*SCHEDULED_MAZE, seed=3))
+    print(f'{count // 2} games per budget on a {SCHEDULED_MAZE[0]}x{SCHEDULED_MAZE[1]} maze '
+          'with --ai-budget, replayed on a reused / fresh state')
+    failed = bool(mismatches)
+    for budget in SCHEDULED_BUDGETS:
+        scheduled = record_games(count // 2, budget, 3000, maze_path, ai_budget=budget)
+        reused = replay.check(scheduled)
+        fresh = replay.check(scheduled, fresh=True)
+        print(f'  budget {budget:<5} {len(reused)} / {len(fresh)} mismatched')
+        failed = failed or reused or fresh
+    shutil.rmtree(os.path.dirname(path))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
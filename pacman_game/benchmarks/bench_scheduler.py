@@ -0,0 +1,64 @@
+import random
+import sys
+import time
+
+import engine
+from mazes import generate_maze
+from profiler import percentile
+
+# Per-tick ghost update time with and without a GhostScheduler. Unscheduled
+# ghosts all replan on the same tick, so the worst ticks cost many times the
+# median; with a budget the work is spread out and p99/max come down to
+# roughly the budget's worth of path searching.
+
+BUDGETS = [None, 4000, 1000]
+
+
+def update(state):
+    # Every ghost moves, like bench_ghosts; GameState.move_ghosts would stop
+    # at the first ghost touching the player
+    player = state.player
+    if state.scheduler:
+        state.scheduler.update(state)
+    for ghost in state.ghosts:
+        ghost.move(player.x, player.y)
+        ghost.touches(player)
+
+
+def run(maze, ghosts, budget, ticks):
+    state = engine.GameState(seed=1, maze=maze, num_ghosts=ghosts, ai_budget=budget)
+    rng = random.Random(0)
+    action = engine.RIGHT
+    times = []
+    for _ in range(ticks):
+        # The player wanders like someone holding keys
+        if rng.random() < 0.05:
+            action = rng.choice(engine.ACTIONS)
+        state.player.move(action)
+        start = time.perf_counter()
+        update(state)
+        times.append(time.perf_counter() - start)
+    replans = state.scheduler.replans if state.scheduler else None
+    return times, replans
+
+
+def main(argv):
+    quick = '--quick' in argv
+    ticks = 600 if quick else 2400
+    sizes = [(31, 41)] if quick else [(31, 41), (101, 101)]
+    print(f'{"maze":>9} {"ghosts":>7} {"budget":>7} {"p50 us":>9} {"p99 us":>9} '
+          f'{"max us":>9} {"replans":>8}')
+    for rows, cols in sizes:
+        maze = generate_maze(rows, cols, seed=1)
+        for ghosts in (30, 300):
+            for budget in BUDGETS:
+                times, replans = run(maze, ghosts, budget, ticks)
+                print(f'{rows:>4}x{cols:<4} {ghosts:7d} {budget or "-":>7} '
+                      f'{percentile(times, 0.5) * 1e6:9.1f} '
+                      f'{percentile(times, 0.99) * 1e6:9.1f} {max(times) * 1e6:9.1f} '
+                      f'{replans if replans is not None else "-":>8}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
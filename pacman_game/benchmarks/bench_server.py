@@ -0,0 +1,65 @@
+import multiprocessing
+import sys
+import time
+
+import engine
+import server
+from transport import TcpServerTransport, UdpTransport
+
+# Runs the multiplayer server for a few seconds against local bot clients
+# and reports its tick time and the bandwidth each client uses. The bots
+# run in a child process so their work isn't charged to the server's ticks
+# (on a single core they still compete for it).
+
+TICK_RATE = 30
+
+
+def bots_process(address, players, spectators, seconds, tcp):
+    server.run_bots(address, players, spectators, seconds, tcp)
+
+
+def measure(players, spectators, seconds, tcp=False):
+    game = server.MultiplayerState(0, num_ghosts=engine.NUM_GHOSTS * 2,
+                                   num_pellets=engine.NUM_PELLETS * 5,
+                                   tick_rate=TICK_RATE)
+    transport = TcpServerTransport() if tcp else UdpTransport()
+    host = server.GameServer(game, transport)
+    bots = multiprocessing.Process(target=bots_process,
+                                   args=(transport.address, players, spectators,
+                                         seconds + 1, tcp))
+    bots.start()
+    try:
+        # Let every bot join before measuring
+        deadline = time.perf_counter() + 5
+        while len(host.clients) < players + spectators and time.perf_counter() < deadline:
+            host.tick()
+            time.sleep(1 / TICK_RATE)
+        for client in host.clients.values():
+            client.bytes_sent = client.snapshots = client.full_snapshots = 0
+            client.joined = time.perf_counter()
+        host.tick_times.clear()
+        host.run(seconds)
+        return host.stats()
+    finally:
+        bots.join()
+        transport.close()
+
+
+def main(argv):
+    quick = '--quick' in argv
+    tcp = '--tcp' in argv
+    seconds = 1.5 if quick else 5
+    print(f'{"TCP" if tcp else "UDP"}, {TICK_RATE} ticks/s, {seconds}s per run')
+    print(f'{"players":>8} {"spectators":>10} {"tick p50":>9} {"p99":>7} {"max":>7} '
+          f'{"bytes/s/client":>15} {"full":>5}')
+    for players, spectators in ([(1, 0), (8, 4)] if quick else
+                                [(1, 0), (4, 0), (16, 0), (16, 16), (64, 0)]):
+        stats = measure(players, spectators, seconds, tcp)
+        print(f'{players:>8} {spectators:>10} {stats["tick_ms_p50"]:>7.3f}ms '
+              f'{stats["tick_ms_p99"]:>5.3f}ms {stats["tick_ms_max"]:>5.3f}ms '
+              f'{stats["bytes_per_second_per_client"]:>15} {stats["full_snapshots"]:>5}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,63 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Time to first frame of pacman.main(), imports included, with assets loaded
+# on the background threads versus one after another (ASSET_WORKERS = 0),
+# from an empty and from a populated asset cache. Each run is a fresh
+# process; sound is on, through SDL's dummy audio driver.
+
+RUN_SNIPPET = '''
+import json, os, time
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+start = time.perf_counter()
+import pygame
+import pacman
+imported = time.perf_counter() - start
+pacman.CACHE_DIR = {cache_dir!r}
+pacman.ASSET_WORKERS = {workers}
+pygame.event.get = lambda: [pygame.event.Event(pygame.QUIT)]  # Stop after one frame
+pacman.main(seed=1, maze={maze!r}, sound=True)
+times = dict(pacman.startup_times, imports=imported)
+times['total'] = imported + times['first_frame']
+print(json.dumps(times))
+'''
+
+
+def run(cache_dir, workers, maze=None):
+    code = RUN_SNIPPET.format(cache_dir=cache_dir, workers=workers, maze=maze)
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv):
+    repeat = 3 if '--quick' in argv else 9
+    print(f'time to first frame, median of {repeat} runs (ms)')
+    print(f'{"":24} {"imports":>8} {"init":>8} {"first frame":>12} {"total":>8}')
+    for workers in (0, 4):
+        label = 'sequential' if workers == 0 else f'{workers} asset threads'
+        for cache in ('cold', 'warm'):
+            runs = []
+            with tempfile.TemporaryDirectory() as cache_dir:
+                for _ in range(repeat):
+                    if cache == 'warm':
+                        run(cache_dir, workers)  # Populate the cache
+                        runs.append(run(cache_dir, workers))
+                    else:
+                        with tempfile.TemporaryDirectory() as empty:
+                            runs.append(run(empty, workers))
+            row = {key: statistics.median(times[key] for times in runs) * 1000
+                   for key in ('imports', 'init', 'first_frame', 'total')}
+            print(f'{label + ", " + cache:24} {row["imports"]:8.1f} {row["init"]:8.1f} '
+                  f'{row["first_frame"]:12.1f} {row["total"]:8.1f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,40 @@
+import statistics
+import sys
+import time
+
+import batch
+
+# Lowering the tick rate buys simulated game time per CPU-second, but with
+# end-of-step collision tests the games stop being the same game: ghosts
+# pass through Pacman and he skips pellets. Swept collision should keep
+# survival time and pellets eaten level at every tick rate.
+
+MAX_SECONDS = 300
+
+
+def measure(tick_rate, swept, games):
+    config = batch.BatchConfig(agent='greedy', tick_rate=tick_rate, swept=swept,
+                               max_ticks=MAX_SECONDS * tick_rate)
+    start = time.perf_counter()
+    results = list(batch.run_batch(config, 0, games, workers=0))
+    elapsed = time.perf_counter() - start
+    seconds = [result['ticks'] / tick_rate for result in results]
+    pellets = sum(result['pellets'] for result in results)
+    return sum(seconds) / elapsed, statistics.mean(seconds), pellets * 60 / sum(seconds)
+
+
+def main(argv):
+    games = 40 if '--quick' in argv else 300
+    print(f'{games} greedy-agent games per row on the classic board')
+    print(f'{"collision":>9} {"ticks/s":>8} {"game-s/cpu-s":>13} {"survived":>9} '
+          f'{"pellets/min":>12}')
+    for swept in (False, True):
+        for tick_rate in (60, 20, 10, 5, 3):
+            rate, survived, pellets = measure(tick_rate, swept, games)
+            print(f'{"swept" if swept else "end":>9} {tick_rate:8d} {rate:13.0f} '
+                  f'{survived:8.1f}s {pellets:12.2f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
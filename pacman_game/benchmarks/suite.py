@@ -0,0 +1,270 @@
+import os
+
+# The suite draws with pygame, so make sure it never needs a real display
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+import pygame
+
+import engine
+import pacman
+from mazes import free_cells, generate_maze
+from swarm import SwarmGameState
+
+# Times each hot path of the game in isolation and a full frame, over a few
+# maze sizes and entity counts. Results are plain JSON so they can be saved
+# as a baseline and compared on the next run.
+
+RESULTS_VERSION = 1
+
+FULL_MAZES = {
+    '20x15': None,  # engine.MAZE
+    '41x31': (31, 41),
+    '101x75': (75, 101),
+}
+QUICK_MAZES = {
+    '20x15': None,
+    '41x31': (31, 41),
+}
+
+
+def build_maze(shape):
+    if shape is None:
+        return engine.MAZE
+    rows, cols = shape
+    return generate_maze(rows, cols, seed=rows * cols)
+
+
+def measure(fn, number, repeat):
+    # Median and best time per call in microseconds
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number * 1e6)
+    return statistics.median(samples), min(samples)
+
+
+class Suite:
+    def __init__(self, quick=False):
+        self.quick = quick
+        self.mazes = QUICK_MAZES if quick else FULL_MAZES
+        self.repeat = 3 if quick else 5
+        self.results = []
+
+    def record(self, name, params, fn, number):
+        median, best = measure(fn, number, self.repeat)
+        self.results.append({'name': name, 'params': params,
+                             'us_per_call': round(median, 3), 'best_us': round(best, 3)})
+        label = ' '.join(f'{k}={v}' for k, v in params.items())
+        print(f'  {name:<24} {label:<40} {median:12.2f} us')
+
+    def use_camera(self, state):
+        # Mazes bigger than the screen scroll, as they do in the game
+        pacman.camera.set_world((state.width, state.height))
+        pacman.camera.follow(state.player.x, state.player.y)
+
+    def make_walls(self, state):
+        return pacman.ChunkedWallLayer(state.maze_data, engine.CELL_SIZE,
+                                       pacman.WALL_COLOR, pacman.BACKGROUND_COLOR)
+
+    def make_state(self, maze, ghosts=engine.NUM_GHOSTS, pellets=engine.NUM_PELLETS):
+        return pacman.RenderedGameState(seed=1, maze=maze, num_ghosts=ghosts,
+                                        num_pellets=pellets)
+
+    def bench_pathfinding(self, maze_name, maze):
+        state = self.make_state(maze)
+        ghost = state.ghosts[0]
+        finder = state.pathfinder
+        rng = random.Random(0)
+        cells = free_cells(maze)
+        start = rng.choice(cells)
+        ghost.x = start[1] * engine.CELL_SIZE + engine.CELL_SIZE // 2
+        ghost.y = start[0] * engine.CELL_SIZE + engine.CELL_SIZE // 2
+
+        # Goals near, halfway and as far away as the maze allows
+        by_distance = sorted((finder.distance(cell, start), cell) for cell in cells
+                             if finder.distance(cell, start) > 0)
+        picks = {'near': by_distance[min(4, len(by_distance) - 1)],
+                 'mid': by_distance[len(by_distance) // 2],
+                 'far': by_distance[-1]}
+        for label, (distance, goal) in picks.items():
+            goal_x = goal[1] * engine.CELL_SIZE + engine.CELL_SIZE // 2
+            goal_y = goal[0] * engine.CELL_SIZE + engine.CELL_SIZE // 2
+            params = {'maze': maze_name, 'goal': label, 'distance': distance}
+
+            def cold():
+                finder._tables.clear()
+                ghost.find_path_to_player(goal_x, goal_y)
+            self.record('find_path.cold', params, cold, 20)
+            self.record('find_path.warm', params,
+                        lambda: ghost.find_path_to_player(goal_x, goal_y), 500)
+
+    def bench_collision(self, maze_name, maze):
+        state = self.make_state(maze)
+        player = state.player
+        rng = random.Random(0)
+        points = [(rng.uniform(0, state.width), rng.uniform(0, state.height))
+                  for _ in range(256)]
+        index = [0]
+
+        def can_move():
+            x, y = points[index[0] & 255]
+            index[0] += 1
+            player.can_move(x, y)
+        self.record('Player.can_move', {'maze': maze_name}, can_move, 5000)
+        self.record('PelletField.collect', {'maze': maze_name},
+                    lambda: state.pellets.collect(player.x, player.y, player.radius), 5000)
+
+    def bench_swarm(self, maze_name, maze, ghosts):
+        state = SwarmGameState(seed=1, maze=maze, num_ghosts=ghosts)
+        swarm = state.swarm
+        player = state.player
+
+        def tick():
+            swarm.move(player.x, player.y)
+            swarm.touches(player)
+        self.record('GhostSwarm.move', {'maze': maze_name, 'ghosts': ghosts}, tick, 200)
+
+    def bench_draw(self, maze_name, maze):
+        state = self.make_state(maze)
+        walls = self.make_walls(state)
+        for _ in range(30):
+            state.step(engine.RIGHT)
+        self.use_camera(state)
+        params = {'maze': maze_name}
+        self.record('Player.draw', params, state.player.draw, 2000)
+        self.record('Ghost.draw', params, state.ghosts[0].draw, 2000)
+        full = self.make_state(maze, pellets=engine.FULL_PELLETS)
+        self.record('draw_pellets', dict(params, pellets='full'),
+                    lambda: pacman.draw_pellets(full.pellets), 500)
+        self.record('ChunkedWallLayer.draw', params,
+                    lambda: (walls.update(), walls.draw(pacman.screen, pacman.camera)), 200)
+        self.record('draw_score', params, lambda: pacman.draw_score(1230), 1000)
+        self.record('draw_game_over', params, lambda: pacman.draw_game_over(state), 200)
+
+    def bench_frame(self, maze_name, maze, ghosts, pellets):
+        # Everything one iteration of main() does, without the frame cap
+        state = self.make_state(maze, ghosts, pellets)
+        self.use_camera(state)
+        walls = self.make_walls(state)
+        rng = random.Random(0)
+        actions = [rng.choice(engine.ACTIONS) for _ in range(64)]
+        counter = [0]
+
+        def frame():
+            if state.game_over:
+                state.reset(1)
+            pygame.event.pump()
+            pacman.read_action()
+            state.step(actions[(counter[0] // 16) & 63])
+            counter[0] += 1
+            pacman.present_frame(state, walls)
+        params = {'maze': maze_name, 'ghosts': ghosts, 'pellets': pellets}
+        self.record('frame', params, frame, 60)
+
+    def run(self):
+        pacman.init()
+        for maze_name, shape in self.mazes.items():
+            maze = build_maze(shape)
+            print(f'maze {maze_name}')
+            self.bench_pathfinding(maze_name, maze)
+            self.bench_collision(maze_name, maze)
+            for ghosts in (100, 1000):
+                self.bench_swarm(maze_name, maze, ghosts)
+            self.bench_draw(maze_name, maze)
+            counts = ([(3, 10), (10, 100), (3, engine.FULL_PELLETS)] if self.quick else
+                      [(3, 10), (10, 100), (30, 300), (3, engine.FULL_PELLETS)])
+            for ghosts, pellets in counts:
+                self.bench_frame(maze_name, maze, ghosts, pellets)
+        pygame.quit()
+        return self.report()
+
+    def report(self):
+        return {
+            'version': RESULTS_VERSION,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'machine': platform.machine(),
+            'quick': self.quick,
+            'results': self.results,
+        }
+
+
+def result_key(result):
+    params = ','.join(f'{k}={v}' for k, v in sorted(result['params'].items()))
+    return f"{result['name']}[{params}]"
+
+
+def compare(report, baseline, threshold):
+    # Returns the results that got more than threshold (a fraction) slower
+    previous = {result_key(r): r for r in baseline['results']}
+    regressions = []
+    print(f'\ncompared with baseline from {baseline.get("created", "?")}')
+    for result in report['results']:
+        old = previous.get(result_key(result))
+        if not old or not old['us_per_call']:
+            continue
+        ratio = result['us_per_call'] / old['us_per_call']
+        marker = ''
+        if ratio > 1 + threshold:
+            marker = '  <-- REGRESSION'
+            regressions.append((result_key(result), ratio))
+        print(f'  {result_key(result):<70} {ratio:6.2f}x{marker}')
+    return regressions
+
+
+def load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.write('\n')
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Pacman performance benchmarks')
+    parser.add_argument('--quick', action='store_true',
+                        help='fewer mazes and repeats')
+    parser.add_argument('--json', metavar='PATH',
+                        help='write results as JSON to PATH')
+    parser.add_argument('--baseline', metavar='PATH',
+                        help='compare with a previously saved results file')
+    parser.add_argument('--save-baseline', metavar='PATH',
+                        help='write results to PATH for later comparison')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='slowdown (fraction) counted as a regression, default 0.25')
+    args = parser.parse_args(argv)
+
+    report = Suite(quick=args.quick).run()
+    if args.json:
+        save_json(args.json, report)
+    if args.save_baseline:
+        save_json(args.save_baseline, report)
+
+    if args.baseline:
+        regressions = compare(report, load_json(args.baseline), args.threshold)
+        if regressions:
+            print(f'\n{len(regressions)} benchmark(s) regressed by more than '
+                  f'{args.threshold:.0%}')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
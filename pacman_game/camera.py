@@ -0,0 +1,47 @@
+import pygame
+
+# Viewport onto a maze that may be bigger than the screen.
+#
+# The camera keeps a point (the player) centred, clamped so it never shows
+# anything outside the maze. Things are drawn at their world position minus
+# the camera's top-left corner, and anything outside visible_area() is not
+# drawn at all.
+
+
+class Camera:
+    def __init__(self, view_size, world_size=None):
+        self.width, self.height = view_size
+        self.x = 0
+        self.y = 0
+        self.set_world(world_size or view_size)
+
+    def set_world(self, world_size):
+        self.world_width, self.world_height = world_size
+        self.x = self.y = 0
+
+    def follow(self, x, y):
+        # Centre on (x, y); returns True if the view moved
+        new_x = min(max(0, int(x) - self.width // 2), max(0, self.world_width - self.width))
+        new_y = min(max(0, int(y) - self.height // 2), max(0, self.world_height - self.height))
+        moved = new_x != self.x or new_y != self.y
+        self.x = new_x
+        self.y = new_y
+        return moved
+
+    @property
+    def rect(self):
+        # The part of the world on screen
+        return pygame.Rect(self.x, self.y, self.width, self.height)
+
+    def visible_area(self, margin=0):
+        # World area whose contents can reach the screen, for culling points
+        # (sprite centres) that are up to `margin` pixels off the view
+        return pygame.Rect(self.x - margin, self.y - margin,
+                           self.width + 2 * margin, self.height + 2 * margin)
+
+    def covers_view(self):
+        # False when the world is smaller than the screen on either axis
+        return self.world_width >= self.width and self.world_height >= self.height
+
+    def to_screen(self, x, y):
+        return x - self.x, y - self.y
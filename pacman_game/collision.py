@@ -0,0 +1,158 @@
+import math
+
+from mazes import as_grid
+
+# Tile-grid collision index for the static maze.
+#
+# Walls are whole CELL_SIZE tiles, so instead of testing a box against every
+# wall rect we only look at the tiles the box covers: 1 to 4 bitmap lookups
+# for anything smaller than a tile, no matter how big the maze is.
+#
+# box_hits_wall tests a box where it ends up, which is all the game needs
+# while entities move a few pixels per tick. For longer steps (low tick
+# rates) the swept tests below resolve a whole step at once: sweep_box
+# slides a box along an axis until it touches a wall, find_opening finds
+# where along such a slide the box could turn, and paths_meet tells whether
+# two circles moving during the same tick ever overlapped. The swept tests
+# use exact coordinates rather than whole pixels, so boxes stop flush
+# against walls.
+
+
+class CollisionGrid:
+    def __init__(self, maze, cell_size):
+        grid = as_grid(maze)
+        self.rows, self.cols = grid.shape
+        self.cell_size = cell_size
+        # One byte per tile, 1 = wall
+        self.occupancy = bytearray((grid == 1).tobytes())
+
+    def is_wall(self, row, col):
+        # Anything outside the maze counts as open, as it did with wall rects
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            return self.occupancy[row * self.cols + col] == 1
+        return False
+
+    def box_hits_wall(self, x, y, width, height):
+        # Same overlap rule as pygame.Rect.colliderect against each wall tile
+        size = self.cell_size
+        first_col = max(0, math.floor(x / size))
+        last_col = min(self.cols - 1, math.ceil((x + width) / size) - 1)
+        first_row = max(0, math.floor(y / size))
+        last_row = min(self.rows - 1, math.ceil((y + height) / size) - 1)
+        occupancy = self.occupancy
+        cols = self.cols
+        for row in range(first_row, last_row + 1):
+            base = row * cols
+            for col in range(first_col, last_col + 1):
+                if occupancy[base + col]:
+                    return True
+        return False
+
+    def sweep_box(self, x, y, half, dx, dy, distance):
+        # Where a box of half-size half centred on (x, y) stops when it
+        # moves up to distance along the axis direction (dx, dy)
+        size = self.cell_size
+        if dx:
+            lead, side, step, tiles, lanes = x + dx * half, y, dx, self.cols, self.rows
+        else:
+            lead, side, step, tiles, lanes = y + dy * half, x, dy, self.rows, self.cols
+        first_lane = max(0, math.floor((side - half) / size))
+        last_lane = min(lanes - 1, math.ceil((side + half) / size) - 1)
+        # Tiles the leading edge enters on the way, nearest first
+        if step > 0:
+            entered = range(max(0, math.ceil(lead / size)),
+                            min(tiles - 1, math.ceil((lead + distance) / size) - 1) + 1)
+        else:
+            entered = range(min(tiles - 1, math.floor(lead / size) - 1),
+                            max(0, math.floor((lead - distance) / size)) - 1, -1)
+        is_wall = self.is_wall
+        for tile in entered:
+            for lane in range(first_lane, last_lane + 1):
+                if is_wall(lane, tile) if dx else is_wall(tile, lane):
+                    edge = tile * size if step > 0 else (tile + 1) * size
+                    stop = edge - step * half
+                    return (stop, y) if dx else (x, stop)
+        return (x + dx * distance, y + dy * distance)
+
+    def find_opening(self, x, y, half, direction, turn, distance):
+        # The first point within distance along direction where the box can
+        # move on into the next row or column of tiles towards turn, or
+        # None. Turning around, or turning while standing still, can only
+        # happen where the box is now.
+        dx, dy = direction
+        turn_x, turn_y = turn
+        if not (dx * turn_y or dy * turn_x):
+            if self.sweep_box(x, y, half, turn_x, turn_y, half) != (x, y):
+                return (x, y)
+            return None
+        size = self.cell_size
+        if dx:
+            along, across, step, turning, lanes, tiles = x, y, dx, turn_y, self.rows, self.cols
+        else:
+            along, across, step, turning, lanes, tiles = y, x, dy, turn_x, self.cols, self.rows
+        edge = across + turning * half
+        if turning > 0:
+            lane = math.ceil(edge / size)
+        else:
+            lane = math.floor(edge / size) - 1
+        if not 0 <= lane < lanes:
+            return (x, y)
+        # Slide no further than the box can go, then step past each run of
+        # wall tiles on the turning side until the box has a gap to enter
+        stop = self.sweep_box(x, y, half, dx, dy, distance)
+        end = stop[0] if dx else stop[1]
+        is_wall = self.is_wall
+        position = along
+        while (position - end) * step <= 0:
+            first = max(0, math.floor((position - half) / size))
+            last = min(tiles - 1, math.ceil((position + half) / size) - 1)
+            blocked = [tile for tile in range(first, last + 1)
+                       if (is_wall(lane, tile) if dx else is_wall(tile, lane))]
+            if not blocked:
+                return (position, y) if dx else (x, position)
+            if step > 0:
+                position = (max(blocked) + 1) * size + half
+            else:
+                position = min(blocked) * size - half
+        return None
+
+
+def paths_meet(path_a, path_b, distance):
+    # True if two points moving along timed paths come closer than distance
+    # at any moment. A path is [(t, x, y), ...] with t running from 0 to 1
+    # over the tick, in a straight line between keyframes.
+    times = sorted({t for t, _, _ in path_a} | {t for t, _, _ in path_b})
+    limit = distance * distance
+    ax, ay = _position_at(path_a, times[0])
+    bx, by = _position_at(path_b, times[0])
+    dx0, dy0 = bx - ax, by - ay
+    if dx0 * dx0 + dy0 * dy0 < limit:
+        return True
+    for t in times[1:]:
+        ax, ay = _position_at(path_a, t)
+        bx, by = _position_at(path_b, t)
+        dx1, dy1 = bx - ax, by - ay
+        # The gap changes linearly in between; find its closest approach
+        vx, vy = dx1 - dx0, dy1 - dy0
+        speed = vx * vx + vy * vy
+        if speed:
+            s = min(1.0, max(0.0, -(dx0 * vx + dy0 * vy) / speed))
+            gap_x, gap_y = dx0 + vx * s, dy0 + vy * s
+            if gap_x * gap_x + gap_y * gap_y < limit:
+                return True
+        dx0, dy0 = dx1, dy1
+    return dx0 * dx0 + dy0 * dy0 < limit
+
+
+def _position_at(path, t):
+    t0, x0, y0 = path[0]
+    if t <= t0:
+        return x0, y0
+    for t1, x1, y1 in path[1:]:
+        if t <= t1:
+            if t1 == t0:
+                return x1, y1
+            f = (t - t0) / (t1 - t0)
+            return x0 + (x1 - x0) * f, y0 + (y1 - y0) * f
+        t0, x0, y0 = t1, x1, y1
+    return x0, y0
@@ -0,0 +1,46 @@
+import pygame
+
+# Dirty-rectangle presentation for low fill-rate hardware.
+#
+# The static background (the maze) is kept in its own surface. Each frame
+# only the rectangles sprites covered last frame are restored from it, the
+# sprites are drawn on top, and just the old and new rectangles are pushed to
+# the display with pygame.display.update instead of flipping the whole screen.
+
+
+class DirtyRectRenderer:
+    def __init__(self, target, background):
+        self.target = target
+        self.background = background
+        self.previous = []
+        self.full_redraw = True
+        self.pixels_updated = 0
+
+    def set_background(self, background):
+        self.background = background
+        self.invalidate()
+
+    def invalidate(self):
+        # Next frame repaints and presents the whole screen
+        self.full_redraw = True
+
+    def begin_frame(self):
+        # Erase last frame's sprites by restoring the background under them
+        if self.full_redraw:
+            self.target.blit(self.background, (0, 0))
+            return
+        for rect in self.previous:
+            self.target.blit(self.background, rect, rect)
+
+    def end_frame(self, rects):
+        # rects are the screen areas drawn this frame
+        rects = [rect for rect in rects if rect]
+        if self.full_redraw:
+            pygame.display.flip()
+            self.full_redraw = False
+            self.pixels_updated = self.target.get_width() * self.target.get_height()
+        else:
+            changed = self.previous + rects
+            pygame.display.update(changed)
+            self.pixels_updated = sum(rect.width * rect.height for rect in changed)
+        self.previous = rects
@@ -0,0 +1,604 @@
+import math
+import random
+
+import numpy
+
+from collision import CollisionGrid, paths_meet
+from mazes import CLASSIC_MAZE, MazeData, as_grid, load_maze
+from pathfinding import PathFinder
+
+# Headless game simulation. Nothing in here touches pygame, so games can be
+# stepped on machines without a display or audio device.
+
+CELL_SIZE = 40
+# Speeds (pixels) and timers (ticks) below are tuned for TICK_RATE ticks per
+# second; GameState rescales them for other tick rates
+TICK_RATE = 60
+PLAYER_SPEED = 3.5
+GHOST_SPEED = 2
+NUM_GHOSTS = 3
+NUM_PELLETS = 10
+# num_pellets value for a pellet on every free tile, as in the arcade game
+FULL_PELLETS = 'full'
+PELLET_RADIUS = 4
+
+# Actions accepted by GameState.step / Player.move
+NOOP = 0
+LEFT = 1
+RIGHT = 2
+UP = 3
+DOWN = 4
+ACTIONS = (NOOP, LEFT, RIGHT, UP, DOWN)
+
+# Movement vector and mouth direction (degrees) for each action
+ACTION_DIRECTIONS = {
+    LEFT: ((-1, 0), 180),
+    RIGHT: ((1, 0), 0),
+    UP: ((0, -1), 90),
+    DOWN: ((0, 1), 270),
+}
+
+# Events reported by GameState.step
+EVENT_CHOMP = 'chomp'
+EVENT_PELLET = 'pellet'
+EVENT_DEATH = 'death'
+EVENT_CLEARED = 'cleared'
+
+# The shipped 20x15 board, memory-mapped from levels/classic.maze
+MAZE = load_maze(CLASSIC_MAZE)
+
+
+def pellet_count(text):
+    # argparse type for --pellets options: a number or 'full'
+    return FULL_PELLETS if text == FULL_PELLETS else int(text)
+
+
+class Player:
+    # Slots keep entities small and their attributes fixed; GameState
+    # resets the same objects for every game instead of building new ones
+    __slots__ = ('grid', 'radius', 'x', 'y', 'prev_x', 'prev_y', 'direction', 'speed',
+                 'score', 'current_direction', 'next_direction', 'chomp_timer', 'is_dead',
+                 'swept', 'motion')
+
+    def __init__(self, grid):
+        # The game's CollisionGrid, shared by every player
+        self.grid = grid
+        self.radius = 15
+        self.reset()
+
+    def reset(self):
+        # Back to the state of a new player
+        self.reset_position()
+        self.prev_x = self.x
+        self.prev_y = self.y
+        self.direction = 0
+        self.speed = PLAYER_SPEED
+        self.score = 0
+        self.current_direction = (0, 0)
+        self.next_direction = (0, 0)
+        self.chomp_timer = 0
+        self.is_dead = False
+        # Set by GameState for swept collision: each move then covers the
+        # whole step and leaves its timed path in motion (see collision.py)
+        self.swept = False
+        self.motion = None
+
+    def reset_position(self):
+        self.x = CELL_SIZE * 1.5
+        self.y = CELL_SIZE * 1.5
+
+    def can_move(self, x, y):
+        # Truncate like pygame.Rect did so movement matches the original game
+        return not self.grid.box_hits_wall(int(x - self.radius), int(y - self.radius),
+                                           self.radius * 2, self.radius * 2)
+
+    def move(self, action=NOOP):
+        # Update next_direction based on the requested action
+        if action in ACTION_DIRECTIONS:
+            self.next_direction, self.direction = ACTION_DIRECTIONS[action]
+        if self.swept:
+            self.sweep()
+            return
+
+        # Try to move in next_direction if it's different from current
+        if self.next_direction != self.current_direction:
+            next_x = self.x + self.next_direction[0] * self.speed
+            next_y = self.y + self.next_direction[1] * self.speed
+            if self.can_move(next_x, next_y):
+                self.current_direction = self.next_direction
+
+        # Move in current direction if possible
+        next_x = self.x + self.current_direction[0] * self.speed
+        next_y = self.y + self.current_direction[1] * self.speed
+        if self.can_move(next_x, next_y):
+            self.x = next_x
+            self.y = next_y
+        else:
+            # Try to slide along walls when hitting them at an angle
+            next_x = self.x + self.current_direction[0] * self.speed
+            if self.can_move(next_x, self.y):
+                self.x = next_x
+
+            next_y = self.y + self.current_direction[1] * self.speed
+            if self.can_move(self.x, next_y):
+                self.y = next_y
+
+    def sweep(self):
+        # move() for steps of any length: slides along the current direction,
+        # turning at the first opening towards next_direction on the way, and
+        # stops flush against walls instead of short of them
+        grid = self.grid
+        distance = self.speed
+        motion = [(0.0, self.x, self.y)]
+        if self.next_direction != self.current_direction:
+            opening = grid.find_opening(self.x, self.y, self.radius, self.current_direction,
+                                        self.next_direction, distance)
+            if opening is not None:
+                travelled = abs(opening[0] - self.x) + abs(opening[1] - self.y)
+                if travelled:
+                    distance -= travelled
+                    motion.append((1 - distance / self.speed, opening[0], opening[1]))
+                self.x, self.y = opening
+                self.current_direction = self.next_direction
+        dx, dy = self.current_direction
+        if dx or dy:
+            self.x, self.y = grid.sweep_box(self.x, self.y, self.radius, dx, dy, distance)
+            travelled = abs(self.x - motion[-1][1]) + abs(self.y - motion[-1][2])
+            motion.append((motion[-1][0] + travelled / self.speed, self.x, self.y))
+        if motion[-1][0] < 1:
+            motion.append((1.0, self.x, self.y))
+        self.motion = motion
+
+    def collect_pellet(self):
+        # Returns True when the chomp sound should be played
+        self.score += 10
+        chomp = self.chomp_timer <= 0
+        if chomp:
+            self.chomp_timer = 10
+        self.chomp_timer -= 1
+        return chomp
+
+    def die(self):
+        # Returns True only the first time the player dies
+        if self.is_dead:
+            return False
+        self.is_dead = True
+        return True
+
+
+class Ghost:
+    __slots__ = ('maze', 'rng', 'pathfinder', 'radius', 'x', 'y', 'prev_x', 'prev_y',
+                 'speed', 'scatter_corner', 'path', 'path_update_counter',
+                 'path_update_frequency', 'chase_counter', 'chase_mode', 'scatter_time',
+                 'chase_time', 'scheduled', 'swept', 'motion')
+
+    def __init__(self, maze, rng, pathfinder=None):
+        self.maze = as_grid(maze)
+        self.rng = rng
+        # Ghosts in one game share a PathFinder so per-goal tables are reused
+        self.pathfinder = pathfinder or PathFinder(maze)
+        self.radius = 15
+        self.path = []
+        self.reset()
+
+    def reset(self):
+        # Back to the state of a new ghost, with a new spawn and scatter
+        # corner drawn from the rng
+        self.respawn()
+        self.prev_x = self.x
+        self.prev_y = self.y
+        self.path.clear()
+        self.path_update_counter = 0
+        self.path_update_frequency = 45
+        self.chase_counter = 0
+        self.chase_mode = True
+        self.scatter_time = 180
+        self.chase_time = 300
+        # Set by a scheduler.GhostScheduler, which then decides when the
+        # ghost replans
+        self.scheduled = False
+        # Set by GameState for swept collision, as for Player
+        self.swept = False
+        self.motion = None
+
+    def respawn(self):
+        rows, cols = self.maze.shape
+        width = cols * CELL_SIZE
+        height = rows * CELL_SIZE
+        corners = [
+            (CELL_SIZE * 1.5, height - CELL_SIZE * 1.5),
+            (width - CELL_SIZE * 1.5, CELL_SIZE * 1.5),
+            (width - CELL_SIZE * 1.5, height - CELL_SIZE * 1.5)
+        ]
+        self.x, self.y = self.rng.choice(corners)
+        self.speed = GHOST_SPEED
+        self.scatter_corner = self.rng.choice(corners)  # Assign a corner to scatter to
+
+    def get_grid_pos(self, x, y):
+        return (int(y // CELL_SIZE), int(x // CELL_SIZE))
+
+    def get_valid_neighbors(self, pos):
+        row, col = pos
+        rows, cols = self.maze.shape
+        neighbors = []
+        for dr, dc in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
+            new_row, new_col = row + dr, col + dc
+            if (0 <= new_row < rows and
+                0 <= new_col < cols and
+                self.maze[new_row, new_col] == 0):
+                neighbors.append((new_row, new_col))
+        return neighbors
+
+    def find_path_to_player(self, player_x, player_y):
+        start = self.get_grid_pos(self.x, self.y)
+        goal = self.get_grid_pos(player_x, player_y)
+        return self.pathfinder.find_path(start, goal)
+
+    def update_mode(self):
+        # Advance the chase/scatter timer; returns True when the mode switched
+        self.chase_counter += 1
+        if self.chase_mode and self.chase_counter >= self.chase_time:
+            self.chase_mode = False
+            self.chase_counter = 0
+            return True
+        elif not self.chase_mode and self.chase_counter >= self.scatter_time:
+            self.chase_mode = True
+            self.chase_counter = 0
+            return True
+        return False
+
+    def replan(self, player_x, player_y):
+        if self.chase_mode:
+            self.path = self.find_path_to_player(player_x, player_y)
+        else:
+            # In scatter mode, head to scatter corner
+            self.path = self.find_path_to_player(self.scatter_corner[0], self.scatter_corner[1])
+        self.path_update_counter = 0
+
+    def move(self, player_x, player_y):
+        if not self.scheduled:
+            self.update_mode()
+            # Update path periodically
+            self.path_update_counter += 1
+            if self.path_update_counter >= self.path_update_frequency:
+                self.replan(player_x, player_y)
+
+        if self.swept:
+            self.travel()
+            return
+        if not self.path:
+            return
+
+        # Get next target position from path
+        next_row, next_col = self.path[0]
+        target_x = next_col * CELL_SIZE + CELL_SIZE // 2
+        target_y = next_row * CELL_SIZE + CELL_SIZE // 2
+
+        # Move towards target
+        dx = target_x - self.x
+        dy = target_y - self.y
+        dist = math.hypot(dx, dy)
+
+        if dist < self.speed:
+            self.path.pop(0)
+        else:
+            if dist != 0:
+                self.x += (dx / dist) * self.speed
+                self.y += (dy / dist) * self.speed
+
+    def travel(self):
+        # The path following in move() for steps of any length: the whole
+        # step is used, passing as many tile centres as it reaches
+        distance = self.speed
+        motion = [(0.0, self.x, self.y)]
+        path = self.path
+        while path and distance > 0:
+            next_row, next_col = path[0]
+            target_x = next_col * CELL_SIZE + CELL_SIZE // 2
+            target_y = next_row * CELL_SIZE + CELL_SIZE // 2
+            dist = math.hypot(target_x - self.x, target_y - self.y)
+            if dist <= distance:
+                self.x, self.y = target_x, target_y
+                distance -= dist
+                path.pop(0)
+            else:
+                self.x += (target_x - self.x) / dist * distance
+                self.y += (target_y - self.y) / dist * distance
+                distance = 0
+            motion.append((1 - distance / self.speed, self.x, self.y))
+        if motion[-1][0] < 1:
+            motion.append((1.0, self.x, self.y))
+        self.motion = motion
+
+    def touches(self, player):
+        dist = math.hypot(self.x - player.x, self.y - player.y)
+        reach = player.radius + self.radius
+        if dist < reach:
+            return True
+        # Swept, they may have met during their moves if they ended up
+        # closer than the distance both covered
+        if self.swept and dist < reach + self.speed + player.speed:
+            return paths_meet(self.motion, player.motion, reach)
+        return False
+
+
+class PelletField:
+    # Every pellet on the board, as a count per tile (at most one). Pellets
+    # sit at tile centres, and the player can only reach the pellets on its
+    # own tile: the centre of any other tile is at least CELL_SIZE / 2 away,
+    # more than the two radii together. Collecting is therefore one lookup,
+    # whatever the number of pellets.
+    def __init__(self, maze, radius=PELLET_RADIUS):
+        data = maze if isinstance(maze, MazeData) else MazeData.from_grid(maze)
+        rows, cols = data.shape
+        self.rows = rows
+        self.cols = cols
+        self.radius = radius
+        self.counts = bytearray(rows * cols)
+        # The same counts as a (rows, cols) array, for batched reads
+        self.grid = numpy.frombuffer(self.counts, dtype=numpy.uint8).reshape(rows, cols)
+        self.remaining = 0
+        # Tiles emptied by the last collect call that took any pellets
+        self.eaten = []
+        # Tiles pellets are placed on: free and off the border row/column,
+        # like the rejection sampling this replaces
+        cells = data.free_cells
+        inside = ((cells[:, 0] >= 1) & (cells[:, 0] <= rows - 2) &
+                  (cells[:, 1] >= 1) & (cells[:, 1] <= cols - 2))
+        self.cells = (cells[inside, 0].astype(numpy.int64) * cols + cells[inside, 1]).tolist()
+
+    def __len__(self):
+        return self.remaining
+
+    def clear(self):
+        self.grid[:] = 0
+        self.remaining = 0
+
+    def scatter(self, count, rng):
+        # count pellets on distinct random tiles, or every tile if there
+        # are fewer
+        counts = self.counts
+        tiles = rng.sample(self.cells, min(count, len(self.cells)))
+        for index in tiles:
+            counts[index] = 1
+        self.remaining += len(tiles)
+
+    def fill(self, exclude=()):
+        # One pellet on every tile, like the arcade board, except the tiles
+        # (flat indices) in exclude
+        counts = self.counts
+        for index in self.cells:
+            if index not in exclude and not counts[index]:
+                counts[index] = 1
+                self.remaining += 1
+
+    def tile_of(self, x, y):
+        return int(y // CELL_SIZE) * self.cols + int(x // CELL_SIZE)
+
+    def position(self, index):
+        row, col = divmod(index, self.cols)
+        return col * CELL_SIZE + CELL_SIZE // 2, row * CELL_SIZE + CELL_SIZE // 2
+
+    def collect(self, x, y, radius):
+        # Removes the pellets a circle at (x, y) touches and returns how many
+        index = self.tile_of(x, y)
+        count = self.counts[index]
+        if not count:
+            return 0
+        pellet_x, pellet_y = self.position(index)
+        if math.hypot(pellet_x - x, pellet_y - y) >= radius + self.radius:
+            return 0
+        self.counts[index] = 0
+        self.remaining -= count
+        self.eaten = [index]
+        return count
+
+    def collect_along(self, motion, radius):
+        # collect() for a circle that moved along motion ([(t, x, y), ...]
+        # keyframes); takes every pellet it passed over on the way
+        size = CELL_SIZE
+        counts = self.counts
+        limit = radius + self.radius
+        collected = 0
+        eaten = []
+        segments = list(zip(motion, motion[1:])) or [(motion[0], motion[0])]
+        for (_, x0, y0), (_, x1, y1) in segments:
+            low_x, high_x = min(x0, x1), max(x0, x1)
+            low_y, high_y = min(y0, y1), max(y0, y1)
+            # Only the tiles the centre passed through: any other tile
+            # centre is at least CELL_SIZE / 2 away, out of reach
+            for row in range(int(low_y // size), int(high_y // size) + 1):
+                for col in range(int(low_x // size), int(high_x // size) + 1):
+                    if not (0 <= row < self.rows and 0 <= col < self.cols):
+                        continue
+                    index = row * self.cols + col
+                    count = counts[index]
+                    if not count:
+                        continue
+                    pellet_x, pellet_y = self.position(index)
+                    nearest_x = min(max(pellet_x, low_x), high_x)
+                    nearest_y = min(max(pellet_y, low_y), high_y)
+                    if math.hypot(pellet_x - nearest_x, pellet_y - nearest_y) < limit:
+                        counts[index] = 0
+                        collected += count
+                        eaten.append(index)
+        if eaten:
+            self.eaten = eaten
+        self.remaining -= collected
+        return collected
+
+    def tiles(self, rows=None, cols=None):
+        # Flat indices of the tiles holding pellets, optionally only within
+        # slices of rows and columns
+        if rows is None and cols is None:
+            return numpy.flatnonzero(self.grid)
+        rows = rows or slice(None)
+        cols = cols or slice(None)
+        found_rows, found_cols = numpy.nonzero(self.grid[rows, cols])
+        return (found_rows + (rows.start or 0)) * self.cols + found_cols + (cols.start or 0)
+
+
+class GameState:
+    # Entity classes; the pygame front end swaps in subclasses that can draw
+    player_class = Player
+    ghost_class = Ghost
+    # Optional profiler.FrameProfiler; step() reports its stages to it
+    profiler = None
+
+    def __init__(self, seed=None, maze=MAZE, num_ghosts=NUM_GHOSTS,
+                 num_pellets=NUM_PELLETS, tick_rate=TICK_RATE, ai_budget=None,
+                 swept=False):
+        # maze may be a MazeData (e.g. from load_maze) or any 2D grid.
+        # num_pellets is a count or FULL_PELLETS. With swept, moves use the
+        # swept collision tests, which stay exact at any step length; needed
+        # at low tick rates, where entities move too far per tick for the
+        # end-of-step tests.
+        self.maze_data = maze if isinstance(maze, MazeData) else MazeData.from_grid(maze)
+        self.maze = self.maze_data.grid
+        self.tick_rate = tick_rate
+        self.swept = swept
+        self.num_ghosts = num_ghosts
+        self.num_pellets = num_pellets
+        rows, cols = self.maze.shape
+        self.width = cols * CELL_SIZE
+        self.height = rows * CELL_SIZE
+        self.grid = CollisionGrid(self.maze_data, CELL_SIZE)
+        self.pathfinder = PathFinder(self.maze_data)
+        self.pellets = PelletField(self.maze_data)
+        # With an ai_budget, a GhostScheduler replans ghosts on events and
+        # spreads the work over ticks; see scheduler.py
+        self.ai_budget = ai_budget
+        self.scheduler = None
+        if ai_budget:
+            from scheduler import GhostScheduler
+            self.scheduler = GhostScheduler(ai_budget)
+        self.rng = random.Random(seed)
+        self.player = None
+        self.ghosts = []
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        # Starts a new game with the same player, ghost and pellet objects,
+        # so games played back to back allocate next to nothing
+        self.seed = seed
+        self.rng.seed(seed)
+        if self.player is None:
+            self.player = self.player_class(self.grid)
+        else:
+            self.player.reset()
+        self.reset_ghosts()
+        if self.swept:
+            for entity in [self.player] + self.ghosts:
+                entity.swept = True
+        self.place_pellets()
+        self.apply_tick_rate()
+        if self.scheduler:
+            self.scheduler.reset(self)
+        self.save_positions()
+        self.tick = 0
+        self.game_over = False
+        self.won = False
+        self.events = []
+
+    def place_pellets(self):
+        pellets = self.pellets
+        pellets.clear()
+        if self.num_pellets == FULL_PELLETS:
+            # Not under the player, or the first tick would eat it
+            pellets.fill({pellets.tile_of(self.player.x, self.player.y)})
+        else:
+            pellets.scatter(self.num_pellets, self.rng)
+
+    def create_ghosts(self):
+        return [self.ghost_class(self.maze, self.rng, self.pathfinder)
+                for _ in range(self.num_ghosts)]
+
+    def reset_ghosts(self):
+        # Resetting draws from the rng in the same order as creating, so a
+        # seed plays the same game either way
+        if len(self.ghosts) != self.num_ghosts:
+            self.ghosts = self.create_ghosts()
+            return
+        for ghost in self.ghosts:
+            ghost.reset()
+
+    def apply_tick_rate(self):
+        # Keep real-time speeds and durations the same at any tick rate
+        scale = TICK_RATE / self.tick_rate
+        self.player.speed = PLAYER_SPEED * scale
+        for ghost in self.ghosts:
+            ghost.speed = GHOST_SPEED * scale
+            ghost.path_update_frequency = max(1, round(ghost.path_update_frequency / scale))
+            ghost.chase_time = max(1, round(ghost.chase_time / scale))
+            ghost.scatter_time = max(1, round(ghost.scatter_time / scale))
+
+    def save_positions(self):
+        # Positions before the next tick, for render interpolation
+        for entity in [self.player] + self.ghosts:
+            entity.prev_x = entity.x
+            entity.prev_y = entity.y
+
+    @property
+    def score(self):
+        return self.player.score
+
+    def step(self, action=NOOP):
+        # Advance the simulation by one tick and return the events it produced
+        self.events = []
+        if self.game_over:
+            return self.events
+
+        self.tick += 1
+        self.save_positions()
+        profiler = self.profiler
+        player = self.player
+        player.move(action)
+        if profiler:
+            profiler.lap('player.move')
+
+        # Move ghosts and check collision with player
+        if self.move_ghosts():
+            if player.die():
+                self.events.append(EVENT_DEATH)
+            self.game_over = True
+        if profiler:
+            profiler.lap('ghosts')
+        if self.game_over:
+            return self.events
+
+        # Check pellet collection
+        if player.swept:
+            collected = self.pellets.collect_along(player.motion, player.radius)
+        else:
+            collected = self.pellets.collect(player.x, player.y, player.radius)
+        for _ in range(collected):
+            self.events.append(EVENT_PELLET)
+            if player.collect_pellet():
+                self.events.append(EVENT_CHOMP)
+        if profiler:
+            profiler.lap('pellets')
+
+        if not self.pellets:
+            self.events.append(EVENT_CLEARED)
+            self.won = True
+            self.game_over = True
+
+        return self.events
+
+    def move_ghosts(self):
+        # Returns True as soon as a ghost catches the player; the ghosts
+        # after it don't move this tick
+        player = self.player
+        if self.scheduler:
+            self.scheduler.update(self)
+        for ghost in self.ghosts:
+            ghost.move(player.x, player.y)
+            if ghost.touches(player):
+                return True
+        return False
+
+    def run(self, policy, max_ticks=None):
+        # Play a whole game as fast as possible; policy(state) returns actions
+        while not self.game_over and (max_ticks is None or self.tick < max_ticks):
+            self.step(policy(self))
+        return self
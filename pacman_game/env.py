@@ -0,0 +1,166 @@
+import random
+
+import numpy
+
+import engine
+from engine import CELL_SIZE
+from mazes import as_grid
+from swarm import SwarmGameState
+
+# Gym-style environments around the headless engine.
+#
+# PacmanEnv follows the gymnasium API: reset(seed) -> (obs, info) and
+# step(action) -> (obs, reward, terminated, truncated, info), with actions
+# from engine.ACTIONS and the score gained in the tick as the reward. A game
+# terminates when the player dies or clears the board, and is truncated
+# after max_ticks.
+#
+# Observations are uint8 grid tensors of shape (CHANNELS, rows, cols),
+# written into a preallocated buffer that step() returns directly: copy it
+# if it has to outlive the next step. VectorEnv steps N games in lockstep
+# and gives each game a slice of one (N, CHANNELS, rows, cols) buffer, so a
+# whole batch of observations is a single array with no stacking or copies.
+
+# Observation channels
+WALLS = 0
+PELLETS = 1
+PLAYER = 2
+GHOSTS_CHASE = 3  # Ghost count per tile, for ghosts chasing the player...
+GHOSTS_SCATTER = 4  # ...and for ghosts heading back to their corner
+CHANNELS = 5
+
+NUM_ACTIONS = len(engine.ACTIONS)
+
+
+class PacmanEnv:
+    def __init__(self, maze=engine.MAZE, num_ghosts=engine.NUM_GHOSTS,
+                 num_pellets=engine.NUM_PELLETS, tick_rate=engine.TICK_RATE,
+                 max_ticks=10000, swarm=False, seed=None, out=None, swept=False):
+        state_class = SwarmGameState if swarm else engine.GameState
+        self.state = state_class(0, maze=maze, num_ghosts=num_ghosts,
+                                 num_pellets=num_pellets, tick_rate=tick_rate, swept=swept)
+        self.max_ticks = max_ticks
+        # Seeds for reset() calls that don't pass one
+        self.seeds = random.Random(seed)
+        rows, cols = self.state.maze.shape
+        self.observation_shape = (CHANNELS, rows, cols)
+        if out is None:
+            out = numpy.zeros(self.observation_shape, dtype=numpy.uint8)
+        elif out.shape != self.observation_shape or out.dtype != numpy.uint8:
+            raise ValueError(f'out must be a uint8 array of shape {self.observation_shape}')
+        if not out.flags.c_contiguous:
+            raise ValueError('out must be C-contiguous')
+        self.observation = out
+        # Byte view of the buffer: single-element writes through it are much
+        # cheaper than NumPy indexing for the few tiles that change per step
+        self._buffer = memoryview(out.reshape(-1))
+        self._written = []  # Buffer offsets set by the last observe()
+        self.cols = cols
+        self.channel_size = rows * cols
+        out[WALLS] = self.state.maze != 0
+
+    def reset(self, seed=None):
+        if seed is None:
+            seed = self.seeds.getrandbits(63)
+        self.state.reset(seed)
+        self._written = []
+        self.observation[WALLS + 1:] = 0
+        self.observation[PELLETS] = self.state.pellets.grid != 0
+        self.observe()
+        return self.observation, {'seed': seed}
+
+    def step(self, action):
+        state = self.state
+        score = state.score
+        events = state.step(action)
+        if engine.EVENT_PELLET in events:
+            # Pellets only ever disappear, from the tiles the player crossed
+            base = PELLETS * self.channel_size
+            for index in state.pellets.eaten:
+                self._buffer[base + index] = 0
+        self.observe()
+        terminated = state.game_over
+        truncated = not terminated and state.tick >= self.max_ticks
+        return (self.observation, state.score - score, terminated, truncated,
+                {'tick': state.tick, 'won': state.won})
+
+    def offset(self, channel, x, y):
+        # Buffer offset of the tile under pixel (x, y) in a channel
+        return (channel * self.channel_size + int(y // CELL_SIZE) * self.cols
+                + int(x // CELL_SIZE))
+
+    def observe(self):
+        # Only the tiles written last time are cleared, so the cost follows
+        # the number of moving entities rather than the maze size. The
+        # pellet channel is kept up to date by reset() and step().
+        buffer = self._buffer
+        for index in self._written:
+            buffer[index] = 0
+
+        state = self.state
+        offset = self.offset
+        written = [offset(PLAYER, state.player.x, state.player.y)]
+        buffer[written[0]] = 1
+
+        if isinstance(state, SwarmGameState):
+            swarm = state.swarm
+            channels = numpy.where(swarm.chase_mode, GHOSTS_CHASE, GHOSTS_SCATTER)
+            ghosts = (channels * self.channel_size + swarm.cell_of(swarm.x, swarm.y)).tolist()
+        else:
+            ghosts = [offset(GHOSTS_CHASE if ghost.chase_mode else GHOSTS_SCATTER,
+                             ghost.x, ghost.y)
+                      for ghost in state.ghosts]
+        for index in ghosts:
+            # Ghost channels count ghosts per tile
+            if buffer[index] < 255:
+                buffer[index] += 1
+        written.extend(ghosts)
+        self._written = written
+
+
+class VectorEnv:
+    # num_envs games stepped in lockstep. Finished games are reset in the
+    # same step(), so the observation returned for them is already the
+    # first one of their next game; their final score and length are in
+    # info['final_score'] and info['final_ticks'].
+    def __init__(self, num_envs, maze=engine.MAZE, seed=None, **kwargs):
+        self.num_envs = num_envs
+        self.observation_shape = (CHANNELS,) + as_grid(maze).shape
+        self.observations = numpy.zeros((num_envs,) + self.observation_shape,
+                                        dtype=numpy.uint8)
+        seeds = random.Random(seed)
+        self.envs = [PacmanEnv(maze, seed=seeds.getrandbits(63),
+                               out=self.observations[i], **kwargs)
+                     for i in range(num_envs)]
+        self.rewards = numpy.zeros(num_envs, dtype=numpy.float32)
+        self.terminated = numpy.zeros(num_envs, dtype=bool)
+        self.truncated = numpy.zeros(num_envs, dtype=bool)
+        self.final_score = numpy.zeros(num_envs, dtype=numpy.int64)
+        self.final_ticks = numpy.zeros(num_envs, dtype=numpy.int64)
+
+    def reset(self, seed=None):
+        # With a seed, game i starts from seed + i
+        for i, env in enumerate(self.envs):
+            env.reset(None if seed is None else seed + i)
+        return self.observations, {}
+
+    def step(self, actions):
+        # actions: one per game, any sequence of ints
+        rewards = self.rewards
+        terminated = self.terminated
+        truncated = self.truncated
+        final_score = self.final_score
+        final_ticks = self.final_ticks
+        for i, (env, action) in enumerate(zip(self.envs, actions)):
+            _, reward, done, cut, _ = env.step(int(action))
+            rewards[i] = reward
+            terminated[i] = done
+            truncated[i] = cut
+            if done or cut:
+                final_score[i] = env.state.score
+                final_ticks[i] = env.state.tick
+                env.reset()
+            else:
+                final_score[i] = final_ticks[i] = 0
+        return (self.observations, rewards, terminated, truncated,
+                {'final_score': final_score, 'final_ticks': final_ticks})
@@ -0,0 +1,97 @@
+from collections import OrderedDict
+
+import pygame
+
+# Cached HUD text and panels.
+#
+# Font rendering is one of the slowest things a frame can do, and HUD text
+# rarely changes. TextCache keeps rendered surfaces keyed by their content;
+# HudText re-renders its line only when the value shown changes, so a HUD
+# element costs a blit or two per frame. GameOverPanel builds its overlay
+# and fixed text once.
+
+
+class TextCache:
+    # Rendered text surfaces for one font, keyed by (text, color)
+    def __init__(self, font, max_entries=256):
+        self.font = font
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+        self.renders = 0
+
+    def render(self, text, color):
+        key = (text, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = self.font.render(text, True, color)
+            self.renders += 1
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.max_entries:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+
+class HudText:
+    # One line of text built from template.format(value). The text and its
+    # optional drop shadow are only looked up again when value changes.
+    def __init__(self, cache, template, color, topleft=None, center=None,
+                 shadow_color=None, shadow_offset=(2, 2)):
+        self.cache = cache
+        self.template = template
+        self.color = color
+        self.topleft = topleft
+        self.center = center
+        self.shadow_color = shadow_color
+        self.shadow_offset = shadow_offset
+        self.value = object()  # Never equal to a real value
+        self.surface = self.shadow = None
+        self.rect = self.shadow_rect = None
+
+    def set(self, value):
+        if value == self.value:
+            return
+        self.value = value
+        text = self.template.format(value)
+        self.surface = self.cache.render(text, self.color)
+        if self.center:
+            self.rect = self.surface.get_rect(center=self.center)
+        else:
+            self.rect = self.surface.get_rect(topleft=self.topleft)
+        if self.shadow_color:
+            self.shadow = self.cache.render(text, self.shadow_color)
+            self.shadow_rect = self.rect.move(self.shadow_offset)
+
+    def draw(self, target, value=None):
+        # Returns the screen area drawn
+        self.set(value)
+        if self.shadow:
+            target.blit(self.shadow, self.shadow_rect)
+            target.blit(self.surface, self.rect)
+            return self.rect.union(self.shadow_rect)
+        return target.blit(self.surface, self.rect)
+
+
+class GameOverPanel:
+    # Dimming overlay plus 'Game Over!', the final score and the restart
+    # hint, centred on a screen of the given size
+    def __init__(self, size, title_font, text_font, color=(255, 255, 255)):
+        width, height = size
+        self.overlay = pygame.Surface(size)
+        self.overlay.fill((0, 0, 0))
+        self.overlay.set_alpha(128)
+        title_cache = TextCache(title_font)
+        self.title = HudText(title_cache, 'Game Over!', color,
+                             center=(width // 2, height // 2 - 50))
+        self.score = HudText(title_cache, 'Final Score: {}', color,
+                             center=(width // 2, height // 2 + 10))
+        self.hint = HudText(TextCache(text_font), 'Press SPACE to restart', color,
+                            center=(width // 2, height // 2 + 70))
+
+    def draw(self, target, score):
+        target.blit(self.overlay, (0, 0))
+        self.title.draw(target)
+        self.score.draw(target, score)
+        self.hint.draw(target)
+        return target.get_rect()
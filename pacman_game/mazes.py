@@ -0,0 +1,234 @@
+import json
+import os
+import random
+import struct
+import sys
+
+import numpy
+
+# Maze grids, the on-disk .maze format and derived maze metadata.
+#
+# A maze is a 2D uint8 NumPy array, 0 = free and 1 = wall. A .maze file is a
+# 16 byte header followed by the grid, either one byte per cell (which is
+# memory-mapped straight into an array) or one bit per cell (packed rows,
+# unpacked on load). Data derived from a maze (free cells, wall cells and the
+# neighbour mask used for pathfinding) is cached in a sidecar directory next
+# to the file so it never has to be recomputed for an unchanged maze.
+
+MAGIC = b'PMAZ'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sBBHII')  # magic, version, encoding, reserved, rows, cols
+ENCODING_BYTES = 0
+ENCODING_BITS = 1
+
+META_VERSION = 1
+
+# Neighbour mask bits, in the order Ghost.get_valid_neighbors has always used
+EAST = 1
+SOUTH = 2
+WEST = 4
+NORTH = 8
+
+LEVELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'levels')
+CLASSIC_MAZE = os.path.join(LEVELS_DIR, 'classic.maze')
+
+
+class MazeError(Exception):
+    pass
+
+
+def as_grid(maze):
+    # Any maze (nested lists, an array, MazeData) as a 2D uint8 array
+    if isinstance(maze, MazeData):
+        return maze.grid
+    grid = numpy.asarray(maze, dtype=numpy.uint8)
+    if grid.ndim != 2:
+        raise MazeError(f'maze must be 2D, got shape {grid.shape}')
+    return grid
+
+
+def neighbor_mask(grid):
+    # Per-cell bitmask of open neighbours (EAST/SOUTH/WEST/NORTH); walls get 0
+    free = grid == 0
+    mask = numpy.zeros(grid.shape, dtype=numpy.uint8)
+    horizontal = free[:, :-1] & free[:, 1:]
+    vertical = free[:-1, :] & free[1:, :]
+    mask[:, :-1] |= horizontal * numpy.uint8(EAST)
+    mask[:, 1:] |= horizontal * numpy.uint8(WEST)
+    mask[:-1, :] |= vertical * numpy.uint8(SOUTH)
+    mask[1:, :] |= vertical * numpy.uint8(NORTH)
+    return mask
+
+
+class MazeData:
+    # A grid plus the metadata the game derives from it
+    def __init__(self, grid, free_cells, wall_cells, neighbors):
+        self.grid = grid
+        self.rows, self.cols = grid.shape
+        self.free_cells = free_cells  # (n, 2) int32 rows of (row, col)
+        self.wall_cells = wall_cells  # (m, 2) int32 rows of (row, col)
+        self.neighbor_mask = neighbors  # uint8 grid of EAST/SOUTH/WEST/NORTH bits
+
+    @classmethod
+    def from_grid(cls, maze):
+        grid = as_grid(maze)
+        return cls(grid,
+                   numpy.argwhere(grid == 0).astype(numpy.int32),
+                   numpy.argwhere(grid == 1).astype(numpy.int32),
+                   neighbor_mask(grid))
+
+    @property
+    def shape(self):
+        return self.grid.shape
+
+
+def save_maze(path, maze, packed=False):
+    grid = as_grid(maze)
+    rows, cols = grid.shape
+    encoding = ENCODING_BITS if packed else ENCODING_BYTES
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, encoding, 0, rows, cols))
+        if packed:
+            f.write(numpy.packbits(grid != 0, axis=1).tobytes())
+        else:
+            f.write(numpy.ascontiguousarray(grid != 0, dtype=numpy.uint8).tobytes())
+
+
+def read_header(path):
+    with open(path, 'rb') as f:
+        data = f.read(HEADER.size)
+    if len(data) != HEADER.size:
+        raise MazeError(f'{path}: truncated header')
+    magic, version, encoding, _, rows, cols = HEADER.unpack(data)
+    if magic != MAGIC:
+        raise MazeError(f'{path}: not a maze file')
+    if version != FORMAT_VERSION:
+        raise MazeError(f'{path}: unsupported maze format version {version}')
+    if encoding not in (ENCODING_BYTES, ENCODING_BITS):
+        raise MazeError(f'{path}: unknown encoding {encoding}')
+    return encoding, rows, cols
+
+
+def load_grid(path):
+    # Byte-encoded mazes are memory-mapped read-only; bit-packed ones unpacked
+    encoding, rows, cols = read_header(path)
+    if encoding == ENCODING_BYTES:
+        expected = rows * cols
+    else:
+        expected = rows * ((cols + 7) // 8)
+    if os.path.getsize(path) - HEADER.size < expected:
+        raise MazeError(f'{path}: truncated grid')
+    if encoding == ENCODING_BYTES:
+        return numpy.memmap(path, dtype=numpy.uint8, mode='r',
+                            offset=HEADER.size, shape=(rows, cols))
+    packed = numpy.fromfile(path, dtype=numpy.uint8, count=expected,
+                            offset=HEADER.size).reshape(rows, (cols + 7) // 8)
+    return numpy.unpackbits(packed, axis=1, count=cols)
+
+
+def _meta_dir(path):
+    return path + '.meta'
+
+
+def _stamp(path):
+    stat = os.stat(path)
+    return {'version': META_VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+META_ARRAYS = ('free_cells', 'wall_cells', 'neighbor_mask')
+
+
+def _load_meta(path, grid):
+    meta_dir = _meta_dir(path)
+    try:
+        with open(os.path.join(meta_dir, 'stamp.json')) as f:
+            if json.load(f) != _stamp(path):
+                return None
+        arrays = [numpy.load(os.path.join(meta_dir, name + '.npy'), mmap_mode='r')
+                  for name in META_ARRAYS]
+    except (OSError, ValueError):
+        return None
+    return MazeData(grid, *arrays)
+
+
+def _save_meta(path, data):
+    meta_dir = _meta_dir(path)
+    try:
+        os.makedirs(meta_dir, exist_ok=True)
+        for name in META_ARRAYS:
+            numpy.save(os.path.join(meta_dir, name + '.npy'), getattr(data, name))
+        # Written last, so a half-written cache is never considered valid
+        with open(os.path.join(meta_dir, 'stamp.json'), 'w') as f:
+            json.dump(_stamp(path), f)
+    except OSError:
+        pass  # Read-only location; the cache is only an optimization
+
+
+def load_maze(path, use_cache=True):
+    # MazeData for a .maze file, with metadata from the sidecar cache if valid
+    grid = load_grid(path)
+    if use_cache:
+        data = _load_meta(path, grid)
+        if data is not None:
+            return data
+    data = MazeData.from_grid(grid)
+    if use_cache:
+        _save_meta(path, data)
+    return data
+
+
+def generate_maze(rows, cols, seed=0, loop_chance=0.1):
+    # Random maze grid. A depth-first carve gives a perfect maze; knocking out
+    # a few extra walls adds the loops a Pac-Man board needs. rows and cols
+    # should be odd.
+    rng = random.Random(seed)
+    maze = [[1] * cols for _ in range(rows)]
+    maze[1][1] = 0
+    stack = [(1, 1)]
+    while stack:
+        row, col = stack[-1]
+        options = []
+        for dr, dc in ((0, 2), (2, 0), (0, -2), (-2, 0)):
+            new_row, new_col = row + dr, col + dc
+            if 0 < new_row < rows - 1 and 0 < new_col < cols - 1 and maze[new_row][new_col] == 1:
+                options.append((new_row, new_col))
+        if not options:
+            stack.pop()
+            continue
+        new_row, new_col = rng.choice(options)
+        maze[(row + new_row) // 2][(col + new_col) // 2] = 0
+        maze[new_row][new_col] = 0
+        stack.append((new_row, new_col))
+
+    for row in range(1, rows - 1):
+        for col in range(1, cols - 1):
+            if maze[row][col] == 1 and rng.random() < loop_chance:
+                horizontal = maze[row][col - 1] == 0 and maze[row][col + 1] == 0
+                vertical = maze[row - 1][col] == 0 and maze[row + 1][col] == 0
+                if horizontal != vertical:
+                    maze[row][col] = 0
+    return numpy.array(maze, dtype=numpy.uint8)
+
+
+def free_cells(maze):
+    return [(int(row), int(col)) for row, col in numpy.argwhere(as_grid(maze) == 0)]
+
+
+def main(argv):
+    # python mazes.py show FILE | generate ROWS COLS OUT [--packed] [--seed N]
+    if len(argv) >= 2 and argv[0] == 'show':
+        for row in load_grid(argv[1]):
+            print(''.join('#' if cell else '.' for cell in row))
+        return 0
+    if len(argv) >= 4 and argv[0] == 'generate':
+        seed = int(argv[argv.index('--seed') + 1]) if '--seed' in argv else 0
+        grid = generate_maze(int(argv[1]), int(argv[2]), seed=seed)
+        save_maze(argv[3], grid, packed='--packed' in argv)
+        return 0
+    print('usage: python mazes.py show FILE\n'
+          '       python mazes.py generate ROWS COLS OUT [--packed] [--seed N]')
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
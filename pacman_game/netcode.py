@@ -0,0 +1,317 @@
+import struct
+
+# Wire format for the multiplayer server.
+#
+# Clients send their input every tick; the server answers with snapshots of
+# the world. A snapshot is encoded against the last one the client
+# acknowledged (its baseline): only entities whose quantized state changed
+# are sent, each changed field as a zigzag varint difference, and pellets
+# eaten since the baseline as a bitmap. Without a usable baseline the
+# server sends a full snapshot, which is the same encoding against an empty
+# world. Positions are quantized to 1/POSITION_SCALE pixel.
+#
+# Every message starts with a one byte type:
+#   JOIN      B role
+#   WELCOME   varint player id (0 for spectators), varint tick rate,
+#             varint rows, varint cols, I maze crc32
+#   INPUT     varint acknowledged tick, B action
+#   LEAVE
+#   SNAPSHOT  varint tick, varint baseline tick (0: full), B flags,
+#             [varint round, varint count, count x (varint row, varint col)]
+#             if FLAG_NEW_ROUND,
+#             [bitmap: alive pellets after a new round, else pellets eaten
+#             since the baseline] if FLAG_PELLETS,
+#             varint changed, changed x (varint key, B field mask, zigzag
+#             varint per set bit), varint removed, removed x varint key
+
+MSG_JOIN = 1
+MSG_WELCOME = 2
+MSG_INPUT = 3
+MSG_LEAVE = 4
+MSG_SNAPSHOT = 5
+
+ROLE_PLAYER = 0
+ROLE_SPECTATOR = 1
+
+FLAG_NEW_ROUND = 1
+FLAG_PELLETS = 2
+
+POSITION_SCALE = 4
+MAX_VARINT = 5  # Bytes; bounds every count, key and field (values below 2**35)
+
+# Entity keys: id << 1 | kind
+KIND_PLAYER = 0
+KIND_GHOST = 1
+
+CRC = struct.Struct('<I')
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def player_key(player_id):
+    return player_id << 1 | KIND_PLAYER
+
+
+def ghost_key(index):
+    return index << 1 | KIND_GHOST
+
+
+def key_kind(key):
+    return key & 1
+
+
+def key_id(key):
+    return key >> 1
+
+
+def quantize(value):
+    return int(round(value * POSITION_SCALE))
+
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    value = shift = 0
+    while True:
+        if pos >= len(data):
+            raise ProtocolError('truncated message')
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def varint_size(value):
+    size = 1
+    while value >= 0x80:
+        value >>= 7
+        size += 1
+    return size
+
+
+def zigzag(value):
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def unzigzag(value):
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def pack_bits(flags):
+    out = bytearray((len(flags) + 7) // 8)
+    for i, flag in enumerate(flags):
+        if flag:
+            out[i >> 3] |= 1 << (i & 7)
+    return out
+
+
+def unpack_bits(data, pos, count):
+    end = pos + (count + 7) // 8
+    if end > len(data):
+        raise ProtocolError('truncated message')
+    return [bool(data[pos + (i >> 3)] >> (i & 7) & 1) for i in range(count)], end
+
+
+class Snapshot:
+    # The world as clients see it. entities maps entity keys to tuples of
+    # quantized ints: players (x, y, direction, alive, score), ghosts
+    # (x, y, chase_mode).
+    def __init__(self, tick, entities, round=0, pellet_cells=(), pellet_alive=()):
+        self.tick = tick
+        self.entities = entities
+        self.round = round
+        self.pellet_cells = list(pellet_cells)
+        self.pellet_alive = list(pellet_alive)
+
+
+EMPTY = Snapshot(0, {})
+
+
+def encode_join(role):
+    return bytes((MSG_JOIN, role))
+
+
+def encode_welcome(player_id, tick_rate, rows, cols, crc):
+    out = bytearray((MSG_WELCOME,))
+    for value in (player_id, tick_rate, rows, cols):
+        write_varint(out, value)
+    return bytes(out + CRC.pack(crc))
+
+
+def encode_input(ack, action):
+    out = bytearray((MSG_INPUT,))
+    write_varint(out, ack)
+    out.append(action)
+    return bytes(out)
+
+
+def encode_leave():
+    return bytes((MSG_LEAVE,))
+
+
+def decode_message(data):
+    # (type, fields) for every message but SNAPSHOT, which needs the
+    # client's baselines; see decode_snapshot
+    if not data:
+        raise ProtocolError('empty message')
+    kind = data[0]
+    if kind == MSG_JOIN:
+        if len(data) < 2:
+            raise ProtocolError('truncated message')
+        return kind, (data[1],)
+    if kind == MSG_WELCOME:
+        pos = 1
+        values = []
+        for _ in range(4):
+            value, pos = read_varint(data, pos)
+            values.append(value)
+        if pos + CRC.size > len(data):
+            raise ProtocolError('truncated message')
+        values.append(CRC.unpack_from(data, pos)[0])
+        return kind, tuple(values)
+    if kind == MSG_INPUT:
+        ack, pos = read_varint(data, 1)
+        if pos >= len(data):
+            raise ProtocolError('truncated message')
+        return kind, (ack, data[pos])
+    if kind in (MSG_LEAVE, MSG_SNAPSHOT):
+        return kind, ()
+    raise ProtocolError(f'unknown message type {kind}')
+
+
+def encode_snapshot(snapshot, baseline=None):
+    # snapshot as a delta against baseline (a Snapshot the client has), or
+    # in full when baseline is None
+    base = baseline or EMPTY
+    out = bytearray((MSG_SNAPSHOT,))
+    write_varint(out, snapshot.tick)
+    write_varint(out, base.tick)
+
+    new_round = baseline is None or snapshot.round != base.round
+    flags = 0
+    if new_round:
+        flags = FLAG_NEW_ROUND | FLAG_PELLETS
+        pellets = pack_bits(snapshot.pellet_alive)
+    else:
+        eaten = [was and not now for was, now in zip(base.pellet_alive, snapshot.pellet_alive)]
+        if any(eaten):
+            flags = FLAG_PELLETS
+            pellets = pack_bits(eaten)
+    out.append(flags)
+    if new_round:
+        write_varint(out, snapshot.round)
+        write_varint(out, len(snapshot.pellet_cells))
+        for row, col in snapshot.pellet_cells:
+            write_varint(out, row)
+            write_varint(out, col)
+    if flags & FLAG_PELLETS:
+        out += pellets
+
+    changed = []
+    base_entities = base.entities
+    for key, state in snapshot.entities.items():
+        old = base_entities.get(key)
+        if old != state:
+            changed.append((key, state, old))
+    write_varint(out, len(changed))
+    for key, state, old in changed:
+        write_varint(out, key)
+        if old is None:
+            old = (0,) * len(state)
+        mask = 0
+        deltas = []
+        for i, (value, previous) in enumerate(zip(state, old)):
+            if value != previous:
+                mask |= 1 << i
+                deltas.append(value - previous)
+        out.append(mask)
+        for delta in deltas:
+            write_varint(out, zigzag(delta))
+
+    removed = [key for key in base_entities if key not in snapshot.entities]
+    write_varint(out, len(removed))
+    for key in removed:
+        write_varint(out, key)
+    return bytes(out)
+
+
+def max_snapshot_size(rows, cols, pellets, players, ghosts):
+    # Upper bound on an encoded snapshot, full or delta, with at most
+    # `players` players in both it and its baseline. Full snapshots of a new
+    # round are the largest: header, every pellet tile and the alive bitmap.
+    size = 2 + 6 * MAX_VARINT
+    size += pellets * (varint_size(rows) + varint_size(cols)) + (pellets + 7) // 8
+    size += ghosts * (1 + 4 * MAX_VARINT)
+    # A player is changed (key, mask, 5 fields) or removed (key)
+    size += players * (1 + 7 * MAX_VARINT)
+    return size
+
+
+def entity_fields(key):
+    return 5 if key_kind(key) == KIND_PLAYER else 3
+
+
+def decode_snapshot(data, baselines):
+    # Rebuilds the full Snapshot from a delta; baselines maps the ticks the
+    # client still has to their Snapshots
+    if not data or data[0] != MSG_SNAPSHOT:
+        raise ProtocolError('not a snapshot')
+    tick, pos = read_varint(data, 1)
+    base_tick, pos = read_varint(data, pos)
+    if base_tick == 0:
+        base = EMPTY
+    elif base_tick in baselines:
+        base = baselines[base_tick]
+    else:
+        raise ProtocolError(f'unknown baseline tick {base_tick}')
+    if pos >= len(data):
+        raise ProtocolError('truncated message')
+    flags = data[pos]
+    pos += 1
+
+    round_number = base.round
+    cells = base.pellet_cells
+    alive = base.pellet_alive
+    if flags & FLAG_NEW_ROUND:
+        round_number, pos = read_varint(data, pos)
+        count, pos = read_varint(data, pos)
+        cells = []
+        for _ in range(count):
+            row, pos = read_varint(data, pos)
+            col, pos = read_varint(data, pos)
+            cells.append((row, col))
+    if flags & FLAG_PELLETS:
+        bits, pos = unpack_bits(data, pos, len(cells))
+        if flags & FLAG_NEW_ROUND:
+            alive = bits
+        else:
+            alive = [was and not eaten for was, eaten in zip(alive, bits)]
+
+    entities = dict(base.entities)
+    count, pos = read_varint(data, pos)
+    for _ in range(count):
+        key, pos = read_varint(data, pos)
+        if pos >= len(data):
+            raise ProtocolError('truncated message')
+        mask = data[pos]
+        pos += 1
+        values = list(entities.get(key) or (0,) * entity_fields(key))
+        for i in range(len(values)):
+            if mask & 1 << i:
+                delta, pos = read_varint(data, pos)
+                values[i] += unzigzag(delta)
+        entities[key] = tuple(values)
+    count, pos = read_varint(data, pos)
+    for _ in range(count):
+        key, pos = read_varint(data, pos)
+        entities.pop(key, None)
+    return Snapshot(tick, entities, round_number, cells, alive)
@@ -1,20 +1,30 @@
 import pygame
+import argparse
+import os
 import random
 import math
-from pygame import gfxdraw
+import time
+
 import numpy
 
-# Initialize Pygame
-pygame.init()
-pygame.font.init()
-pygame.mixer.init(44100, -16, 2, 512)
+import audio
+import engine
+import replay
+from assets import AssetManager, headless, load_sound
+from camera import Camera
+from dirty_rects import DirtyRectRenderer
+from engine import CELL_SIZE, GameState
+from hud import GameOverPanel, HudText, TextCache
+from mazes import load_maze
+from profiler import FrameProfiler
+from sprites import SpriteAtlas
+from swarm import SwarmGameState
+from timestep import FixedTimestep
+from wall_layer import ChunkedWallLayer
 
 # Constants
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
-CELL_SIZE = 40
-PLAYER_SPEED = 3.5
-GHOST_SPEED = 2
 WALL_COLOR = (24, 58, 145)  # Darker blue for walls
 BACKGROUND_COLOR = (0, 0, 0)
 PELLET_COLOR = (255, 255, 255)
@@ -27,554 +37,543 @@ BLUE = (24, 58, 145)
 WHITE = (255, 255, 255)
 NEON_BLUE = (0, 255, 255)
 
-# Set up the display
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Pacman")
-clock = pygame.time.Clock()
-
-# Load fonts
-try:
-    GAME_FONT = pygame.font.Font(None, 48)
-    SCORE_FONT = pygame.font.Font(None, 36)
-except:
-    GAME_FONT = pygame.font.SysFont('arial', 48)
-    SCORE_FONT = pygame.font.SysFont('arial', 36)
-
 # Animation constants
 PACMAN_ANIM_SPEED = 0.15
 GHOST_ANIM_SPEED = 0.1
 POWERUP_DURATION = 300
 
-# Sound effects setup
-def create_chomp_sound():
-    duration = 100  # milliseconds
-    frequency = 440  # Hz
-    sample_rate = 44100
-    n_samples = int(duration * sample_rate / 1000)
-    
-    # Generate a simple sine wave
-    buf = numpy.zeros((n_samples, 2), dtype = numpy.int16)
-    max_sample = 2**(16 - 1) - 1
-    for s in range(n_samples):
-        t = float(s) / sample_rate
-        buf[s][0] = int(max_sample * math.sin(2 * math.pi * frequency * t))
-        buf[s][1] = buf[s][0]  # Duplicate for stereo
-    
-    return pygame.sndarray.make_sound(buf)
-
-def create_death_sound():
-    duration = 500  # milliseconds
-    frequency = 220  # Hz
-    sample_rate = 44100
-    n_samples = int(duration * sample_rate / 1000)
-    
-    buf = numpy.zeros((n_samples, 2), dtype = numpy.int16)
-    max_sample = 2**(16 - 1) - 1
-    for s in range(n_samples):
-        t = float(s) / sample_rate
-        # Decreasing frequency for death sound
-        freq = frequency * (1.0 - t/(duration/1000))
-        buf[s][0] = int(max_sample * math.sin(2 * math.pi * freq * t))
-        buf[s][1] = buf[s][0]
-    
-    return pygame.sndarray.make_sound(buf)
-
-# Create sound effects
-try:
-    chomp_sound = create_chomp_sound()
-    death_sound = create_death_sound()
-    SOUND_ENABLED = True
-except ImportError:
-    SOUND_ENABLED = False
-
-class Wall:
-    def __init__(self, x, y, width, height):
-        self.rect = pygame.Rect(x, y, width, height)
-        self.glow_value = random.random()
-        self.glow_speed = random.uniform(0.02, 0.05)
-        
-    def draw(self):
-        # Create a subtle pulsing effect for walls
-        self.glow_value = (self.glow_value + self.glow_speed) % 1.0
-        glow = math.sin(self.glow_value * math.pi * 2) * 0.2 + 0.8
-        
-        color = tuple(int(c * glow) for c in WALL_COLOR)
-        
-        # Draw main wall
-        pygame.draw.rect(screen, color, self.rect)
-        
-        # Draw highlight edge
-        highlight = (min(255, int(WALL_COLOR[0] * 1.5)), 
-                    min(255, int(WALL_COLOR[1] * 1.5)), 
-                    min(255, int(WALL_COLOR[2] * 1.5)))
-        pygame.draw.line(screen, highlight, 
-                        self.rect.topleft, self.rect.topright)
-        pygame.draw.line(screen, highlight, 
-                        self.rect.topleft, self.rect.bottomleft)
-
-class Player:
-    def __init__(self, walls):
-        self.walls = walls
-        self.radius = 15
-        self.reset_position()
-        self.direction = 0
-        self.speed = PLAYER_SPEED
-        self.score = 0
-        self.current_direction = (0, 0)
-        self.next_direction = (0, 0)
+# Sprites whose centre is further than this outside the view aren't drawn
+CULL_MARGIN = CELL_SIZE
+# Spreads the wave phase of batched ghosts, which have no per-ghost offsets
+GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+
+# Generated assets (sprite atlas, sounds) are cached here between runs
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+# Threads loading assets while the window opens. Loading is mostly Python
+# and pygame work that holds the GIL, so on a single core threads only add
+# contention and assets are loaded one by one (0) instead.
+ASSET_WORKERS = min(4, (os.cpu_count() or 1) - 1)
+
+# Display, fonts and sounds are created by init() so that importing this
+# module (or the engine) never opens a window or an audio device
+assets = None
+screen = None
+camera = None
+clock = None
+GAME_FONT = None
+SCORE_FONT = None
+score_text = None
+fps_text = None
+game_over_panel = None
+sprites = None
+chomp_sound = None  # assets.Asset handles; sounds play once they've loaded
+death_sound = None
+SOUND_ENABLED = False
+
+# Seconds from the start of main() to the end of init() and to the first
+# frame on screen, plus how long each asset took to load
+startup_times = {}
+
+# Per-frame render timing, set by set_frame_timing(): how far the frame is
+# between the last two logic ticks, and how many 60 Hz frames it lasted
+render_alpha = 1.0
+anim_scale = 1.0
+
+# Optional FrameProfiler for the main loop, and the HUD that shows it
+profiler = None
+profiler_hud = None
+show_fps = False
+
+# Asset loaders, run on the asset threads
+def load_fonts():
+    try:
+        return pygame.font.Font(None, 48), pygame.font.Font(None, 36)
+    except:
+        return pygame.font.SysFont('arial', 48), pygame.font.SysFont('arial', 36)
+
+def create_sprites():
+    # Every entity animation frame, pre-rendered (or read from the cache)
+    return SpriteAtlas(radius=15, pellet_radius=4,
+                       pacman_color=YELLOW, mouth_color=BLACK,
+                       chase_color=RED, scatter_color=NEON_BLUE,
+                       eye_color=WHITE, pupil_color=BLACK,
+                       pellet_color=PELLET_COLOR, cache_dir=CACHE_DIR)
+
+def init_mixer():
+    pygame.mixer.init(44100, -16, 2, 512)
+
+def create_sound(mixer, name, tone):
+    mixer.get()
+    return load_sound(name, tone, cache_dir=CACHE_DIR)
+
+def create_walls(state):
+    # The wall layer with the chunks around the player already rendered
+    walls = ChunkedWallLayer(state.maze_data, CELL_SIZE, WALL_COLOR, BACKGROUND_COLOR)
+    walls.prerender(camera)
+    return walls
+
+def init(wait=True, sound=None):
+    # Starts loading assets in the background and opens the window. With
+    # wait=False, call finish_init() before drawing anything. Sound is off
+    # by default under SDL's dummy video driver.
+    global assets, screen, camera, clock
+    global chomp_sound, death_sound, SOUND_ENABLED
+
+    assets = AssetManager(ASSET_WORKERS)
+    pygame.font.init()
+    assets.submit('fonts', load_fonts)
+    assets.submit('sprites', create_sprites, finish=lambda atlas: atlas.convert())
+    SOUND_ENABLED = not headless() if sound is None else sound
+    if SOUND_ENABLED:
+        mixer = assets.submit('mixer', init_mixer)
+        chomp_sound = assets.submit('chomp', create_sound, mixer, 'chomp', audio.CHOMP)
+        death_sound = assets.submit('death', create_sound, mixer, 'death', audio.DEATH)
+
+    # Only the subsystems the game uses; pygame.init() would open the
+    # audio device too
+    pygame.display.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Pacman")
+    camera = Camera((SCREEN_WIDTH, SCREEN_HEIGHT))
+    clock = pygame.time.Clock()
+    if wait:
+        finish_init()
+        assets.wait()
+
+def finish_init():
+    # Waits for the fonts and sprites and builds the HUD
+    global GAME_FONT, SCORE_FONT, sprites, score_text, fps_text, game_over_panel
+
+    GAME_FONT, SCORE_FONT = assets.get('fonts')
+
+    # HUD text is rendered once per distinct value, not every frame
+    score_cache = TextCache(SCORE_FONT)
+    score_text = HudText(score_cache, 'Score: {}', WHITE, topleft=(10, 10),
+                         shadow_color=(50, 50, 50))
+    fps_text = HudText(score_cache, '{} FPS', WHITE, topleft=(SCREEN_WIDTH - 110, 10),
+                       shadow_color=(50, 50, 50))
+    game_over_panel = GameOverPanel((SCREEN_WIDTH, SCREEN_HEIGHT), GAME_FONT, SCORE_FONT, WHITE)
+
+    sprites = assets.get('sprites')
+
+def set_frame_timing(alpha, elapsed):
+    global render_alpha, anim_scale
+    render_alpha = alpha
+    # Frame-based animations were tuned for 60 FPS
+    anim_scale = min(elapsed * 60, 4.0)
+
+def lap(stage):
+    # Charge the time since the last lap to stage, when profiling
+    if profiler:
+        profiler.lap(stage)
+
+def interpolate(entity):
+    # Draw position between the entity's previous and current tick positions
+    x = entity.prev_x + (entity.x - entity.prev_x) * render_alpha
+    y = entity.prev_y + (entity.y - entity.prev_y) * render_alpha
+    return int(x), int(y)
+
+class Player(engine.Player):
+    __slots__ = ('mouth_angle', 'mouth_opening', 'powerup_timer')
+
+    def reset(self):
+        super().reset()
         self.mouth_angle = 0
         self.mouth_opening = True
         self.powerup_timer = 0
-        self.chomp_timer = 0
-        self.is_dead = False
-
-    def reset_position(self):
-        self.x = CELL_SIZE * 1.5
-        self.y = CELL_SIZE * 1.5
-
-    def can_move(self, x, y):
-        temp_rect = pygame.Rect(x - self.radius, y - self.radius,
-                              self.radius * 2, self.radius * 2)
-        for wall in self.walls:
-            if temp_rect.colliderect(wall.rect):
-                return False
-        return True
-
-    def move(self):
-        keys = pygame.key.get_pressed()
-        
-        # Update next_direction based on key press
-        if keys[pygame.K_LEFT]:
-            self.next_direction = (-1, 0)
-            self.direction = 180
-        elif keys[pygame.K_RIGHT]:
-            self.next_direction = (1, 0)
-            self.direction = 0
-        elif keys[pygame.K_UP]:
-            self.next_direction = (0, -1)
-            self.direction = 90
-        elif keys[pygame.K_DOWN]:
-            self.next_direction = (0, 1)
-            self.direction = 270
-
-        # Try to move in next_direction if it's different from current
-        if self.next_direction != self.current_direction:
-            next_x = self.x + self.next_direction[0] * self.speed
-            next_y = self.y + self.next_direction[1] * self.speed
-            if self.can_move(next_x, next_y):
-                self.current_direction = self.next_direction
-            
-        # Move in current direction if possible
-        next_x = self.x + self.current_direction[0] * self.speed
-        next_y = self.y + self.current_direction[1] * self.speed
-        if self.can_move(next_x, next_y):
-            self.x = next_x
-            self.y = next_y
-        else:
-            # Try to slide along walls when hitting them at an angle
-            next_x = self.x + self.current_direction[0] * self.speed
-            if self.can_move(next_x, self.y):
-                self.x = next_x
-            
-            next_y = self.y + self.current_direction[1] * self.speed
-            if self.can_move(self.x, next_y):
-                self.y = next_y
 
     def draw(self):
         # Animate mouth
         if self.current_direction != (0, 0):
             if self.mouth_opening:
-                self.mouth_angle += PACMAN_ANIM_SPEED * 30
+                self.mouth_angle += PACMAN_ANIM_SPEED * 30 * anim_scale
                 if self.mouth_angle >= 45:
                     self.mouth_opening = False
             else:
-                self.mouth_angle -= PACMAN_ANIM_SPEED * 30
+                self.mouth_angle -= PACMAN_ANIM_SPEED * 30 * anim_scale
                 if self.mouth_angle <= 5:
                     self.mouth_opening = True
-        
-        # Draw Pacman body with gradient
-        radius = self.radius
-        x, y = int(self.x), int(self.y)
-        
-        # Draw main body with anti-aliasing
-        pygame.gfxdraw.filled_circle(screen, x, y, radius, YELLOW)
-        pygame.gfxdraw.aacircle(screen, x, y, radius, YELLOW)
-        
-        # Draw mouth
-        if self.current_direction != (0, 0):
-            start_angle = self.direction - self.mouth_angle
-            end_angle = self.direction + self.mouth_angle
-            points = [(x, y)]
-            
-            for angle in range(int(start_angle), int(end_angle), 5):
-                rad = math.radians(angle)
-                points.append((x + radius * math.cos(rad),
-                             y - radius * math.sin(rad)))
-            
-            points.append((x, y))
-            if len(points) > 2:
-                pygame.gfxdraw.filled_polygon(screen, points, BLACK)
-                pygame.gfxdraw.aapolygon(screen, points, BLACK)
-
-    def collect_pellet(self):
-        self.score += 10
-        if self.chomp_timer <= 0:
-            if SOUND_ENABLED:
-                chomp_sound.play()
-            self.chomp_timer = 10
-        self.chomp_timer -= 1
-
-    def die(self):
-        if not self.is_dead:
-            self.is_dead = True
-            if SOUND_ENABLED:
-                death_sound.play()
-            pygame.time.wait(1)  # Small delay for death animation
-    
-class Ghost:
-    def __init__(self, walls):
-        self.walls = walls
-        self.radius = 15
-        self.respawn()
-        self.path = []
-        self.path_update_counter = 0
-        self.path_update_frequency = 45
-        self.chase_counter = 0
-        self.chase_mode = True
-        self.scatter_time = 180
-        self.chase_time = 300
+
+        direction = self.direction if self.current_direction != (0, 0) else None
+        key = sprites.pacman_key(direction, self.mouth_angle)
+        x, y = camera.to_screen(*interpolate(self))
+        return sprites.blit(screen, key, x, y)
+
+class Ghost(engine.Ghost):
+    __slots__ = ('wave_offset', 'color_shift')
+
+    def __init__(self, maze, rng, pathfinder=None):
+        super().__init__(maze, rng, pathfinder)
+        # Animation only, so it doesn't draw from the simulation's seeded rng
         self.wave_offset = random.random() * math.pi * 2
         self.color_shift = 0
-        
-    def respawn(self):
-        corners = [
-            (CELL_SIZE * 1.5, SCREEN_HEIGHT - CELL_SIZE * 1.5),
-            (SCREEN_WIDTH - CELL_SIZE * 1.5, CELL_SIZE * 1.5),
-            (SCREEN_WIDTH - CELL_SIZE * 1.5, SCREEN_HEIGHT - CELL_SIZE * 1.5)
-        ]
-        self.x, self.y = random.choice(corners)
-        self.speed = GHOST_SPEED
-        self.scatter_corner = random.choice(corners)  # Assign a corner to scatter to
-
-    def get_grid_pos(self, x, y):
-        return (int(y // CELL_SIZE), int(x // CELL_SIZE))
-
-    def get_valid_neighbors(self, pos):
-        row, col = pos
-        neighbors = []
-        for dr, dc in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
-            new_row, new_col = row + dr, col + dc
-            if (0 <= new_row < len(MAZE) and 
-                0 <= new_col < len(MAZE[0]) and 
-                MAZE[new_row][new_col] == 0):
-                neighbors.append((new_row, new_col))
-        return neighbors
-
-    def find_path_to_player(self, player_x, player_y):
-        start = self.get_grid_pos(self.x, self.y)
-        goal = self.get_grid_pos(player_x, player_y)
-        
-        if start == goal:
-            return []
-
-        queue = [(start, [])]
-        visited = {start}
-        
-        while queue:
-            current, path = queue.pop(0)
-            
-            for next_pos in self.get_valid_neighbors(current):
-                if next_pos not in visited:
-                    visited.add(next_pos)
-                    new_path = path + [next_pos]
-                    if next_pos == goal:
-                        return new_path
-                    queue.append((next_pos, new_path))
-        
-        return []
-
-    def move(self, player_x, player_y):
-        # Update chase/scatter mode
-        self.chase_counter += 1
-        if self.chase_mode and self.chase_counter >= self.chase_time:
-            self.chase_mode = False
-            self.chase_counter = 0
-        elif not self.chase_mode and self.chase_counter >= self.scatter_time:
-            self.chase_mode = True
-            self.chase_counter = 0
-
-        # Update path periodically
-        self.path_update_counter += 1
-        if self.path_update_counter >= self.path_update_frequency:
-            if self.chase_mode:
-                self.path = self.find_path_to_player(player_x, player_y)
-            else:
-                # In scatter mode, head to scatter corner
-                self.path = self.find_path_to_player(self.scatter_corner[0], self.scatter_corner[1])
-            self.path_update_counter = 0
-
-        if not self.path:
-            return
-
-        # Get next target position from path
-        next_row, next_col = self.path[0]
-        target_x = next_col * CELL_SIZE + CELL_SIZE // 2
-        target_y = next_row * CELL_SIZE + CELL_SIZE // 2
-
-        # Move towards target
-        dx = target_x - self.x
-        dy = target_y - self.y
-        dist = (dx ** 2 + dy ** 2) ** 0.5
-        
-        if dist < self.speed:
-            self.path.pop(0)
-        else:
-            if dist != 0:
-                self.x += (dx / dist) * self.speed
-                self.y += (dy / dist) * self.speed
 
     def draw(self):
-        # Ghost body
-        x, y = int(self.x), int(self.y)
-        
-        # Determine ghost color with wave effect
-        if self.chase_mode:
-            base_color = RED
-        else:
-            base_color = NEON_BLUE
-            
+        ticks = pygame.time.get_ticks()
+
         # Add wavey animation
-        wave = math.sin(pygame.time.get_ticks() * 0.004 + self.wave_offset) * 0.2 + 0.8
-        color = tuple(int(c * wave) for c in base_color)
-        
-        # Draw main body with anti-aliasing
-        pygame.gfxdraw.filled_circle(screen, x, y, self.radius, color)
-        pygame.gfxdraw.aacircle(screen, x, y, self.radius, color)
-        
-        # Draw bottom part (wavy)
-        points = [(x - self.radius, y)]
-        for i in range(6):
-            wave_x = x - self.radius + (i * self.radius / 2)
-            wave_y = y + math.sin(pygame.time.get_ticks() * 0.01 + i) * 3
-            points.append((wave_x, wave_y + self.radius - 2))
-        points.append((x + self.radius, y))
-        
-        pygame.gfxdraw.filled_polygon(screen, points, color)
-        pygame.gfxdraw.aapolygon(screen, points, color)
-        
-        # Draw eyes
-        eye_color = WHITE
-        eye_radius = self.radius // 3
-        
-        # Left eye
-        left_eye_x = x - self.radius // 2
-        pygame.gfxdraw.filled_circle(screen, left_eye_x, y - 2, eye_radius, eye_color)
-        
-        # Right eye
-        right_eye_x = x + self.radius // 2
-        pygame.gfxdraw.filled_circle(screen, right_eye_x, y - 2, eye_radius, eye_color)
-        
-        # Pupils (follow player)
-        pupil_color = BLACK
-        pupil_radius = eye_radius // 2
-        
-        # Calculate pupil offset based on movement direction
-        if self.path and len(self.path) > 0:
+        wave = math.sin(ticks * 0.004 + self.wave_offset) * 0.2 + 0.8
+
+        # Pupils follow the movement direction
+        pupil_angle = None
+        if self.path:
             next_pos = self.path[0]
             dx = (next_pos[1] * CELL_SIZE + CELL_SIZE // 2) - self.x
             dy = (next_pos[0] * CELL_SIZE + CELL_SIZE // 2) - self.y
-            angle = math.atan2(dy, dx)
-            pupil_offset_x = math.cos(angle) * 2
-            pupil_offset_y = math.sin(angle) * 2
+            pupil_angle = math.atan2(dy, dx)
+
+        key = sprites.ghost_key(self.chase_mode, wave, ticks * 0.01, pupil_angle)
+        x, y = camera.to_screen(*interpolate(self))
+        return sprites.blit(screen, key, x, y)
+
+class PelletGlow:
+    # The pulse every pellet shares
+    def __init__(self):
+        self.value = 0
+        self.increasing = True
+
+    def advance(self):
+        if self.increasing:
+            self.value += 0.1 * anim_scale
+            if self.value >= 1:
+                self.increasing = False
         else:
-            pupil_offset_x = pupil_offset_y = 0
-            
-        # Draw pupils
-        pygame.gfxdraw.filled_circle(screen, 
-                                   int(left_eye_x + pupil_offset_x), 
-                                   int(y - 2 + pupil_offset_y), 
-                                   pupil_radius, pupil_color)
-        pygame.gfxdraw.filled_circle(screen, 
-                                   int(right_eye_x + pupil_offset_x), 
-                                   int(y - 2 + pupil_offset_y), 
-                                   pupil_radius, pupil_color)
-
-class Pellet:
-    def __init__(self, walls):
-        self.walls = walls
-        self.radius = 4
-        self.respawn()
-        self.glow_value = 0
-        self.glow_increasing = True
-        
-    def respawn(self):
-        while True:
-            # Try to place pellet in a valid position
-            col = random.randint(1, len(MAZE[0]) - 2)
-            row = random.randint(1, len(MAZE) - 2)
-            
-            if MAZE[row][col] == 0:  # If it's an empty space
-                self.x = col * CELL_SIZE + CELL_SIZE // 2
-                self.y = row * CELL_SIZE + CELL_SIZE // 2
-                
-                # Check if it's not inside any wall
-                pellet_rect = pygame.Rect(self.x - self.radius, self.y - self.radius,
-                                        self.radius * 2, self.radius * 2)
-                valid_position = True
-                for wall in self.walls:
-                    if pellet_rect.colliderect(wall.rect):
-                        valid_position = False
-                        break
-                
-                if valid_position:
-                    break
+            self.value -= 0.1 * anim_scale
+            if self.value <= 0:
+                self.increasing = True
+        return self.value
+
+pellet_glow = PelletGlow()
+
+class RenderedGameState(GameState):
+    # Same simulation, with entities that know how to draw themselves
+    player_class = Player
+    ghost_class = Ghost
+
+class RenderedSwarmGameState(SwarmGameState):
+    # Batched ghosts are drawn by draw_swarm
+    player_class = Player
+
+def draw_pellets(pellets):
+    # Every pellet in view in one batch, straight from the pellet field
+    view = camera.visible_area(CULL_MARGIN)
+    rows = slice(max(0, view.top // CELL_SIZE), max(0, view.bottom // CELL_SIZE + 1))
+    cols = slice(max(0, view.left // CELL_SIZE), max(0, view.right // CELL_SIZE + 1))
+    tiles = pellets.tiles(rows, cols)
+    key = sprites.pellet_key(pellets.radius + 2 * pellet_glow.advance())
+    if not len(tiles):
+        return []
+    x = (tiles % pellets.cols) * CELL_SIZE + CELL_SIZE // 2 - camera.x
+    y = (tiles // pellets.cols) * CELL_SIZE + CELL_SIZE // 2 - camera.y
+    return sprites.blits(screen, key, zip(x.tolist(), y.tolist()))
+
+def draw_swarm(swarm):
+    # Cull and animate batched ghosts with their arrays, then blit the ones
+    # in view
+    view = camera.visible_area(CULL_MARGIN)
+    x = swarm.prev_x + (swarm.x - swarm.prev_x) * render_alpha
+    y = swarm.prev_y + (swarm.y - swarm.prev_y) * render_alpha
+    visible = numpy.flatnonzero((x >= view.left) & (x < view.right) &
+                                (y >= view.top) & (y < view.bottom))
+    if not len(visible):
+        return []
+    ticks = pygame.time.get_ticks()
+    waves = numpy.sin(ticks * 0.004 + visible * GOLDEN_ANGLE) * 0.2 + 0.8
+
+    # Pupils follow the movement direction
+    waypoints = swarm.waypoint[visible]
+    dx = (waypoints % swarm.cols) * CELL_SIZE + CELL_SIZE // 2 - swarm.x[visible]
+    dy = (waypoints // swarm.cols) * CELL_SIZE + CELL_SIZE // 2 - swarm.y[visible]
+    angles = numpy.arctan2(dy, dx)
+
+    rects = []
+    for chase_mode, wave, angle, has_path, ghost_x, ghost_y in zip(
+            swarm.chase_mode[visible].tolist(), waves.tolist(), angles.tolist(),
+            (waypoints >= 0).tolist(), x[visible].tolist(), y[visible].tolist()):
+        key = sprites.ghost_key(chase_mode, wave, ticks * 0.01, angle if has_path else None)
+        screen_x, screen_y = camera.to_screen(int(ghost_x), int(ghost_y))
+        rects.append(sprites.blit(screen, key, screen_x, screen_y))
+    return rects
+
+def draw_score(score):
+    return score_text.draw(screen, score)
+
+def draw_fps():
+    return fps_text.draw(screen, round(clock.get_fps()))
+
+def read_action():
+    keys = pygame.key.get_pressed()
+    if keys[pygame.K_LEFT]:
+        return engine.LEFT
+    elif keys[pygame.K_RIGHT]:
+        return engine.RIGHT
+    elif keys[pygame.K_UP]:
+        return engine.UP
+    elif keys[pygame.K_DOWN]:
+        return engine.DOWN
+    return engine.NOOP
+
+def play_sounds(events):
+    if not SOUND_ENABLED:
+        return
+    if engine.EVENT_CHOMP in events:
+        sound = chomp_sound.peek()
+        if sound:
+            sound.play()
+    if engine.EVENT_DEATH in events:
+        sound = death_sound.peek()
+        if sound:
+            sound.play()
+
+class ProfilerHud:
+    # Frame time percentiles next to the score. The text is only re-rendered
+    # every `refresh` frames so the HUD barely shows up in its own numbers.
+    def __init__(self, profiler, topleft=(200, 12), refresh=30):
+        self.profiler = profiler
+        self.topleft = topleft
+        self.refresh = refresh
+        self.font = pygame.font.Font(None, 20)
+        self.surface = None
+        self.rendered_at = -refresh
+
+    def render(self):
+        # Two columns: stage name, then p50 / p99 in milliseconds
+        rows = [('frame p50 / p99', self.profiler.stats())]
+        rows.extend((stage, self.profiler.stats(stage)) for stage in self.profiler.stages)
+        labels = [self.font.render(name, True, WHITE) for name, _ in rows]
+        values = [self.font.render(f"{stats['p50']:.2f} / {stats['p99']:.2f} ms", True, WHITE)
+                  for _, stats in rows]
+        label_width = max(label.get_width() for label in labels) + 12
+        width = label_width + max(value.get_width() for value in values) + 8
+        line_height = self.font.get_linesize()
+        surface = pygame.Surface((width, line_height * len(rows) + 6), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 170))
+        for i, (label, value) in enumerate(zip(labels, values)):
+            surface.blit(label, (4, 3 + i * line_height))
+            surface.blit(value, (label_width, 3 + i * line_height))
+        self.surface = surface
 
     def draw(self):
-        # Add pulsing glow effect
-        if self.glow_increasing:
-            self.glow_value += 0.1
-            if self.glow_value >= 1:
-                self.glow_increasing = False
-        else:
-            self.glow_value -= 0.1
-            if self.glow_value <= 0:
-                self.glow_increasing = True
-                
-        glow_radius = self.radius + 2 * self.glow_value
-        glow_color = (255, 255, 255)  # Remove alpha channel
-        
-        # Draw glow
-        pygame.gfxdraw.filled_circle(screen, int(self.x), int(self.y), 
-                                   int(glow_radius), glow_color)
-        # Draw pellet
-        pygame.gfxdraw.filled_circle(screen, int(self.x), int(self.y), 
-                                   self.radius, PELLET_COLOR)
-        pygame.gfxdraw.aacircle(screen, int(self.x), int(self.y), 
-                               self.radius, PELLET_COLOR)
-
-def create_walls():
-    walls = []
-    for row in range(len(MAZE)):
-        for col in range(len(MAZE[0])):
-            if MAZE[row][col] == 1:
-                walls.append(Wall(col * CELL_SIZE, row * CELL_SIZE, 
-                                CELL_SIZE, CELL_SIZE))
-    return walls
+        if self.profiler.count - self.rendered_at >= self.refresh:
+            self.render()
+            self.rendered_at = self.profiler.count
+        return screen.blit(self.surface, self.topleft)
+
+def draw_entities(state):
+    # Draw game objects and the score, returning the screen areas touched.
+    # Sprites outside the camera's view are skipped.
+    view = camera.visible_area(CULL_MARGIN)
+    rects = draw_pellets(state.pellets)
+    lap('draw.pellets')
+    rects.extend(ghost.draw() for ghost in state.ghosts
+                 if view.collidepoint(ghost.x, ghost.y))
+    if isinstance(state, SwarmGameState):
+        rects.extend(draw_swarm(state.swarm))
+    lap('draw.ghosts')
+    rects.append(state.player.draw())
+    lap('draw.player')
+    rects.append(draw_score(state.score))
+    if show_fps:
+        rects.append(draw_fps())
+    lap('draw.score')
+    if profiler_hud:
+        rects.append(profiler_hud.draw())
+        lap('draw.profiler')
+    return rects
+
+def draw_game_over(state):
+    # Dimmed screen with the final score
+    return game_over_panel.draw(screen, state.score)
+
+def draw_game(state, walls):
+    # Draw walls; the cached layer also clears the background
+    walls.update(anim_scale)
+    walls.draw(screen, camera)
+    lap('draw.walls')
+
+    draw_entities(state)
+
+    # Draw game over screen
+    if state.game_over:
+        draw_game_over(state)
+        lap('draw.game_over')
+
+def create_background(walls):
+    # Snapshot of the visible maze in the display's pixel format, for dirty
+    # rects
+    background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+    walls.draw(background, camera)
+    return background
+
+def present_frame(state, walls, renderer=None):
+    # Draw the current state and show it on the display
+    moved = camera.follow(*interpolate(state.player))
+    if renderer and moved:
+        # Scrolling changes the whole background
+        renderer.set_background(create_background(walls))
+    if renderer and not state.game_over:
+        renderer.begin_frame()
+        lap('draw.restore')
+        rects = draw_entities(state)
+        renderer.end_frame(rects)
+        lap('display.update')
+    else:
+        draw_game(state, walls)
+        pygame.display.flip()
+        lap('display.flip')
+        if renderer:
+            renderer.invalidate()
+
+def main(seed=None, dirty_rects=False, tick_rate=engine.TICK_RATE, fps=60,
+         profile=False, profile_out=None, maze=None, ghosts=engine.NUM_GHOSTS,
+         swarm=False, record=None, fps_counter=False, sound=None, ai_budget=None,
+         pellets=engine.NUM_PELLETS, swept=False):
+    global profiler, profiler_hud, show_fps
+    started = time.perf_counter()
+    show_fps = fps_counter
+    profiler = profiler_hud = None
+    # Assets load in the background while the maze and game are set up
+    init(wait=False, sound=sound)
+    maze_path = maze
+    maze = load_maze(maze_path) if maze_path else engine.MAZE
+    if record and seed is None:
+        seed = replay.fresh_seed()
+    state_class = RenderedSwarmGameState if swarm else RenderedGameState
+    state = state_class(seed, maze=maze, num_ghosts=ghosts, num_pellets=pellets,
+                        tick_rate=tick_rate, ai_budget=ai_budget, swept=swept)
+    camera.set_world((state.width, state.height))
+    camera.follow(*interpolate(state.player))
+    assets.submit('walls', create_walls, state)
+    # Every game of the session goes into the recording
+    recorder = None
+    if record:
+        recorder = replay.Recorder(state, maze_path)
+        recorder.begin(state)
+    if profile or profile_out:
+        profiler = FrameProfiler()
+        state.profiler = profiler
+        if profile:
+            profiler_hud = ProfilerHud(profiler)
+    # Logic runs at tick_rate no matter how fast frames are drawn
+    timestep = FixedTimestep(tick_rate)
+    finish_init()
+    walls = assets.get('walls')
+    startup_times['init'] = time.perf_counter() - started
+
+    # Dirty-rect mode keeps the walls static (no glow) so that only moving
+    # sprites and the score need repainting each frame
+    renderer = None
+    if dirty_rects:
+        walls.update()
+        renderer = DirtyRectRenderer(screen, create_background(walls))
 
-def draw_score(score):
-    score_surface = SCORE_FONT.render(f'Score: {score}', True, WHITE)
-    score_rect = score_surface.get_rect(topleft=(10, 10))
-    
-    # Draw shadow
-    shadow_surface = SCORE_FONT.render(f'Score: {score}', True, (50, 50, 50))
-    shadow_rect = shadow_surface.get_rect(topleft=(12, 12))
-    screen.blit(shadow_surface, shadow_rect)
-    
-    # Draw text
-    screen.blit(score_surface, score_rect)
-
-def main():
-    walls = create_walls()
-    player = Player(walls)
-    ghosts = [Ghost(walls) for _ in range(3)]
-    pellets = [Pellet(walls) for _ in range(10)]
-    
     running = True
-    game_over = False
-    
+
     while running:
+        # fps=0 renders as fast as the display allows
+        elapsed = clock.tick(fps) / 1000.0
+        if profiler:
+            profiler.begin_frame()
+
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
-            elif event.type == pygame.KEYDOWN and game_over:
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3 and profiler:
+                # Toggle the profiler HUD
+                profiler_hud = None if profiler_hud else ProfilerHud(profiler)
+                if renderer:
+                    renderer.invalidate()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F2:
+                # Toggle the FPS counter
+                show_fps = not show_fps
+                if renderer:
+                    renderer.invalidate()
+            elif event.type == pygame.KEYDOWN and state.game_over:
                 if event.key == pygame.K_SPACE:
                     # Reset game
-                    player = Player(walls)
-                    ghosts = [Ghost(walls) for _ in range(3)]
-                    pellets = [Pellet(walls) for _ in range(10)]
-                    game_over = False
-        
-        if not game_over:
+                    if recorder:
+                        recorder.end(state)
+                        state.reset(replay.fresh_seed())
+                        recorder.begin(state)
+                    else:
+                        state.reset()
+                    timestep.reset()
+        action = read_action()
+        lap('input')
+
+        for _ in range(timestep.advance(elapsed)):
+            if state.game_over:
+                break
             # Game logic
-            player.move()
-            
-            # Move ghosts
-            for ghost in ghosts:
-                ghost.move(player.x, player.y)
-                
-                # Check collision with player
-                dist = ((ghost.x - player.x) ** 2 + (ghost.y - player.y) ** 2) ** 0.5
-                if dist < player.radius + ghost.radius:
-                    player.die()
-                    running = False
-
-            # Check pellet collection
-            for pellet in pellets[:]:
-                dist = ((pellet.x - player.x) ** 2 + (pellet.y - player.y) ** 2) ** 0.5
-                if dist < player.radius + pellet.radius:
-                    player.collect_pellet()
-                    pellets.remove(pellet)
-                    if len(pellets) == 0:
-                        running = False
-        
-        # Drawing
-        screen.fill(BACKGROUND_COLOR)
-        
-        # Draw walls
-        for wall in walls:
-            wall.draw()
-        
-        # Draw game objects
-        for pellet in pellets:
-            pellet.draw()
-        for ghost in ghosts:
-            ghost.draw()
-        player.draw()
-        
-        # Draw score
-        draw_score(player.score)
-        
-        # Draw game over screen
-        if game_over:
-            # Create semi-transparent overlay
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-            overlay.fill((0, 0, 0))
-            overlay.set_alpha(128)
-            screen.blit(overlay, (0, 0))
-            
-            # Draw game over text
-            game_over_text = GAME_FONT.render('Game Over!', True, WHITE)
-            score_text = GAME_FONT.render(f'Final Score: {player.score}', True, WHITE)
-            restart_text = SCORE_FONT.render('Press SPACE to restart', True, WHITE)
-            
-            screen.blit(game_over_text, 
-                       game_over_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 50)))
-            screen.blit(score_text, 
-                       score_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 10)))
-            screen.blit(restart_text, 
-                       restart_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 70)))
-        
-        pygame.display.flip()
-        clock.tick(60)
-
+            events = state.step(action)
+            if recorder:
+                recorder.record(action)
+            play_sounds(events)
+            lap('audio')
+        set_frame_timing(timestep.alpha, elapsed)
+
+        present_frame(state, walls, renderer)
+        if 'first_frame' not in startup_times:
+            startup_times['first_frame'] = time.perf_counter() - started
+            startup_times.update(assets.timings)
+        if profiler:
+            profiler.end_frame()
+
+    if profile_out:
+        profiler.dump(profile_out)
+    if recorder:
+        recorder.end(state)
+        recorder.save(record)
+    assets.shutdown()
     pygame.quit()
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Pacman')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='seed for a reproducible game')
+    parser.add_argument('--maze', metavar='PATH',
+                        help='play a .maze file (larger mazes scroll)')
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help='only repaint moving sprites (static walls, less fill rate)')
+    parser.add_argument('--ghosts', type=int, default=engine.NUM_GHOSTS,
+                        help='number of ghosts')
+    parser.add_argument('--swarm', action='store_true',
+                        help='update ghosts in batches (for hundreds of ghosts)')
+    parser.add_argument('--pellets', type=engine.pellet_count, default=engine.NUM_PELLETS,
+                        metavar='N|full', help="number of pellets, or 'full' for one on every tile")
+    parser.add_argument('--ai-budget', type=int, metavar='N',
+                        help='replan ghosts on events, at most N units of path search per tick')
+    parser.add_argument('--tick-rate', type=int, default=engine.TICK_RATE,
+                        help='game logic ticks per second')
+    parser.add_argument('--swept', action='store_true',
+                        help='swept collision, exact at any tick rate')
+    parser.add_argument('--fps', type=int, default=60,
+                        help='frame rate cap, 0 for uncapped')
+    parser.add_argument('--record', metavar='PATH',
+                        help='save the inputs of every game for replay.py')
+    parser.add_argument('--mute', action='store_true',
+                        help="don't open the audio device")
+    parser.add_argument('--show-fps', action='store_true',
+                        help='show the frame rate (F2 toggles)')
+    parser.add_argument('--profile', action='store_true',
+                        help='time each stage of the frame and show a HUD (F3 toggles)')
+    parser.add_argument('--profile-out', metavar='PATH',
+                        help='write per-frame stage timings on exit (.csv or .json)')
+    args = parser.parse_args(argv)
+    if args.tick_rate <= 0:
+        parser.error('--tick-rate must be positive')
+    if args.swarm and args.ai_budget:
+        parser.error('--ai-budget schedules ghost objects and has no effect with --swarm')
+    if args.record and args.seed is not None and not (
+            -replay.SEED_RANGE <= args.seed < replay.SEED_RANGE):
+        parser.error(f'--record needs a --seed from {-replay.SEED_RANGE} to {replay.SEED_RANGE - 1}')
+    return args
+
 if __name__ == "__main__":
-    MAZE = [
-        [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-        [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1],
-        [1, 0, 1, 1, 0, 1, 0, 1, 1, 1, 1, 1, 1, 0, 1, 0, 1, 1, 0, 1],
-        [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-        [1, 0, 1, 1, 0, 1, 1, 1, 0, 1, 1, 0, 1, 1, 1, 0, 1, 1, 0, 1],
-        [1, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-        [1, 1, 1, 1, 0, 1, 0, 1, 0, 1, 1, 0, 1, 0, 1, 0, 1, 1, 1, 1],
-        [1, 1, 1, 1, 0, 1, 0, 1, 0, 0, 0, 0, 1, 0, 1, 0, 1, 1, 1, 1],
-        [1, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-        [1, 0, 1, 1, 0, 1, 1, 1, 0, 1, 1, 0, 1, 1, 1, 0, 1, 1, 0, 1],
-        [1, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 1],
-        [1, 1, 0, 1, 0, 1, 0, 1, 1, 1, 1, 1, 1, 0, 1, 0, 1, 0, 1, 1],
-        [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1],
-        [1, 0, 1, 1, 1, 1, 1, 1, 0, 1, 1, 0, 1, 1, 1, 1, 1, 1, 0, 1],
-        [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1]
-    ]
-    main()
+    args = parse_args()
+    main(seed=args.seed, dirty_rects=args.dirty_rects,
+         tick_rate=args.tick_rate, fps=args.fps,
+         profile=args.profile, profile_out=args.profile_out, maze=args.maze,
+         ghosts=args.ghosts, swarm=args.swarm, record=args.record,
+         fps_counter=args.show_fps, sound=False if args.mute else None,
+         ai_budget=args.ai_budget, pellets=args.pellets, swept=args.swept)
@@ -0,0 +1,134 @@
+from array import array
+from collections import OrderedDict, deque
+
+from mazes import EAST, NORTH, SOUTH, WEST, MazeData
+
+# Shared ghost pathfinding for a static maze.
+#
+# Instead of every ghost running its own BFS from its position, a PathFinder
+# runs one BFS outward from each goal tile and remembers, for every reachable
+# tile, which neighbour is one step closer to that goal. Any number of ghosts
+# chasing the same goal share that table and look their next move up in O(1).
+
+UNREACHABLE = -1
+
+# Cached tables hold two 4 byte ints per maze cell; cap their total size.
+# At least 8 goals stay cached however big the maze.
+TABLE_BYTES_PER_CELL = 8
+CACHE_BUDGET_BYTES = 128 * 2 ** 20
+
+
+class PathFinder:
+    def __init__(self, maze, max_cached_goals=None):
+        data = maze if isinstance(maze, MazeData) else MazeData.from_grid(maze)
+        self.rows, self.cols = data.shape
+        size = self.rows * self.cols
+        if max_cached_goals is None:
+            max_cached_goals = max(8, min(256, CACHE_BUDGET_BYTES
+                                          // (TABLE_BYTES_PER_CELL * size)))
+        self.max_cached_goals = max_cached_goals
+        self.free = (data.grid == 0).tobytes()
+        self.free_count = int(data.free_cells.shape[0])
+        # Open neighbours as a bitmask per flat cell index, in the same order
+        # Ghost.get_valid_neighbors has always used
+        self.mask = data.neighbor_mask.tobytes()
+        steps = ((EAST, 1), (SOUTH, self.cols), (WEST, -1), (NORTH, -self.cols))
+        # Index offsets of the open neighbours for each of the 16 mask values
+        self.offsets = [tuple(offset for bit, offset in steps if open_sides & bit)
+                        for open_sides in range(16)]
+
+        self._tables = OrderedDict()
+        self.bfs_runs = 0
+
+    def cell_index(self, pos):
+        return pos[0] * self.cols + pos[1]
+
+    def cell_pos(self, index):
+        return divmod(index, self.cols)
+
+    def in_bounds(self, pos):
+        return 0 <= pos[0] < self.rows and 0 <= pos[1] < self.cols
+
+    def _build_table(self, goal):
+        # BFS outward from the goal. next_hop[i] is the neighbour of i that is
+        # one step closer to the goal, distance[i] the number of steps left.
+        size = self.rows * self.cols
+        next_hop = [UNREACHABLE] * size
+        distance = [UNREACHABLE] * size
+        distance[goal] = 0
+        next_hop[goal] = goal
+        queue = deque([goal])
+        mask = self.mask
+        offsets = self.offsets
+        while queue:
+            current = queue.popleft()
+            step = distance[current] + 1
+            for offset in offsets[mask[current]]:
+                other = current + offset
+                if distance[other] == UNREACHABLE:
+                    distance[other] = step
+                    next_hop[other] = current
+                    queue.append(other)
+        self.bfs_runs += 1
+        # Lists are faster to fill; arrays are what's worth keeping
+        return array('i', next_hop), array('i', distance)
+
+    def table(self, goal):
+        # (next_hop, distance) int arrays for a goal cell index, cached per goal
+        tables = self._tables
+        entry = tables.get(goal)
+        if entry is None:
+            entry = self._build_table(goal)
+            tables[goal] = entry
+            if len(tables) > self.max_cached_goals:
+                tables.popitem(last=False)
+        else:
+            tables.move_to_end(goal)
+        return entry
+
+    def precompute_all(self):
+        # All-pairs next-hop table: one BFS per free tile. Worth it for small
+        # mazes like the shipped 20x15 grid, where it is only a few ms.
+        self.max_cached_goals = max(self.max_cached_goals, sum(self.free))
+        for index, is_free in enumerate(self.free):
+            if is_free:
+                self.table(index)
+
+    def next_step(self, start, goal):
+        # Next (row, col) on a shortest path from start to goal, or None
+        if not (self.in_bounds(start) and self.in_bounds(goal)):
+            return None
+        start_index = self.cell_index(start)
+        goal_index = self.cell_index(goal)
+        if start_index == goal_index or not self.free[goal_index]:
+            return None
+        hop = self.table(goal_index)[0][start_index]
+        if hop == UNREACHABLE:
+            return None
+        return self.cell_pos(hop)
+
+    def distance(self, start, goal):
+        if not (self.in_bounds(start) and self.in_bounds(goal)):
+            return UNREACHABLE
+        goal_index = self.cell_index(goal)
+        if not self.free[goal_index]:
+            return UNREACHABLE
+        return self.table(goal_index)[1][self.cell_index(start)]
+
+    def find_path(self, start, goal):
+        # Full shortest path excluding start, as Ghost.path has always stored it
+        if not (self.in_bounds(start) and self.in_bounds(goal)):
+            return []
+        start_index = self.cell_index(start)
+        goal_index = self.cell_index(goal)
+        if start_index == goal_index or not self.free[goal_index]:
+            return []
+        next_hop = self.table(goal_index)[0]
+        if next_hop[start_index] == UNREACHABLE:
+            return []
+        path = []
+        current = start_index
+        while current != goal_index:
+            current = next_hop[current]
+            path.append(self.cell_pos(current))
+        return path
@@ -0,0 +1,98 @@
+import csv
+import json
+import time
+
+# Low-overhead per-frame stage timer.
+#
+# Code calls lap(stage) after each piece of work; the time since the previous
+# lap is charged to that stage. Stage times for the last `capacity` frames are
+# kept in preallocated ring buffers, so profiling allocates nothing per frame
+# once every stage has been seen. Nothing here depends on pygame, so the
+# engine can report into it too.
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class FrameProfiler:
+    def __init__(self, capacity=600, clock=time.perf_counter):
+        self.capacity = capacity
+        self.clock = clock
+        self.stages = []  # In the order they were first seen
+        self.samples = {}  # stage -> ring buffer of seconds
+        self.frame_times = [0.0] * capacity
+        self.count = 0
+        self.current = {}
+        self.frame_start = self.last = clock()
+
+    def begin_frame(self):
+        self.current.clear()
+        self.frame_start = self.last = self.clock()
+
+    def lap(self, stage):
+        now = self.clock()
+        self.current[stage] = self.current.get(stage, 0.0) + now - self.last
+        self.last = now
+
+    def end_frame(self):
+        slot = self.count % self.capacity
+        self.frame_times[slot] = self.clock() - self.frame_start
+        for stage, seconds in self.current.items():
+            if stage not in self.samples:
+                self.stages.append(stage)
+                self.samples[stage] = [0.0] * self.capacity
+        for stage in self.stages:
+            self.samples[stage][slot] = self.current.get(stage, 0.0)
+        self.count += 1
+
+    def _ordered(self, ring):
+        # Filled part of a ring buffer, oldest first
+        if self.count <= self.capacity:
+            return ring[:self.count]
+        start = self.count % self.capacity
+        return ring[start:] + ring[:start]
+
+    def stats(self, stage=None):
+        # p50/p99/mean/max in milliseconds for one stage, or whole frames
+        ring = self.frame_times if stage is None else self.samples[stage]
+        values = self._ordered(ring)
+        if not values:
+            return {'p50': 0.0, 'p99': 0.0, 'mean': 0.0, 'max': 0.0}
+        return {'p50': percentile(values, 0.5) * 1000,
+                'p99': percentile(values, 0.99) * 1000,
+                'mean': sum(values) / len(values) * 1000,
+                'max': max(values) * 1000}
+
+    def summary(self):
+        summary = {'frames': self.count, 'frame': self.stats()}
+        for stage in self.stages:
+            summary[stage] = self.stats(stage)
+        return summary
+
+    def rows(self):
+        # One dict per recorded frame, oldest first, times in milliseconds
+        first = max(0, self.count - self.capacity)
+        frames = self._ordered(self.frame_times)
+        stages = {stage: self._ordered(self.samples[stage]) for stage in self.stages}
+        for i, frame_time in enumerate(frames):
+            row = {'frame': first + i, 'total_ms': round(frame_time * 1000, 4)}
+            for stage in self.stages:
+                row[stage] = round(stages[stage][i] * 1000, 4)
+            yield row
+
+    def dump(self, path):
+        # Writes CSV for *.csv paths and JSON (summary plus frames) otherwise
+        if path.endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=['frame', 'total_ms'] + self.stages)
+                writer.writeheader()
+                writer.writerows(self.rows())
+        else:
+            with open(path, 'w') as f:
+                json.dump({'summary': self.summary(), 'frames': list(self.rows())}, f, indent=1)
+                f.write('\n')
@@ -0,0 +1,283 @@
+import random
+import struct
+import sys
+import time
+import zlib
+
+import engine
+from mazes import as_grid, load_maze
+from swarm import SwarmGameState
+
+# Compact binary input recordings and headless playback.
+#
+# The engine is deterministic: a game is fully described by its settings,
+# its seed and the action fed to GameState.step on every tick. A recording
+# stores exactly that. Actions are run-length encoded, each run one varint
+# of (count << 3 | action), so holding a direction for a second costs a
+# byte or two. A file holds every game of a session together with the score,
+# tick count and result it ended with, so playback can check that the
+# current code still produces the same games.
+#
+# File layout (little-endian):
+#   header  4s magic, B version, B flags, H tick_rate, H ghosts,
+#           H pellets (FULL_PELLETS_COUNT for engine.FULL_PELLETS),
+#           [I ai_budget if FLAG_SCHEDULED]
+#   maze    H path length, path (utf-8, empty for the classic maze), I crc32
+#   games   I count, then per game: q seed, I ticks, I score, B won,
+#           I run count, runs as varints
+
+MAGIC = b'PREP'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sBBHHH')
+MAZE_INFO = struct.Struct('<H')
+GAME = struct.Struct('<qIIBI')
+
+FLAG_SWARM = 1
+FLAG_SCHEDULED = 2
+FLAG_SWEPT = 4
+AI_BUDGET = struct.Struct('<I')
+FULL_PELLETS_COUNT = 0xffff
+
+SEED_RANGE = 2 ** 63  # Seeds are stored as q: -SEED_RANGE <= seed < SEED_RANGE
+
+
+class ReplayError(Exception):
+    pass
+
+
+def fresh_seed():
+    # Unseeded games still need a seed to be replayable
+    return random.randrange(SEED_RANGE)
+
+
+def maze_crc(maze):
+    return zlib.crc32(as_grid(maze).tobytes())
+
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    value = shift = 0
+    while True:
+        if pos >= len(data):
+            raise ReplayError('truncated recording')
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class RecordedGame:
+    def __init__(self, seed, runs=None, ticks=0, score=0, won=False):
+        self.seed = seed
+        self.runs = runs if runs is not None else []  # [action, count] pairs
+        self.ticks = ticks
+        self.score = score
+        self.won = won
+
+    def actions(self):
+        for action, count in self.runs:
+            for _ in range(count):
+                yield action
+
+
+class Replay:
+    # Game settings plus the recorded games
+    def __init__(self, tick_rate=engine.TICK_RATE, num_ghosts=engine.NUM_GHOSTS,
+                 num_pellets=engine.NUM_PELLETS, swarm=False, maze_path='', crc=None,
+                 ai_budget=None, swept=False):
+        self.tick_rate = tick_rate
+        self.num_ghosts = num_ghosts
+        self.num_pellets = num_pellets
+        self.swarm = swarm
+        self.ai_budget = ai_budget
+        self.swept = swept
+        self.maze_path = maze_path
+        self.crc = crc
+        self.games = []
+
+    @classmethod
+    def for_state(cls, state, maze_path=None):
+        return cls(state.tick_rate, state.num_ghosts, state.num_pellets,
+                   isinstance(state, SwarmGameState), maze_path or '',
+                   maze_crc(state.maze), state.ai_budget, state.swept)
+
+    def load_maze(self, maze=None):
+        # The maze the games were recorded on, checked against its crc
+        if maze is None:
+            maze = load_maze(self.maze_path) if self.maze_path else engine.MAZE
+        if self.crc is not None and maze_crc(maze) != self.crc:
+            raise ReplayError(f'maze {self.maze_path or "classic"} differs from the recorded one')
+        return maze
+
+    def new_state(self, seed, maze=None, state_class=None):
+        if state_class is None:
+            state_class = SwarmGameState if self.swarm else engine.GameState
+        return state_class(seed, maze=self.load_maze(maze), num_ghosts=self.num_ghosts,
+                           num_pellets=self.num_pellets, tick_rate=self.tick_rate,
+                           ai_budget=self.ai_budget, swept=self.swept)
+
+    def to_bytes(self):
+        flags = ((FLAG_SWARM if self.swarm else 0) | (FLAG_SCHEDULED if self.ai_budget else 0)
+                 | (FLAG_SWEPT if self.swept else 0))
+        pellets = self.num_pellets
+        if pellets == engine.FULL_PELLETS:
+            pellets = FULL_PELLETS_COUNT
+        out = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION, flags,
+                                    self.tick_rate, self.num_ghosts, pellets))
+        if self.ai_budget:
+            out += AI_BUDGET.pack(self.ai_budget)
+        path = self.maze_path.encode('utf-8')
+        out += MAZE_INFO.pack(len(path)) + path + struct.pack('<I', self.crc or 0)
+        out += struct.pack('<I', len(self.games))
+        for game in self.games:
+            out += GAME.pack(game.seed, game.ticks, game.score, game.won, len(game.runs))
+            for action, count in game.runs:
+                write_varint(out, count << 3 | action)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < HEADER.size:
+            raise ReplayError('truncated recording')
+        magic, version, flags, tick_rate, ghosts, pellets = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ReplayError('not a recording')
+        if version != FORMAT_VERSION:
+            raise ReplayError(f'unsupported recording version {version}')
+        if pellets == FULL_PELLETS_COUNT:
+            pellets = engine.FULL_PELLETS
+        pos = HEADER.size
+        try:
+            ai_budget = None
+            if flags & FLAG_SCHEDULED:
+                (ai_budget,) = AI_BUDGET.unpack_from(data, pos)
+                pos += AI_BUDGET.size
+            (length,) = MAZE_INFO.unpack_from(data, pos)
+            pos += MAZE_INFO.size
+            path = data[pos:pos + length].decode('utf-8')
+            pos += length
+            crc, count = struct.unpack_from('<II', data, pos)
+            pos += 8
+            replay = cls(tick_rate, ghosts, pellets, bool(flags & FLAG_SWARM), path, crc,
+                         ai_budget, bool(flags & FLAG_SWEPT))
+            for _ in range(count):
+                seed, ticks, score, won, run_count = GAME.unpack_from(data, pos)
+                pos += GAME.size
+                runs = []
+                for _ in range(run_count):
+                    value, pos = read_varint(data, pos)
+                    runs.append([value & 7, value >> 3])
+                replay.games.append(RecordedGame(seed, runs, ticks, score, bool(won)))
+        except struct.error:
+            raise ReplayError('truncated recording')
+        return replay
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+class Recorder:
+    # Collects the actions of a session's games as they are played
+    def __init__(self, state, maze_path=None):
+        self.replay = Replay.for_state(state, maze_path)
+        self.game = None
+
+    def begin(self, state):
+        if state.seed is None:
+            raise ReplayError('only seeded games can be recorded')
+        self.game = RecordedGame(state.seed)
+        self.replay.games.append(self.game)
+
+    def record(self, action):
+        # Call once per GameState.step, with the action it was given
+        runs = self.game.runs
+        if runs and runs[-1][0] == action:
+            runs[-1][1] += 1
+        else:
+            runs.append([action, 1])
+
+    def end(self, state):
+        # Remember how the game ended, for checking playback
+        self.game.ticks = state.tick
+        self.game.score = state.score
+        self.game.won = state.won
+
+    def save(self, path):
+        self.replay.save(path)
+
+
+def play(replay, game, state=None):
+    # Feed a recorded game back through the engine, as fast as possible.
+    # Passing a state from an earlier play() reuses its pathfinding tables.
+    if state is None:
+        state = replay.new_state(game.seed)
+    else:
+        state.reset(game.seed)
+    step = state.step
+    for action, count in game.runs:
+        for _ in range(count):
+            step(action)
+    return state
+
+
+def check(replay, fresh=False):
+    # Replays every game; returns (game index, recorded, replayed) for each
+    # game whose outcome changed. Games share one state, as in the session
+    # that recorded them, unless fresh is set: then each gets a new one, as
+    # when a single game is replayed. Both must give the same results.
+    mismatches = []
+    state = None
+    for index, game in enumerate(replay.games):
+        state = play(replay, game, None if fresh else state)
+        expected = (game.ticks, game.score, game.won)
+        actual = (state.tick, state.score, state.won)
+        if actual != expected:
+            mismatches.append((index, expected, actual))
+    return mismatches
+
+
+def main(argv):
+    # python replay.py [--fresh] FILE [FILE ...]: replay every game headless
+    # and check it ends the way it did when recorded; --fresh replays each
+    # game on a new state
+    fresh = '--fresh' in argv
+    paths = [arg for arg in argv if arg != '--fresh']
+    if not paths:
+        print('usage: python replay.py [--fresh] FILE [FILE ...]')
+        return 2
+    failed = 0
+    for path in paths:
+        try:
+            replay = Replay.load(path)
+            start = time.perf_counter()
+            mismatches = check(replay, fresh)
+        except (OSError, ReplayError) as e:
+            print(f'{path}: {e}')
+            failed += 1
+            continue
+        elapsed = time.perf_counter() - start
+        ticks = sum(game.ticks for game in replay.games)
+        print(f'{path}: {len(replay.games)} games, {ticks} ticks replayed in '
+              f'{elapsed:.2f}s, {len(mismatches)} mismatched')
+        for index, expected, actual in mismatches:
+            print(f'  game {index}: recorded (ticks, score, won) {expected}, replayed {actual}')
+        failed += bool(mismatches)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
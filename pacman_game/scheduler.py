@@ -0,0 +1,110 @@
+from collections import OrderedDict
+
+# Time-sliced ghost replanning.
+#
+# Unscheduled ghosts replan every path_update_frequency ticks, and since a
+# game creates them all on the same tick they all replan on the same tick:
+# with many ghosts or a big maze, every 45th frame pays for all the path
+# searches at once. A GhostScheduler takes replanning over. Ghosts ask for
+# a new path when something happens that makes their current one stale:
+# their chase/scatter mode switched, or they are chasing and the player
+# entered another tile. A periodic refresh stays as a fallback, with each
+# ghost's phase spread over the interval. Requests queue up first come,
+# first served (mode switches jump the queue), and each tick replans only
+# as many as fit in the budget; the rest keep following their current path
+# and go first next tick.
+#
+# The budget is in units of path-search work rather than seconds, so games
+# stay deterministic for replays and batch runs: the first replan towards a
+# goal in a game costs the number of free cells in the maze (a BFS), later
+# ones 1 plus the tile distance to the goal, an estimate of the path walk.
+# Pricing a request never searches, so ghosts left waiting cost nothing.
+# Whether the PathFinder still has the goal's table cached doesn't count,
+# since the cache carries over from earlier games and would make a game
+# depend on more than its seed and inputs. At least one ghost replans every
+# tick.
+
+
+class GhostScheduler:
+    def __init__(self, budget):
+        self.budget = budget
+        self.queue = OrderedDict()  # Ghosts waiting for a replan, oldest first
+        self.player_cell = None
+        self.searched = set()  # Goal cells replanned towards this game
+        self.work = 0  # Spent in the last update()
+        self.replans = 0
+        self.deferred = 0  # Requests left waiting at the end of the last update()
+
+    def reset(self, state):
+        self.queue.clear()
+        self.player_cell = None
+        self.searched.clear()
+        ghosts = state.ghosts
+        for index, ghost in enumerate(ghosts):
+            ghost.scheduled = True
+            # Spread the periodic refreshes evenly over the interval
+            ghost.path_update_counter = index * ghost.path_update_frequency // len(ghosts)
+
+    def request(self, ghost, urgent=False):
+        queue = self.queue
+        if ghost not in queue:
+            queue[ghost] = None
+        if urgent:
+            queue.move_to_end(ghost, last=False)
+
+    def goal(self, ghost, player, pathfinder):
+        # Cell index a replan of ghost heads for, or None if it can't
+        if ghost.chase_mode:
+            x, y = player.x, player.y
+        else:
+            x, y = ghost.scatter_corner
+        goal = ghost.get_grid_pos(x, y)
+        if not pathfinder.in_bounds(goal):
+            return None
+        goal_index = pathfinder.cell_index(goal)
+        if not pathfinder.free[goal_index]:
+            return None
+        return goal_index
+
+    def cost(self, ghost, goal, pathfinder):
+        # Work units a replan of ghost towards goal is charged
+        if goal is None:
+            return 1
+        if goal not in self.searched:
+            return pathfinder.free_count
+        row, col = ghost.get_grid_pos(ghost.x, ghost.y)
+        goal_row, goal_col = pathfinder.cell_pos(goal)
+        return 1 + abs(goal_row - row) + abs(goal_col - col)
+
+    def update(self, state):
+        # Advances every ghost's mode timer and replans within the budget;
+        # called once per tick before the ghosts move
+        player = state.player
+        size = state.grid.cell_size
+        cell = (int(player.y // size), int(player.x // size))
+        player_moved = cell != self.player_cell
+        self.player_cell = cell
+        for ghost in state.ghosts:
+            ghost.path_update_counter += 1
+            if ghost.update_mode():
+                self.request(ghost, urgent=True)
+            elif ((player_moved and ghost.chase_mode)
+                  or ghost.path_update_counter >= ghost.path_update_frequency):
+                self.request(ghost)
+
+        queue = self.queue
+        pathfinder = state.pathfinder
+        work = 0
+        while queue:
+            ghost = next(iter(queue))
+            goal = self.goal(ghost, player, pathfinder)
+            cost = self.cost(ghost, goal, pathfinder)
+            if work and work + cost > self.budget:
+                break
+            del queue[ghost]
+            ghost.replan(player.x, player.y)
+            self.searched.add(goal)
+            work += cost
+            self.replans += 1
+        self.work = work
+        self.deferred = len(queue)
@@ -0,0 +1,453 @@
+import collections
+import sys
+import time
+
+import engine
+import netcode
+from agents import holding_agent
+from engine import GameState
+from mazes import load_maze
+from profiler import percentile
+from replay import maze_crc
+from transport import TcpClientTransport, TcpServerTransport, UdpTransport
+
+# Headless multiplayer server.
+#
+# The server owns the only simulation: the same players, ghosts and pellet
+# field as the single player game, stepped at a fixed tick rate. Clients
+# send nothing but their input (and the last snapshot tick they received);
+# every tick each client gets a snapshot delta-encoded against that tick, see
+# netcode.py. Caught players respawn after a delay, and the board refills
+# with a new round of pellets once it is cleared.
+#
+# BotClient plays with scripted input so bandwidth and tick time can be
+# measured locally; see benchmarks/bench_server.py.
+
+RESPAWN_SECONDS = 3
+HISTORY = 64  # Snapshots kept as baselines, in ticks
+MAX_MESSAGES = 256  # Per tick, so a flood can't stall the simulation
+JOIN_RETRY = 0.5  # Seconds before a bot resends an unanswered JOIN
+
+
+class NetPlayer(engine.Player):
+    # Caught players sit out respawn_timer ticks
+    __slots__ = ('respawn_timer',)
+
+
+class MultiplayerState(GameState):
+    # Any number of players (keyed by id) on one board. step() takes a dict
+    # of player id -> action.
+    player_class = NetPlayer
+
+    def __init__(self, seed=None, maze=engine.MAZE, num_ghosts=engine.NUM_GHOSTS,
+                 num_pellets=engine.NUM_PELLETS, tick_rate=engine.TICK_RATE):
+        self.respawn_ticks = RESPAWN_SECONDS * tick_rate
+        super().__init__(seed, maze, num_ghosts, num_pellets, tick_rate)
+
+    def reset(self, seed=None):
+        self.seed = seed
+        self.rng.seed(seed)
+        self.players = {}
+        self.reset_ghosts()
+        self.apply_tick_rate()
+        self.round = 0
+        self.new_round()
+        self.save_positions()
+        self.tick = 0
+        self.game_over = False
+        self.won = False
+        self.events = []
+
+    def new_round(self):
+        self.round += 1
+        pellets = self.pellets
+        pellets.clear()
+        if self.num_pellets == engine.FULL_PELLETS:
+            pellets.fill()
+        else:
+            pellets.scatter(self.num_pellets, self.rng)
+        # Clients get the round's pellet tiles once, then which are eaten
+        tiles = pellets.tiles().tolist()
+        self.pellet_cells = [divmod(tile, pellets.cols) for tile in tiles]
+        self.pellet_alive = [True] * len(tiles)
+        self.pellet_slots = {tile: slot for slot, tile in enumerate(tiles)}
+
+    def apply_tick_rate(self):
+        scale = engine.TICK_RATE / self.tick_rate
+        self.player_speed = engine.PLAYER_SPEED * scale
+        for ghost in self.ghosts:
+            ghost.speed = engine.GHOST_SPEED * scale
+            ghost.path_update_frequency = max(1, round(ghost.path_update_frequency / scale))
+            ghost.chase_time = max(1, round(ghost.chase_time / scale))
+            ghost.scatter_time = max(1, round(ghost.scatter_time / scale))
+
+    def save_positions(self):
+        for entity in list(self.players.values()) + self.ghosts:
+            entity.prev_x = entity.x
+            entity.prev_y = entity.y
+
+    @property
+    def score(self):
+        return sum(player.score for player in self.players.values())
+
+    def add_player(self, player_id):
+        player = self.player_class(self.grid)
+        player.speed = self.player_speed
+        player.respawn_timer = 0
+        self.players[player_id] = player
+        return player
+
+    def remove_player(self, player_id):
+        self.players.pop(player_id, None)
+
+    def step(self, actions=None):
+        self.events = []
+        actions = actions or {}
+        self.tick += 1
+        self.save_positions()
+
+        alive = []
+        for player_id, player in self.players.items():
+            if player.is_dead:
+                player.respawn_timer -= 1
+                if player.respawn_timer > 0:
+                    continue
+                player.is_dead = False
+                player.reset_position()
+                player.current_direction = player.next_direction = (0, 0)
+            player.move(actions.get(player_id, engine.NOOP))
+            alive.append(player)
+
+        # Each ghost hunts the nearest live player; with nobody to chase
+        # it heads for its scatter corner
+        for ghost in self.ghosts:
+            if alive:
+                target = min(alive, key=lambda player: (player.x - ghost.x) ** 2
+                             + (player.y - ghost.y) ** 2)
+                ghost.move(target.x, target.y)
+            else:
+                ghost.move(*ghost.scatter_corner)
+            for player in alive:
+                if not player.is_dead and ghost.touches(player) and player.die():
+                    player.respawn_timer = self.respawn_ticks
+                    self.events.append(engine.EVENT_DEATH)
+
+        pellets = self.pellets
+        for player in alive:
+            if player.is_dead:
+                continue
+            count = pellets.collect(player.x, player.y, player.radius)
+            if count:
+                self.pellet_alive[self.pellet_slots[pellets.tile_of(player.x, player.y)]] = False
+                for _ in range(count):
+                    player.collect_pellet()
+                    self.events.append(engine.EVENT_PELLET)
+        if not pellets:
+            self.events.append(engine.EVENT_CLEARED)
+            self.new_round()
+        return self.events
+
+    def snapshot(self):
+        quantize = netcode.quantize
+        entities = {}
+        for player_id, player in self.players.items():
+            entities[netcode.player_key(player_id)] = (
+                quantize(player.x), quantize(player.y), player.direction // 90,
+                int(not player.is_dead), player.score)
+        for index, ghost in enumerate(self.ghosts):
+            entities[netcode.ghost_key(index)] = (
+                quantize(ghost.x), quantize(ghost.y), int(ghost.chase_mode))
+        return netcode.Snapshot(self.tick, entities, self.round,
+                                self.pellet_cells, self.pellet_alive)
+
+
+class Client:
+    def __init__(self, player_id):
+        self.player_id = player_id  # 0 for spectators
+        self.acked = 0  # Last snapshot tick the client received
+        self.action = engine.NOOP
+        self.bytes_sent = 0
+        self.snapshots = 0
+        self.full_snapshots = 0
+        self.joined = time.perf_counter()
+
+
+class GameServer:
+    def __init__(self, game, transport, history=HISTORY):
+        self.game = game
+        self.transport = transport
+        self.history = history
+        self.clients = {}  # address -> Client
+        self.snapshots = {}  # tick -> Snapshot, the last `history` ticks
+        self.next_player_id = 1
+        self.tick_times = collections.deque(maxlen=10 * game.tick_rate)
+        self.bad_messages = 0
+        self.send_errors = 0
+        self.maze_crc = maze_crc(game.maze)
+        # Every snapshot has to fit in one message: refuse boards whose
+        # pellets alone don't leave room for a player, and serve players
+        # past the limit as spectators
+        self.max_players = self.players_that_fit()
+        if self.max_players < 1:
+            rows, cols = game.maze.shape
+            raise ValueError(
+                f'a {rows}x{cols} maze with {game.num_pellets} pellets does not fit '
+                f'in a {transport.max_message} byte snapshot, use fewer pellets')
+
+    def players_that_fit(self):
+        game = self.game
+        rows, cols = game.maze.shape
+        # Every round rescatters, so size for the most pellets a round can have
+        pellets = len(game.pellets.cells)
+        if game.num_pellets != engine.FULL_PELLETS:
+            pellets = min(game.num_pellets, pellets)
+        ghosts = len(game.ghosts)
+        fixed = netcode.max_snapshot_size(rows, cols, pellets, 0, ghosts)
+        per_player = netcode.max_snapshot_size(rows, cols, pellets, 1, ghosts) - fixed
+        return (self.transport.max_message - fixed) // per_player
+
+    def send(self, address, data):
+        # A failed send loses one message, never the tick
+        try:
+            self.transport.send(address, data)
+        except (OSError, ValueError):
+            self.send_errors += 1
+
+    def handle(self, address, data):
+        try:
+            kind, fields = netcode.decode_message(data)
+        except netcode.ProtocolError:
+            self.bad_messages += 1
+            return
+        client = self.clients.get(address)
+        if kind == netcode.MSG_JOIN:
+            if client is None:
+                player_id = 0
+                if (fields[0] == netcode.ROLE_PLAYER
+                        and len(self.game.players) < self.max_players):
+                    player_id = self.next_player_id
+                    self.next_player_id += 1
+                    self.game.add_player(player_id)
+                client = self.clients[address] = Client(player_id)
+            # Sent again for repeated JOINs, in case the first one was lost
+            rows, cols = self.game.maze.shape
+            self.send(address, netcode.encode_welcome(
+                client.player_id, self.game.tick_rate, rows, cols, self.maze_crc))
+        elif client is None:
+            return
+        elif kind == netcode.MSG_INPUT:
+            ack, action = fields
+            if ack > client.acked:
+                client.acked = ack
+            client.action = action if action in engine.ACTIONS else engine.NOOP
+        elif kind == netcode.MSG_LEAVE:
+            self.drop(address)
+
+    def drop(self, address):
+        client = self.clients.pop(address, None)
+        if client and client.player_id:
+            self.game.remove_player(client.player_id)
+
+    def tick(self):
+        start = time.perf_counter()
+        transport = self.transport
+        for address, data in transport.receive()[:MAX_MESSAGES]:
+            self.handle(address, data)
+        for address in transport.disconnected():
+            self.drop(address)
+
+        game = self.game
+        game.step({client.player_id: client.action
+                   for client in self.clients.values() if client.player_id})
+        snapshot = game.snapshot()
+        self.snapshots[snapshot.tick] = snapshot
+        self.snapshots.pop(snapshot.tick - self.history, None)
+
+        # Clients that acknowledged the same tick get the same bytes, so each
+        # baseline is only encoded against once
+        encoded = {}
+        for address, client in list(self.clients.items()):
+            baseline = self.snapshots.get(client.acked)
+            base_tick = baseline.tick if baseline else 0
+            data = encoded.get(base_tick)
+            if data is None:
+                data = encoded[base_tick] = netcode.encode_snapshot(snapshot, baseline)
+            self.send(address, data)
+            client.bytes_sent += len(data)
+            client.snapshots += 1
+            if baseline is None:
+                client.full_snapshots += 1
+        self.tick_times.append(time.perf_counter() - start)
+
+    def run(self, seconds=None):
+        # Fixed-rate loop; runs for `seconds`, or until interrupted
+        duration = 1.0 / self.game.tick_rate
+        start = next_tick = time.perf_counter()
+        while seconds is None or next_tick - start < seconds:
+            self.tick()
+            next_tick += duration
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.perf_counter()  # Overloaded: don't try to catch up
+
+    def stats(self):
+        times = list(self.tick_times)
+        now = time.perf_counter()
+        rates = [client.bytes_sent / (now - client.joined)
+                 for client in self.clients.values()]
+        return {'tick': self.game.tick,
+                'players': len(self.game.players),
+                'clients': len(self.clients),
+                'tick_ms_p50': round(percentile(times, 0.5) * 1000, 3),
+                'tick_ms_p99': round(percentile(times, 0.99) * 1000, 3),
+                'tick_ms_max': round(max(times, default=0.0) * 1000, 3),
+                'bytes_per_second_per_client': round(sum(rates) / len(rates)) if rates else 0,
+                'full_snapshots': sum(client.full_snapshots for client in self.clients.values()),
+                'bad_messages': self.bad_messages,
+                'send_errors': self.send_errors}
+
+
+class BotClient:
+    # A client with scripted input: answers every snapshot with an INPUT
+    # acknowledging it
+    def __init__(self, transport, server, role=netcode.ROLE_PLAYER, seed=None):
+        self.transport = transport
+        self.server = server
+        self.role = role
+        self.policy = holding_agent(seed)
+        self.baselines = {}
+        self.latest = None
+        self.player_id = None
+        self.welcome = None
+        self.bytes_received = 0
+        self.snapshots = 0
+        self.errors = 0
+        self.join_time = None
+
+    def join(self):
+        self.join_time = time.perf_counter()
+        self.transport.send(self.server, netcode.encode_join(self.role))
+
+    def poll(self):
+        for _, data in self.transport.receive():
+            self.bytes_received += len(data)
+            try:
+                if data[:1] == bytes((netcode.MSG_SNAPSHOT,)):
+                    self.receive_snapshot(data)
+                else:
+                    kind, fields = netcode.decode_message(data)
+                    if kind == netcode.MSG_WELCOME:
+                        self.player_id = fields[0]
+                        self.welcome = fields
+            except netcode.ProtocolError:
+                self.errors += 1  # e.g. the baseline was lost; the next ack fixes it
+
+    def receive_snapshot(self, data):
+        snapshot = netcode.decode_snapshot(data, self.baselines)
+        if self.latest and snapshot.tick <= self.latest.tick:
+            return  # Out of order
+        self.latest = snapshot
+        self.snapshots += 1
+        self.baselines[snapshot.tick] = snapshot
+        self.baselines.pop(snapshot.tick - HISTORY, None)
+        action = self.policy(snapshot) if self.role == netcode.ROLE_PLAYER else engine.NOOP
+        self.transport.send(self.server, netcode.encode_input(snapshot.tick, action))
+
+    def leave(self):
+        self.transport.send(self.server, netcode.encode_leave())
+
+
+def connect(server, tcp=False):
+    return TcpClientTransport(server) if tcp else UdpTransport()
+
+
+def run_bots(server, players, spectators=0, seconds=None, tcp=False, seed=0):
+    # Runs bots against server until `seconds` have passed; returns them
+    bots = [BotClient(connect(server, tcp), server,
+                      netcode.ROLE_PLAYER if i < players else netcode.ROLE_SPECTATOR,
+                      seed + i)
+            for i in range(players + spectators)]
+    for bot in bots:
+        bot.join()
+    start = time.perf_counter()
+    try:
+        while seconds is None or time.perf_counter() - start < seconds:
+            now = time.perf_counter()
+            for bot in bots:
+                if bot.welcome is None and now - bot.join_time > JOIN_RETRY:
+                    bot.join()
+                bot.poll()
+            time.sleep(0.002)
+    finally:
+        for bot in bots:
+            bot.leave()
+            bot.transport.close()
+    return bots
+
+
+def parse_address(text):
+    host, _, port = text.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Headless multiplayer server and bot clients')
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve = commands.add_parser('serve', help='run a server')
+    serve.add_argument('--address', default='127.0.0.1:7777', metavar='HOST:PORT')
+    serve.add_argument('--tcp', action='store_true', help='TCP instead of UDP')
+    serve.add_argument('--maze', metavar='PATH', help='.maze file, default the classic board')
+    serve.add_argument('--ghosts', type=int, default=engine.NUM_GHOSTS)
+    serve.add_argument('--pellets', type=engine.pellet_count, default=engine.NUM_PELLETS,
+                       metavar='N|full')
+    serve.add_argument('--tick-rate', type=int, default=30)
+    serve.add_argument('--seed', type=int)
+    serve.add_argument('--stats-every', type=float, default=5.0, metavar='SECONDS',
+                       help='print server stats this often')
+    bots = commands.add_parser('bots', help='connect bot clients to a server')
+    bots.add_argument('--address', default='127.0.0.1:7777', metavar='HOST:PORT')
+    bots.add_argument('--tcp', action='store_true')
+    bots.add_argument('--players', type=int, default=8)
+    bots.add_argument('--spectators', type=int, default=0)
+    bots.add_argument('--seconds', type=float, default=None)
+    args = parser.parse_args(argv)
+    if args.command == 'serve' and args.tick_rate <= 0:
+        parser.error('--tick-rate must be positive')
+
+    address = parse_address(args.address)
+    if args.command == 'bots':
+        try:
+            clients = run_bots(address, args.players, args.spectators, args.seconds, args.tcp)
+        except KeyboardInterrupt:
+            return 0
+        received = sum(bot.bytes_received for bot in clients)
+        print(f'{len(clients)} bots received {received} bytes')
+        return 0
+
+    maze = load_maze(args.maze) if args.maze else engine.MAZE
+    game = MultiplayerState(args.seed, maze, args.ghosts, args.pellets, args.tick_rate)
+    transport = TcpServerTransport(address) if args.tcp else UdpTransport(address)
+    try:
+        server = GameServer(game, transport)
+    except ValueError as error:
+        transport.close()
+        parser.error(str(error))
+    print(f'serving on {transport.address[0]}:{transport.address[1]} '
+          f'({"TCP" if args.tcp else "UDP"}, {args.tick_rate} ticks/s)')
+    try:
+        while True:
+            server.run(args.stats_every)
+            print(server.stats(), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        transport.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,268 @@
+import hashlib
+import math
+import os
+
+import pygame
+from pygame import gfxdraw
+
+# Pre-rendered sprite atlas for Pac-Man, ghosts and pellets.
+#
+# Every animation state an entity can be in is drawn once into a single
+# surface at startup, so drawing an entity is one blit. The continuous parts
+# of the animation (ghost shading, skirt wave, pupil direction) are
+# quantized into a fixed number of frames. Sprites are drawn on black and
+# black is the atlas colorkey, matching the game's black background.
+
+ATLAS_VERSION = 2
+
+MOUTH_STEP = 4.5  # PACMAN_ANIM_SPEED * 30, how far the mouth moves per frame
+MOUTH_FRAMES = 11  # 0 to 45 degrees
+DIRECTIONS = (0, 90, 180, 270)
+GHOST_SHADES = 8
+GHOST_WAVE_FRAMES = 8
+PUPIL_DIRECTIONS = 8
+PUPIL_CENTERED = PUPIL_DIRECTIONS
+PELLET_GLOW_RADII = (0, 1, 2)  # Added to the pellet radius
+
+ATLAS_COLUMNS = 32
+COLORKEY = (0, 0, 0)
+
+
+def draw_pacman(surface, x, y, radius, direction, mouth_angle, color, mouth_color):
+    # Draw main body with anti-aliasing
+    gfxdraw.filled_circle(surface, x, y, radius, color)
+    gfxdraw.aacircle(surface, x, y, radius, color)
+
+    # Draw mouth; direction None means Pac-Man hasn't started moving
+    if direction is None:
+        return
+    start_angle = direction - mouth_angle
+    end_angle = direction + mouth_angle
+    points = [(x, y)]
+
+    for angle in range(int(start_angle), int(end_angle), 5):
+        rad = math.radians(angle)
+        points.append((x + radius * math.cos(rad),
+                       y - radius * math.sin(rad)))
+
+    points.append((x, y))
+    if len(points) > 2:
+        gfxdraw.filled_polygon(surface, points, mouth_color)
+        gfxdraw.aapolygon(surface, points, mouth_color)
+
+
+def draw_ghost(surface, x, y, radius, color, wave_phase, pupil_offset,
+               eye_color, pupil_color):
+    # Draw main body with anti-aliasing
+    gfxdraw.filled_circle(surface, x, y, radius, color)
+    gfxdraw.aacircle(surface, x, y, radius, color)
+
+    # Draw bottom part (wavy)
+    points = [(x - radius, y)]
+    for i in range(6):
+        wave_x = x - radius + (i * radius / 2)
+        wave_y = y + math.sin(wave_phase + i) * 3
+        points.append((wave_x, wave_y + radius - 2))
+    points.append((x + radius, y))
+
+    gfxdraw.filled_polygon(surface, points, color)
+    gfxdraw.aapolygon(surface, points, color)
+
+    # Draw eyes
+    eye_radius = radius // 3
+    left_eye_x = x - radius // 2
+    right_eye_x = x + radius // 2
+    gfxdraw.filled_circle(surface, left_eye_x, y - 2, eye_radius, eye_color)
+    gfxdraw.filled_circle(surface, right_eye_x, y - 2, eye_radius, eye_color)
+
+    # Draw pupils
+    pupil_radius = eye_radius // 2
+    pupil_offset_x, pupil_offset_y = pupil_offset
+    gfxdraw.filled_circle(surface,
+                          int(left_eye_x + pupil_offset_x),
+                          int(y - 2 + pupil_offset_y),
+                          pupil_radius, pupil_color)
+    gfxdraw.filled_circle(surface,
+                          int(right_eye_x + pupil_offset_x),
+                          int(y - 2 + pupil_offset_y),
+                          pupil_radius, pupil_color)
+
+
+def draw_pellet(surface, x, y, radius, glow_radius, color, glow_color):
+    # Draw glow
+    gfxdraw.filled_circle(surface, x, y, glow_radius, glow_color)
+    # Draw pellet
+    gfxdraw.filled_circle(surface, x, y, radius, color)
+    gfxdraw.aacircle(surface, x, y, radius, color)
+
+
+def mouth_frame(mouth_angle):
+    return max(0, min(MOUTH_FRAMES - 1, int(round(mouth_angle / MOUTH_STEP))))
+
+
+def ghost_shade(wave):
+    # wave runs from 0.6 to 1.0, see Ghost.draw
+    level = int(round((wave - 0.6) / 0.4 * (GHOST_SHADES - 1)))
+    return max(0, min(GHOST_SHADES - 1, level))
+
+
+def ghost_wave_frame(phase):
+    return int(phase % (math.pi * 2) / (math.pi * 2) * GHOST_WAVE_FRAMES) % GHOST_WAVE_FRAMES
+
+
+def pupil_frame(angle):
+    # angle is None when the ghost has nowhere to go
+    if angle is None:
+        return PUPIL_CENTERED
+    return int(round(angle / (math.pi * 2 / PUPIL_DIRECTIONS))) % PUPIL_DIRECTIONS
+
+
+class SpriteAtlas:
+    def __init__(self, radius=15, pellet_radius=4,
+                 pacman_color=(255, 255, 0), mouth_color=(0, 0, 0),
+                 chase_color=(255, 0, 0), scatter_color=(0, 255, 255),
+                 eye_color=(255, 255, 255), pupil_color=(0, 0, 0),
+                 pellet_color=(255, 255, 255), cache_dir=None):
+        self.radius = radius
+        self.pellet_radius = pellet_radius
+        self.pacman_color = pacman_color
+        self.mouth_color = mouth_color
+        self.ghost_colors = {True: chase_color, False: scatter_color}
+        self.eye_color = eye_color
+        self.pupil_color = pupil_color
+        self.pellet_color = pellet_color
+
+        # Every sprite sits in a same-sized cell with the entity centre at
+        # (center, center). The extra room on the right and bottom is for the
+        # ghost's skirt, whose last wave point reaches 1.5 radii out.
+        self.center = radius + 1
+        self.cell_width = self.center + radius * 3 // 2 + 2
+        self.cell_height = self.center + radius + 4
+
+        self.keys = self._sprite_keys()
+        self.areas = {}
+        for i, key in enumerate(self.keys):
+            row, col = divmod(i, ATLAS_COLUMNS)
+            self.areas[key] = pygame.Rect(col * self.cell_width, row * self.cell_height,
+                                          self.cell_width, self.cell_height)
+
+        self.cache_path = None
+        if cache_dir:
+            # Uncompressed: a BMP loads about ten times faster than a PNG,
+            # which matters for time to first frame
+            self.cache_path = os.path.join(cache_dir, f'sprites-{self._digest()}.bmp')
+        self.converted = False
+        self.surface = self._load() or self._build()
+
+    def _sprite_keys(self):
+        keys = [('pacman', None, 0)]
+        for direction in DIRECTIONS:
+            for frame in range(MOUTH_FRAMES):
+                keys.append(('pacman', direction, frame))
+        for chase_mode in (True, False):
+            for shade in range(GHOST_SHADES):
+                for wave in range(GHOST_WAVE_FRAMES):
+                    for pupil in range(PUPIL_DIRECTIONS + 1):
+                        keys.append(('ghost', chase_mode, shade, wave, pupil))
+        for glow in PELLET_GLOW_RADII:
+            keys.append(('pellet', glow))
+        return keys
+
+    def _digest(self):
+        # Anything that changes how sprites look changes the cache file name
+        params = (ATLAS_VERSION, self.radius, self.pellet_radius, self.pacman_color,
+                  self.mouth_color, self.ghost_colors[True], self.ghost_colors[False],
+                  self.eye_color, self.pupil_color, self.pellet_color,
+                  MOUTH_FRAMES, GHOST_SHADES, GHOST_WAVE_FRAMES, PUPIL_DIRECTIONS,
+                  PELLET_GLOW_RADII, ATLAS_COLUMNS)
+        return hashlib.sha1(repr(params).encode()).hexdigest()[:12]
+
+    def _size(self):
+        rows = (len(self.keys) + ATLAS_COLUMNS - 1) // ATLAS_COLUMNS
+        return (ATLAS_COLUMNS * self.cell_width, rows * self.cell_height)
+
+    def _load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            surface = pygame.image.load(self.cache_path)
+        except pygame.error:
+            return None
+        if surface.get_size() != self._size():
+            return None
+        return self._convert(surface)
+
+    def convert(self):
+        # For atlases built (e.g. on a loading thread) before the display
+        # was opened; returns the atlas
+        if not self.converted:
+            self.surface = self._convert(self.surface)
+        return self
+
+    def _convert(self, surface):
+        # convert needs a display; headless tools keep the raw surface
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+            self.converted = True
+        # No RLEACCEL: RLE blits of a sub-area scan the atlas from the top
+        surface.set_colorkey(COLORKEY)
+        return surface
+
+    def _build(self):
+        surface = pygame.Surface(self._size())
+        surface.fill(COLORKEY)
+        center = self.center
+        for key, area in self.areas.items():
+            sprite = surface.subsurface(area)
+            if key[0] == 'pacman':
+                _, direction, frame = key
+                draw_pacman(sprite, center, center, self.radius, direction,
+                            frame * MOUTH_STEP, self.pacman_color, self.mouth_color)
+            elif key[0] == 'ghost':
+                _, chase_mode, shade, wave, pupil = key
+                brightness = 0.6 + 0.4 * shade / (GHOST_SHADES - 1)
+                color = tuple(int(c * brightness) for c in self.ghost_colors[chase_mode])
+                if pupil == PUPIL_CENTERED:
+                    pupil_offset = (0, 0)
+                else:
+                    angle = pupil * math.pi * 2 / PUPIL_DIRECTIONS
+                    pupil_offset = (math.cos(angle) * 2, math.sin(angle) * 2)
+                draw_ghost(sprite, center, center, self.radius, color,
+                           wave * math.pi * 2 / GHOST_WAVE_FRAMES, pupil_offset,
+                           self.eye_color, self.pupil_color)
+            else:
+                _, glow = key
+                draw_pellet(sprite, center, center, self.pellet_radius,
+                            self.pellet_radius + glow, self.pellet_color, self.pellet_color)
+
+        if self.cache_path:
+            try:
+                os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+                pygame.image.save(surface, self.cache_path)
+            except (OSError, pygame.error):
+                pass  # The cache is only an optimization
+        return self._convert(surface)
+
+    def pacman_key(self, direction, mouth_angle):
+        if direction is None:
+            return ('pacman', None, 0)
+        return ('pacman', direction % 360, mouth_frame(mouth_angle))
+
+    def ghost_key(self, chase_mode, wave, skirt_phase, pupil_angle):
+        return ('ghost', bool(chase_mode), ghost_shade(wave),
+                ghost_wave_frame(skirt_phase), pupil_frame(pupil_angle))
+
+    def pellet_key(self, glow_radius):
+        glow = int(glow_radius) - self.pellet_radius
+        return ('pellet', max(PELLET_GLOW_RADII[0], min(PELLET_GLOW_RADII[-1], glow)))
+
+    def blit(self, target, key, x, y):
+        # Draws the sprite centred on (x, y)
+        return target.blit(self.surface, (x - self.center, y - self.center), self.areas[key])
+
+    def blits(self, target, key, positions):
+        # One sprite centred on each (x, y), in a single call
+        surface = self.surface
+        area = self.areas[key]
+        center = self.center
+        return target.blits([(surface, (x - center, y - center), area) for x, y in positions])
@@ -0,0 +1,287 @@
+from collections import OrderedDict
+
+import numpy
+
+from engine import CELL_SIZE, GHOST_SPEED, TICK_RATE, GameState
+from pathfinding import UNREACHABLE
+
+# Batched ghosts for stress modes with hundreds of them.
+#
+# GhostSwarm keeps every ghost's position, mode, timers and next waypoint in
+# NumPy arrays and updates them all at once, following the same rules as
+# engine.Ghost: chase/scatter timers, a replan every path_update_frequency
+# ticks, and moving from tile centre to tile centre along the PathFinder's
+# next-hop table for the ghost's goal. Instead of a path list each ghost
+# stores its goal and the next tile; reaching a tile looks the following one
+# up in the table, which yields exactly the path Ghost.find_path_to_player
+# would have stored.
+#
+# With swept set (GameState's swept mode) ghosts move like Ghost.travel, and
+# touches() tests every stretch of their moves against the player's.
+
+# Next-hop tables converted to arrays, per goal
+MAX_HOP_ARRAYS = 8
+
+
+class GhostSwarm:
+    def __init__(self, maze, pathfinder, count, rng):
+        rows, cols = maze.shape
+        self.cols = cols
+        self.pathfinder = pathfinder
+        self.free = maze.grid.reshape(-1) == 0
+        self.radius = 15
+        self._hops = OrderedDict()
+        width = cols * CELL_SIZE
+        height = rows * CELL_SIZE
+        self.corners = numpy.array([
+            (CELL_SIZE * 1.5, height - CELL_SIZE * 1.5),
+            (width - CELL_SIZE * 1.5, CELL_SIZE * 1.5),
+            (width - CELL_SIZE * 1.5, height - CELL_SIZE * 1.5)
+        ])
+
+        self.count = count
+        self.x = numpy.empty(count)
+        self.y = numpy.empty(count)
+        self.prev_x = numpy.empty(count)
+        self.prev_y = numpy.empty(count)
+        self.scatter_goal = numpy.empty(count, dtype=numpy.int64)
+        self.chase_mode = numpy.empty(count, dtype=bool)
+        self.chase_counter = numpy.empty(count, dtype=numpy.int32)
+        self.path_update_counter = numpy.empty(count, dtype=numpy.int32)
+        self.goal = numpy.empty(count, dtype=numpy.int64)
+        self.waypoint = numpy.empty(count, dtype=numpy.int64)  # -1: no path
+        self.reset(rng)
+
+    def reset(self, rng):
+        # Back to the start of a game, refilling the arrays in place.
+        # Spawn and scatter corners are drawn from the game's rng in the
+        # same order as Ghost.respawn, so seeded games start the same either
+        # way.
+        self.speed = GHOST_SPEED
+        self.path_update_frequency = 45
+        self.chase_time = 300
+        self.scatter_time = 180
+        corners = range(len(self.corners))
+        choices = [rng.choice(corners) for _ in range(self.count * 2)]
+        spawns = self.corners[choices[0::2]].reshape(-1, 2)
+        scatters = self.corners[choices[1::2]].reshape(-1, 2)
+        self.x[:] = spawns[:, 0]
+        self.y[:] = spawns[:, 1]
+        self.prev_x[:] = self.x
+        self.prev_y[:] = self.y
+        self.scatter_goal[:] = self.cell_of(scatters[:, 0], scatters[:, 1])
+        self.chase_mode[:] = True
+        self.chase_counter[:] = 0
+        self.path_update_counter[:] = 0
+        self.goal[:] = UNREACHABLE
+        self.waypoint[:] = UNREACHABLE
+        self.swept = False
+        # Swept mode: this tick's moves as (ghosts, t0, x0, y0, t1, x1, y1)
+        # arrays, and when each ghost's last one ended
+        self.legs = []
+        self.stopped = None
+
+    def apply_tick_rate(self, scale):
+        # Same rescaling GameState.apply_tick_rate does for Ghost objects
+        self.speed = GHOST_SPEED * scale
+        self.path_update_frequency = max(1, round(self.path_update_frequency / scale))
+        self.chase_time = max(1, round(self.chase_time / scale))
+        self.scatter_time = max(1, round(self.scatter_time / scale))
+
+    def save_positions(self):
+        self.prev_x[:] = self.x
+        self.prev_y[:] = self.y
+
+    def cell_of(self, x, y):
+        # Flat tile index under pixel positions
+        return (y // CELL_SIZE).astype(numpy.int64) * self.cols + (x // CELL_SIZE).astype(numpy.int64)
+
+    def hops(self, goal):
+        # Next-hop table towards a goal cell as an array
+        hops = self._hops.get(goal)
+        if hops is None:
+            hops = numpy.array(self.pathfinder.table(goal)[0], dtype=numpy.int64)
+            self._hops[goal] = hops
+            if len(self._hops) > MAX_HOP_ARRAYS:
+                self._hops.popitem(last=False)
+        else:
+            self._hops.move_to_end(goal)
+        return hops
+
+    def follow(self, ghosts, cells):
+        # Next waypoint for each ghost index in `ghosts` standing on `cells`,
+        # towards its goal; -1 once the goal is reached or unreachable
+        goals = self.goal[ghosts]
+        waypoints = numpy.full(len(ghosts), UNREACHABLE, dtype=numpy.int64)
+        for goal in numpy.unique(goals).tolist():
+            if not self.free[goal]:
+                continue
+            selected = goals == goal
+            from_cells = cells[selected]
+            hops = self.hops(goal)[from_cells]
+            hops[from_cells == goal] = UNREACHABLE
+            waypoints[selected] = hops
+        self.waypoint[ghosts] = waypoints
+
+    def move(self, player_x, player_y):
+        # Update chase/scatter mode
+        self.chase_counter += 1
+        switch = numpy.where(self.chase_mode,
+                             self.chase_counter >= self.chase_time,
+                             self.chase_counter >= self.scatter_time)
+        self.chase_mode ^= switch
+        self.chase_counter[switch] = 0
+
+        # Replan periodically: chase the player's tile or head for the corner
+        self.path_update_counter += 1
+        replan = numpy.flatnonzero(self.path_update_counter >= self.path_update_frequency)
+        if len(replan):
+            player_cell = int(player_y // CELL_SIZE) * self.cols + int(player_x // CELL_SIZE)
+            self.goal[replan] = numpy.where(self.chase_mode[replan], player_cell,
+                                            self.scatter_goal[replan])
+            self.follow(replan, self.cell_of(self.x[replan], self.y[replan]))
+            self.path_update_counter[replan] = 0
+
+        if self.swept:
+            self.travel()
+            return
+
+        # Move towards the centre of the next tile; arriving there takes the
+        # tick, as popping the path did
+        active = numpy.flatnonzero(self.waypoint >= 0)
+        if not len(active):
+            return
+        waypoint = self.waypoint[active]
+        dx = (waypoint % self.cols) * CELL_SIZE + CELL_SIZE // 2 - self.x[active]
+        dy = (waypoint // self.cols) * CELL_SIZE + CELL_SIZE // 2 - self.y[active]
+        dist = numpy.hypot(dx, dy)
+        arrived = dist < self.speed
+        moving = ~arrived & (dist != 0)
+        dist = dist[moving]
+        ghosts = active[moving]
+        self.x[ghosts] += dx[moving] / dist * self.speed
+        self.y[ghosts] += dy[moving] / dist * self.speed
+        if arrived.any():
+            self.follow(active[arrived], waypoint[arrived])
+
+    def travel(self):
+        # Ghost.travel for every ghost: each pass moves the ghosts that still
+        # have distance left as far as their next tile centre
+        remaining = numpy.full(self.count, self.speed)
+        legs = []
+        while True:
+            active = numpy.flatnonzero((self.waypoint >= 0) & (remaining > 0))
+            if not len(active):
+                break
+            waypoint = self.waypoint[active]
+            x0 = self.x[active]
+            y0 = self.y[active]
+            target_x = ((waypoint % self.cols) * CELL_SIZE + CELL_SIZE // 2).astype(numpy.float64)
+            target_y = ((waypoint // self.cols) * CELL_SIZE + CELL_SIZE // 2).astype(numpy.float64)
+            dist = numpy.hypot(target_x - x0, target_y - y0)
+            left = remaining[active]
+            arrived = dist <= left
+            step = numpy.minimum(dist, left)
+            scale = numpy.divide(step, dist, out=numpy.zeros_like(dist), where=dist != 0)
+            x1 = numpy.where(arrived, target_x, x0 + (target_x - x0) * scale)
+            y1 = numpy.where(arrived, target_y, y0 + (target_y - y0) * scale)
+            legs.append((active, 1 - left / self.speed, x0, y0,
+                         1 - (left - step) / self.speed, x1, y1))
+            self.x[active] = x1
+            self.y[active] = y1
+            remaining[active] = left - step
+            if arrived.any():
+                self.follow(active[arrived], waypoint[arrived])
+        self.legs = legs
+        self.stopped = 1 - remaining / self.speed
+
+    def touches(self, player):
+        # True if any ghost overlaps the player
+        if self.swept:
+            return self.swept_touches(player)
+        dist = numpy.hypot(self.x - player.x, self.y - player.y)
+        return bool((dist < player.radius + self.radius).any())
+
+    def swept_touches(self, player):
+        # paths_meet for every ghost that ended up close enough to have met
+        # the player: each of its moves, and its rest after the last one,
+        # against each stretch of the player's move that overlaps it in time
+        reach = player.radius + self.radius
+        dist = numpy.hypot(self.x - player.x, self.y - player.y)
+        if (dist < reach).any():
+            return True
+        near = dist < reach + self.speed + player.speed
+        if not near.any():
+            return False
+        everyone = numpy.arange(self.count)
+        legs = self.legs + [(everyone, self.stopped, self.x, self.y,
+                             numpy.ones(self.count), self.x, self.y)]
+        limit = reach * reach
+        motion = player.motion
+        for ghosts, *leg in legs:
+            selected = near[ghosts]
+            if not selected.any():
+                continue
+            t0, x0, y0, t1, x1, y1 = (values[selected] for values in leg)
+            for (p0, px0, py0), (p1, px1, py1) in zip(motion, motion[1:]):
+                low = numpy.maximum(t0, p0)
+                high = numpy.minimum(t1, p1)
+                overlap = low <= high
+                if not overlap.any():
+                    continue
+                gap_x0 = _lerp(low, t0, t1, x0, x1) - _lerp(low, p0, p1, px0, px1)
+                gap_y0 = _lerp(low, t0, t1, y0, y1) - _lerp(low, p0, p1, py0, py1)
+                vx = _lerp(high, t0, t1, x0, x1) - _lerp(high, p0, p1, px0, px1) - gap_x0
+                vy = _lerp(high, t0, t1, y0, y1) - _lerp(high, p0, p1, py0, py1) - gap_y0
+                speed = vx * vx + vy * vy
+                s = numpy.divide(-(gap_x0 * vx + gap_y0 * vy), speed,
+                                 out=numpy.zeros_like(speed), where=speed != 0)
+                s = numpy.clip(s, 0, 1)
+                gap_x = gap_x0 + vx * s
+                gap_y = gap_y0 + vy * s
+                if (overlap & (gap_x * gap_x + gap_y * gap_y < limit)).any():
+                    return True
+        return False
+
+
+def _lerp(t, t0, t1, a0, a1):
+    # Position at times t on moves from a0 at t0 to a1 at t1 (arrays or not)
+    span = numpy.subtract(t1, t0, dtype=numpy.float64)
+    f = numpy.divide(numpy.subtract(t, t0), span, out=numpy.zeros_like(span * t),
+                     where=span != 0)
+    return a0 + numpy.subtract(a1, a0) * f
+
+
+class SwarmGameState(GameState):
+    # GameState with the ghosts in a GhostSwarm; state.ghosts stays empty
+    swarm = None
+
+    def create_ghosts(self):
+        if self.scheduler:
+            # The GhostScheduler only drives Ghost objects
+            raise ValueError('ai_budget is not supported with a GhostSwarm')
+        self.swarm = GhostSwarm(self.maze_data, self.pathfinder, self.num_ghosts, self.rng)
+        self.swarm.swept = self.swept
+        return []
+
+    def reset_ghosts(self):
+        if self.swarm is None or self.swarm.count != self.num_ghosts:
+            self.create_ghosts()
+            return
+        self.swarm.reset(self.rng)
+        self.swarm.swept = self.swept
+
+    def apply_tick_rate(self):
+        super().apply_tick_rate()
+        self.swarm.apply_tick_rate(TICK_RATE / self.tick_rate)
+
+    def save_positions(self):
+        super().save_positions()
+        self.swarm.save_positions()
+
+    def move_ghosts(self):
+        # Every ghost moves before the collision test, so unlike the object
+        # version, ghosts after the one that caught the player move too
+        player = self.player
+        self.swarm.move(player.x, player.y)
+        return self.swarm.touches(player)
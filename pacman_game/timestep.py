@@ -0,0 +1,36 @@
+# Fixed-timestep loop helper.
+#
+# Real elapsed time is added to an accumulator and game logic runs in whole
+# ticks of 1 / tick_rate seconds, however fast or slow frames are rendered.
+# Whatever is left in the accumulator becomes the interpolation factor the
+# renderer uses to draw entities between their last two tick positions.
+
+
+class FixedTimestep:
+    def __init__(self, tick_rate, max_ticks_per_frame=8):
+        self.tick_rate = tick_rate
+        self.tick_duration = 1.0 / tick_rate
+        # After a long stall, drop time rather than trying to catch up forever
+        self.max_ticks_per_frame = max_ticks_per_frame
+        self.accumulator = 0.0
+        self.total_ticks = 0
+
+    def advance(self, elapsed):
+        # Add elapsed seconds and return how many logic ticks to run now
+        self.accumulator += elapsed
+        ticks = int(self.accumulator / self.tick_duration)
+        if ticks > self.max_ticks_per_frame:
+            ticks = self.max_ticks_per_frame
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= ticks * self.tick_duration
+        self.total_ticks += ticks
+        return ticks
+
+    @property
+    def alpha(self):
+        # How far (0..1) the current frame is between the last tick and the next
+        return min(1.0, self.accumulator / self.tick_duration)
+
+    def reset(self):
+        self.accumulator = 0.0
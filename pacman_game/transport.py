@@ -0,0 +1,175 @@
+import selectors
+import socket
+import struct
+
+# Message transports for the multiplayer server, all non-blocking with the
+# same interface: send(address, data) and receive() -> [(address, data)].
+# UDP sends one datagram per message. TCP (meant for localhost) frames
+# messages with a two byte length and uses the peer address as the client
+# address. max_message is the longest message a transport can send.
+
+MAX_DATAGRAM = 65507
+MAX_FRAME = 0xffff
+FRAME = struct.Struct('<H')
+
+
+class UdpTransport:
+    def __init__(self, bind=('127.0.0.1', 0)):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self.sock.bind(bind)
+        self.sock.setblocking(False)
+        self.address = self.sock.getsockname()
+        self.max_message = MAX_DATAGRAM
+
+    def send(self, address, data):
+        try:
+            self.sock.sendto(data, address)
+        except (BlockingIOError, ConnectionRefusedError):
+            pass  # Dropped, like any other lost datagram
+
+    def receive(self):
+        messages = []
+        while True:
+            try:
+                data, address = self.sock.recvfrom(MAX_DATAGRAM)
+            except (BlockingIOError, ConnectionRefusedError):
+                return messages
+            messages.append((address, data))
+
+    def disconnected(self):
+        return []
+
+    def close(self):
+        self.sock.close()
+
+
+class _Stream:
+    # One TCP connection: buffered, length-framed messages in both directions
+    def __init__(self, sock):
+        self.sock = sock
+        self.incoming = bytearray()
+        self.outgoing = bytearray()
+        self.closed = False
+
+    def queue(self, data):
+        if len(data) > MAX_FRAME:
+            raise ValueError(f'message of {len(data)} bytes is too long for a frame')
+        self.outgoing += FRAME.pack(len(data)) + data
+        self.flush()
+
+    def flush(self):
+        while self.outgoing and not self.closed:
+            try:
+                sent = self.sock.send(self.outgoing)
+            except BlockingIOError:
+                return
+            except OSError:
+                self.closed = True
+                return
+            del self.outgoing[:sent]
+
+    def read(self):
+        # Complete messages received so far
+        while not self.closed:
+            try:
+                chunk = self.sock.recv(65536)
+            except BlockingIOError:
+                break
+            except OSError:
+                self.closed = True
+                break
+            if not chunk:
+                self.closed = True
+                break
+            self.incoming += chunk
+        messages = []
+        while len(self.incoming) >= FRAME.size:
+            (length,) = FRAME.unpack_from(self.incoming)
+            if len(self.incoming) < FRAME.size + length:
+                break
+            messages.append(bytes(self.incoming[FRAME.size:FRAME.size + length]))
+            del self.incoming[:FRAME.size + length]
+        return messages
+
+
+class TcpServerTransport:
+    def __init__(self, bind=('127.0.0.1', 0)):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(bind)
+        self.listener.listen()
+        self.listener.setblocking(False)
+        self.address = self.listener.getsockname()
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.listener, selectors.EVENT_READ)
+        self.streams = {}
+        self.dropped = []
+        self.max_message = MAX_FRAME
+
+    def send(self, address, data):
+        stream = self.streams.get(address)
+        if stream:
+            stream.queue(data)
+
+    def receive(self):
+        messages = []
+        for key, _ in self.selector.select(0):
+            if key.fileobj is self.listener:
+                self._accept()
+        for address, stream in list(self.streams.items()):
+            stream.flush()
+            messages.extend((address, data) for data in stream.read())
+            if stream.closed:
+                self._drop(address)
+        return messages
+
+    def disconnected(self):
+        # Addresses whose connection closed since the last call
+        dropped, self.dropped = self.dropped, []
+        return dropped
+
+    def _accept(self):
+        while True:
+            try:
+                sock, address = self.listener.accept()
+            except BlockingIOError:
+                return
+            sock.setblocking(False)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.streams[address] = _Stream(sock)
+
+    def _drop(self, address):
+        self.streams.pop(address).sock.close()
+        self.dropped.append(address)
+
+    def close(self):
+        for stream in self.streams.values():
+            stream.sock.close()
+        self.selector.close()
+        self.listener.close()
+
+
+class TcpClientTransport:
+    def __init__(self, server):
+        sock = socket.create_connection(server)
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server = server
+        self.stream = _Stream(sock)
+        self.address = sock.getsockname()
+        self.max_message = MAX_FRAME
+
+    def send(self, address, data):
+        self.stream.queue(data)
+
+    def receive(self):
+        self.stream.flush()
+        return [(self.server, data) for data in self.stream.read()]
+
+    def disconnected(self):
+        return [self.server] if self.stream.closed else []
+
+    def close(self):
+        self.stream.sock.close()
+
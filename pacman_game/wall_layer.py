@@ -0,0 +1,145 @@
+import math
+import random
+from collections import OrderedDict
+
+import numpy
+import pygame
+
+from mazes import as_grid
+
+# The maze is drawn into 8-bit palettized surfaces. Every wall tile is
+# assigned one of a few glow groups, and each group owns a palette entry, so
+# the pulsing glow is animated by rewriting a handful of palette colors per
+# frame. ChunkedWallLayer renders the maze in chunks and draws only what a
+# Camera can see, so mazes of any size cost the same per frame.
+
+GLOW_GROUPS = 64
+BACKGROUND_INDEX = 0
+HIGHLIGHT_INDEX = 255
+
+
+class GlowPalette:
+    # Glow groups and the palette they animate
+    def __init__(self, wall_color, background_color=(0, 0, 0),
+                 groups=GLOW_GROUPS, rng=None):
+        rng = rng or random.Random()
+        self.rng = rng
+        self.groups = groups
+        self.wall_color = wall_color
+        self.background_color = background_color
+        self.highlight_color = tuple(min(255, int(c * 1.5)) for c in wall_color)
+
+        # Each group pulses with its own phase and speed, like individual
+        # walls used to
+        self.glow_values = [rng.random() for _ in range(groups)]
+        self.glow_speeds = [rng.uniform(0.02, 0.05) for _ in range(groups)]
+
+        self.palette = [background_color] * 256
+        self.palette[HIGHLIGHT_INDEX] = self.highlight_color
+        self.version = 0
+
+    def advance(self, frames=1.0):
+        # Advance every glow group and recompute the palette colors
+        wall_color = self.wall_color
+        for i, speed in enumerate(self.glow_speeds):
+            value = (self.glow_values[i] + speed * frames) % 1.0
+            self.glow_values[i] = value
+            glow = math.sin(value * math.pi * 2) * 0.2 + 0.8
+            self.palette[1 + i] = (int(wall_color[0] * glow),
+                                   int(wall_color[1] * glow),
+                                   int(wall_color[2] * glow))
+        self.version += 1
+
+
+class ChunkedWallLayer(GlowPalette):
+    # The same walls for mazes of any size. The maze is cut into square
+    # chunks of chunk_tiles x chunk_tiles tiles, each pre-rendered into its
+    # own 8-bit surface the first time the camera shows it, and only the
+    # chunks overlapping the view are blitted. The most recently used
+    # max_chunks surfaces are kept. Palettes are pushed to a chunk only
+    # when it is drawn, so glowing costs the same on any maze.
+    def __init__(self, maze, cell_size, wall_color, background_color=(0, 0, 0),
+                 chunk_tiles=16, groups=GLOW_GROUPS, rng=None, max_chunks=64):
+        super().__init__(wall_color, background_color, groups, rng)
+        self.grid = as_grid(maze)
+        rows, cols = self.grid.shape
+        self.cell_size = cell_size
+        self.chunk_tiles = chunk_tiles
+        self.chunk_size = chunk_tiles * cell_size
+        self.chunk_rows = -(-rows // chunk_tiles)
+        self.chunk_cols = -(-cols // chunk_tiles)
+        self.width = cols * cell_size
+        self.height = rows * cell_size
+        self.max_chunks = max_chunks
+        # Glow groups come from a hash of the tile position, so a chunk looks
+        # the same whenever it is (re-)rendered
+        self.salt = self.rng.getrandbits(31)
+        self.chunks = OrderedDict()  # (chunk_row, chunk_col) -> [surface, palette version]
+        self.chunks_rendered = 0
+
+    def update(self, frames=1.0):
+        self.advance(frames)
+
+    def render_chunk(self, chunk_row, chunk_col):
+        tiles = self.chunk_tiles
+        size = self.cell_size
+        row0 = chunk_row * tiles
+        col0 = chunk_col * tiles
+        walls = self.grid[row0:row0 + tiles, col0:col0 + tiles] != 0
+        rows = numpy.arange(row0, row0 + walls.shape[0], dtype=numpy.int64)[:, None]
+        cols = numpy.arange(col0, col0 + walls.shape[1], dtype=numpy.int64)[None, :]
+        groups = 1 + ((rows * 73856093) ^ (cols * 19349663) ^ self.salt) % self.groups
+        index = numpy.where(walls, groups, BACKGROUND_INDEX).astype(numpy.uint8)
+
+        # Every tile becomes size x size pixels; top and left edges of walls
+        # get the highlight
+        pixels = index.repeat(size, axis=0).repeat(size, axis=1)
+        tile_pixels = pixels.reshape(walls.shape[0], size, walls.shape[1], size)
+        tile_pixels[:, 0, :, :][walls] = HIGHLIGHT_INDEX
+        tile_pixels[:, :, :, 0].transpose(0, 2, 1)[walls] = HIGHLIGHT_INDEX
+
+        surface = pygame.Surface((pixels.shape[1], pixels.shape[0]), depth=8)
+        surface.set_palette(self.palette)
+        pygame.surfarray.blit_array(surface, pixels.T)
+        self.chunks_rendered += 1
+        return surface
+
+    def chunk(self, chunk_row, chunk_col):
+        key = (chunk_row, chunk_col)
+        entry = self.chunks.get(key)
+        if entry is None:
+            entry = [self.render_chunk(chunk_row, chunk_col), self.version]
+            self.chunks[key] = entry
+            if len(self.chunks) > self.max_chunks:
+                self.chunks.popitem(last=False)
+        else:
+            self.chunks.move_to_end(key)
+        surface, version = entry
+        if version != self.version:
+            surface.set_palette(self.palette)
+            entry[1] = self.version
+        return surface
+
+    def visible_chunks(self, camera):
+        size = self.chunk_size
+        first_row = max(0, camera.y // size)
+        last_row = min(self.chunk_rows - 1, (camera.y + camera.height - 1) // size)
+        first_col = max(0, camera.x // size)
+        last_col = min(self.chunk_cols - 1, (camera.x + camera.width - 1) // size)
+        return [(row, col) for row in range(first_row, last_row + 1)
+                for col in range(first_col, last_col + 1)]
+
+    def prerender(self, camera):
+        # Renders the chunks camera shows now, e.g. on a loading thread
+        # before the first frame
+        for row, col in self.visible_chunks(camera):
+            self.chunk(row, col)
+
+    def draw(self, target, camera):
+        # Clears the background too (all of it only if the maze doesn't
+        # fill the view), so no separate fill is needed
+        if not camera.covers_view():
+            target.fill(self.background_color)
+        size = self.chunk_size
+        for row, col in self.visible_chunks(camera):
+            target.blit(self.chunk(row, col), (col * size - camera.x, row * size - camera.y))